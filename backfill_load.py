@@ -0,0 +1,292 @@
+import argparse
+import csv
+import hashlib
+import os
+import tempfile
+import zlib
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Optional
+
+import pandas as pd
+
+import load_progress_csv as progress_loader
+import load_student_csv as student_loader
+import progress_summary
+from identity_index import identity_keys
+from key_columns import has_key_columns
+from load_progress_csv import get_connection, load_dotenv, read_csv_header
+# Chunked, resumable insert-only load for large backfills. Rows are split into chunks by a
+# hash of the dedupe key, so chunks never share a key and can load in parallel. Each chunk
+# commits in its own transaction together with its row in pel.load_checkpoints.
+
+CHECKPOINT_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS pel.load_checkpoints (
+        table_name text NOT NULL,
+        chunk_hash text NOT NULL,
+        source_file text,
+        chunk_rows integer,
+        inserted integer,
+        months date[],
+        loaded_at timestamptz NOT NULL DEFAULT now(),
+        PRIMARY KEY (table_name, chunk_hash)
+    )
+"""
+# Checkpoint tables created before months were recorded.
+CHECKPOINT_MONTHS_SQL = "ALTER TABLE pel.load_checkpoints ADD COLUMN IF NOT EXISTS months date[]"
+# Summary months of every chunk of this CSV, including chunks committed by an interrupted run.
+RUN_MONTHS_SQL = """
+    SELECT DISTINCT unnest(months) FROM pel.load_checkpoints
+    WHERE table_name = 'progress' AND chunk_hash = ANY(%s)
+"""
+UNKNOWN_MONTHS_SQL = """
+    SELECT COUNT(*) FROM pel.load_checkpoints
+    WHERE table_name = 'progress' AND chunk_hash = ANY(%s) AND months IS NULL
+"""
+
+TABLES = {
+    "progress": {
+        "loader": progress_loader,
+        "temp": "temp_progress",
+        "key": ["Full Name", "Email", "Subject", "Date", "Center"],
+    },
+    "students": {
+        "loader": student_loader,
+        "temp": "temp_students",
+        "key": ["Full Name", "Email"],
+    },
+}
+
+
+SPLIT_BATCH_ROWS = 10000
+
+
+def chunk_keys(rows: list[list[str]], positions: list[int], keyed: bool) -> list[str]:
+    columns = [[row[i] for row in rows] for i in positions]
+    if keyed:
+        # The loaders dedupe on name_key/email_key then, so spellings that normalize to the same
+        # key must land in the same chunk; the first two key columns are Full Name and Email.
+        keys = identity_keys(pd.Series(columns[0], dtype="string"), pd.Series(columns[1], dtype="string"))
+        columns[:2] = [keys["name_key"].tolist(), keys["email_key"].tolist()]
+    return ["\x1f".join(parts) for parts in zip(*columns)]
+
+
+def split_chunks(
+    csv_path: Path, key_cols: list[str], chunk_rows: int, spool_dir: str, keyed: bool = False
+) -> list[Path]:
+    with open(csv_path, "r", encoding="utf-8", newline="") as handle:
+        total = sum(1 for _ in handle) - 1
+    n_chunks = max(1, -(-total // chunk_rows))
+
+    with open(csv_path, "r", encoding="utf-8", newline="") as handle:
+        reader = csv.reader(handle)
+        header = next(reader)
+        stripped = [col.strip() for col in header]
+        positions = [stripped.index(col) for col in key_cols]
+
+        paths = [Path(spool_dir) / f"chunk_{i:05d}.csv" for i in range(n_chunks)]
+        outs = [open(path, "w", encoding="utf-8", newline="") for path in paths]
+        try:
+            writers = [csv.writer(out, lineterminator="\n") for out in outs]
+            for writer in writers:
+                writer.writerow(header)
+            while True:
+                rows = [row for _, row in zip(range(SPLIT_BATCH_ROWS), reader)]
+                if not rows:
+                    break
+                for row, key in zip(rows, chunk_keys(rows, positions, keyed)):
+                    writers[zlib.crc32(key.encode("utf-8")) % n_chunks].writerow(row)
+        finally:
+            for out in outs:
+                out.close()
+    return paths
+
+
+def chunk_hash(table: str, chunk_path: Path) -> str:
+    digest = hashlib.sha256(table.encode("utf-8"))
+    with open(chunk_path, "rb") as handle:
+        for block in iter(lambda: handle.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def copy_chunk(driver: str, conn, sql: str, chunk_path: Path) -> None:
+    with conn.cursor() as cur:
+        with open(chunk_path, "r", encoding="utf-8", newline="") as handle:
+            if driver == "psycopg":
+                with cur.copy(sql) as copy:
+                    while True:
+                        block = handle.read(1 << 16)
+                        if not block:
+                            break
+                        copy.write(block)
+            else:
+                cur.copy_expert(sql, handle)
+
+
+def load_chunk(
+    driver: str, conn, table: str, sql: dict[str, str], chunk_path: Path, digest: str, source: str, keyed: bool
+) -> tuple[int, int, int]:
+    temp = TABLES[table]["temp"]
+    # Everything below is one transaction: the chunk and its checkpoint commit together.
+    try:
+        with conn.cursor() as cur:
+            cur.execute(sql["create_temp"])
+        copy_chunk(driver, conn, sql["copy"], chunk_path)
+        with conn.cursor() as cur:
+            if "normalize_dates" in sql:
+                cur.execute(sql["normalize_dates"])
+            cur.execute(sql["dedup"])
+            cur.execute(f"TRUNCATE {temp}")
+            cur.execute(f"INSERT INTO {temp} SELECT * FROM {temp}_dedup")
+            cur.execute(f"SELECT COUNT(*) FROM {temp}")
+            rows = int(cur.fetchone()[0])
+            unlinked = 0
+            if table == "progress":
+                header = read_csv_header(chunk_path)
+                unlinked = progress_loader.fetch_count(conn, progress_loader.UNLINKED_SQL)
+                cur.execute(progress_loader.build_insert_sql(header, progress_loader.fetch_date_range(conn), keyed))
+            else:
+                cur.execute(sql["insert"])
+            inserted = cur.rowcount
+            # The summary is refreshed once at the end of the run from these months, so a
+            # resumed run still covers chunks an interrupted one committed.
+            months = progress_summary.affected_months(cur) if table == "progress" else None
+            cur.execute(
+                "INSERT INTO pel.load_checkpoints (table_name, chunk_hash, source_file, chunk_rows, inserted, months) "
+                "VALUES (%s, %s, %s, %s, %s, %s) ON CONFLICT DO NOTHING",
+                (table, digest, source, rows, inserted, months),
+            )
+            cur.execute(f"DROP TABLE {temp}, {temp}_dedup")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return rows, inserted, unlinked
+
+
+def run_worker(
+    table: str, sql: dict[str, str], jobs: list[tuple[int, Path, str]], source: str, total: int, keyed: bool
+) -> tuple[int, int]:
+    driver, conn = get_connection()
+    inserted_total = 0
+    unlinked_total = 0
+    try:
+        for index, chunk_path, digest in jobs:
+            rows, inserted, unlinked = load_chunk(driver, conn, table, sql, chunk_path, digest, source, keyed)
+            inserted_total += inserted
+            unlinked_total += unlinked
+            print(f"chunk {index + 1}/{total}: {rows} rows, inserted {inserted}")
+    finally:
+        conn.close()
+    return inserted_total, unlinked_total
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    base_dir = Path(__file__).resolve().parent
+    parser = argparse.ArgumentParser(
+        description="Resumable chunked insert-only load for large backfills."
+    )
+    parser.add_argument("table", choices=sorted(TABLES), help="Target table.")
+    parser.add_argument("csv", help="CSV file in the *_to_load.csv format.")
+    parser.add_argument(
+        "--chunk-rows", type=int, default=50000, help="Approximate rows per chunk (default: 50000)."
+    )
+    parser.add_argument(
+        "--workers", type=int, default=1, help="Chunks loaded in parallel on separate connections (default: 1)."
+    )
+    args = parser.parse_args(argv)
+
+    load_dotenv(base_dir / ".env")
+    if "DATABASE_URL" not in os.environ:
+        print("DATABASE_URL is not set. Put it in .env or set it in your shell.")
+        return 1
+
+    csv_path = Path(args.csv)
+    if not csv_path.exists():
+        print(f"Missing CSV file: {csv_path}")
+        return 1
+
+    spec = TABLES[args.table]
+    loader = spec["loader"]
+    header = read_csv_header(csv_path)
+    error = loader.check_header(header, csv_path.name)
+    if error:
+        print(error)
+        return 1
+    driver, conn = get_connection()
+    try:
+        keyed = has_key_columns(conn, args.table)
+        sql = loader.build_sql(header, keyed=keyed)
+        with conn.cursor() as cur:
+            cur.execute(CHECKPOINT_TABLE_SQL)
+            cur.execute(CHECKPOINT_MONTHS_SQL)
+            if "add_notes" in sql:
+                cur.execute(sql["add_notes"])
+            cur.execute("SELECT chunk_hash FROM pel.load_checkpoints WHERE table_name = %s", (args.table,))
+            done = {row[0] for row in cur.fetchall()}
+        conn.commit()
+    finally:
+        conn.close()
+
+    with tempfile.TemporaryDirectory(prefix="backfill_") as spool_dir:
+        chunk_paths = split_chunks(csv_path, spec["key"], args.chunk_rows, spool_dir, keyed)
+        jobs = []
+        digests = []
+        skipped = 0
+        for index, chunk_path in enumerate(chunk_paths):
+            digest = chunk_hash(args.table, chunk_path)
+            digests.append(digest)
+            if digest in done:
+                skipped += 1
+                continue
+            jobs.append((index, chunk_path, digest))
+        print(f"Chunks: {len(chunk_paths)} total, {skipped} already loaded, {len(jobs)} to load")
+
+        workers = max(1, min(args.workers, len(jobs)))
+        batches = [jobs[i::workers] for i in range(workers)]
+        inserted = 0
+        unlinked = 0
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [
+                pool.submit(run_worker, args.table, sql, batch, csv_path.name, len(chunk_paths), keyed)
+                for batch in batches
+                if batch
+            ]
+            for future in as_completed(futures):
+                chunk_inserted, chunk_unlinked = future.result()
+                inserted += chunk_inserted
+                unlinked += chunk_unlinked
+
+    linked = 0
+    months = []
+    unknown = 0
+    if args.table == "progress":
+        driver, conn = get_connection()
+        try:
+            with conn.cursor() as cur:
+                # A Student ID column (combine --resolve-ids) makes the link unnecessary.
+                if unlinked or "Student ID" not in header:
+                    cur.execute(progress_loader.link_sql(conn))
+                    linked = cur.rowcount
+                cur.execute(RUN_MONTHS_SQL, (digests,))
+                months = [row[0] for row in cur.fetchall()]
+                cur.execute(UNKNOWN_MONTHS_SQL, (digests,))
+                unknown = int(cur.fetchone()[0])
+                progress_summary.refresh_months(cur, months)
+            conn.commit()
+        finally:
+            conn.close()
+
+    print("Backfill complete.")
+    print(f"Inserted records: {inserted}")
+    if args.table == "progress":
+        print(f"Progress rows linked to student_id: {linked}")
+        print(f"Summary months refreshed: {len(months)}")
+        if unknown:
+            print(f"{unknown} chunks were checkpointed without their months; run progress_summary.py --rebuild.")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
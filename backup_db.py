@@ -0,0 +1,80 @@
+import argparse
+import csv
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+from load_progress_csv import get_connection, load_dotenv
+# Backs up pel.students and pel.progress to archive/backups/backup_pel_<table>_<stamp>.csv with
+# COPY ... TO STDOUT, streaming to disk without pandas. Same columns and True/False booleans as
+# the earlier pandas backups, so reconcile.py, the reports and db_backend.py seed read either.
+
+BASE_DIR = Path(__file__).resolve().parent
+BACKUP_DIR = BASE_DIR / "archive" / "backups"
+TABLES = {"students": "student_id", "progress": "progress_id"}
+
+# Generated columns (key_columns.py) are left out; they are recomputed when a backup is loaded.
+COLUMNS_SQL = (
+    "SELECT column_name, data_type FROM information_schema.columns "
+    "WHERE table_schema = 'pel' AND table_name = %s AND is_generated = 'NEVER' ORDER BY ordinal_position"
+)
+
+
+def select_sql(cur, table: str) -> str:
+    cur.execute(COLUMNS_SQL, (table,))
+    columns = []
+    for name, data_type in cur.fetchall():
+        if data_type == "boolean":
+            columns.append(f"CASE WHEN {name} THEN 'True' WHEN NOT {name} THEN 'False' END AS {name}")
+        else:
+            columns.append(name)
+    return f"SELECT {', '.join(columns)} FROM pel.{table} ORDER BY {TABLES[table]}"
+
+
+def backup_table(driver: str, conn, table: str, path: Path) -> None:
+    with conn.cursor() as cur:
+        copy_sql = f"COPY ({select_sql(cur, table)}) TO STDOUT WITH (FORMAT csv, HEADER true)"
+        if driver == "psycopg":
+            with open(path, "wb") as handle, cur.copy(copy_sql) as copy:
+                for data in copy:
+                    handle.write(data)
+        else:
+            with open(path, "w", encoding="utf-8", newline="") as handle:
+                cur.copy_expert(copy_sql, handle)
+
+
+def count_rows(path: Path) -> int:
+    # Rows, not lines: quoted fields (addresses, notes) may contain newlines.
+    with open(path, "r", encoding="utf-8", newline="") as handle:
+        return sum(1 for _ in csv.reader(handle)) - 1
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Back up pel tables to timestamped CSVs.")
+    parser.add_argument("--dir", default=str(BACKUP_DIR), help="Output folder (default: archive/backups).")
+    parser.add_argument("--tables", nargs="+", choices=list(TABLES), default=list(TABLES), help="Tables to back up.")
+    args = parser.parse_args(argv)
+
+    load_dotenv(BASE_DIR / ".env")
+    if "DATABASE_URL" not in os.environ:
+        print("DATABASE_URL is not set. Put it in .env or set it in your shell.")
+        return 1
+
+    out_dir = Path(args.dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    driver, conn = get_connection()
+    try:
+        for table in args.tables:
+            path = out_dir / f"backup_pel_{table}_{stamp}.csv"
+            backup_table(driver, conn, table, path)
+            print(f"{path}: {count_rows(path)} rows")
+    finally:
+        conn.close()
+    print("backup complete")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
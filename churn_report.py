@@ -0,0 +1,144 @@
+import argparse
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from progress_source import read_progress
+# Month-over-month enrollment churn and retention per center x subject (plus "All" subjects).
+# Students are keyed by (Full Name, Email); months are the months that have data for the
+# center/subject, so a month with no report file does not look like everyone leaving.
+
+COLUMNS = ["full_name", "email", "subject", "progress_date", "center"]
+
+
+def prepare(df: pd.DataFrame) -> pd.DataFrame:
+    df = df.dropna(subset=["progress_date", "center", "subject"])
+    month = pd.to_datetime(df["progress_date"], errors="coerce").dt.to_period("M")
+    key = df["full_name"].fillna("").str.strip().str.lower() + "|" + df["email"].fillna("").str.strip().str.lower()
+    events = pd.DataFrame(
+        {
+            "center": df["center"].astype(str).to_numpy(),
+            "subject": df["subject"].astype(str).to_numpy(),
+            "month": month.to_numpy(),
+            "student": pd.factorize(key)[0],
+        }
+    ).dropna(subset=["month"])
+    both = events.assign(subject="All")
+    return pd.concat([events, both], ignore_index=True).drop_duplicates()
+
+
+def month_presence(events: pd.DataFrame) -> pd.DataFrame:
+    # One row per (group, student, month) with integer codes for vectorized set lookups.
+    events = events.copy()
+    events["group"] = pd.factorize(events["center"] + "|" + events["subject"])[0]
+    # Dense month index within each group: consecutive observed months differ by 1.
+    events["slot"] = events.groupby("group")["month"].rank(method="dense").astype(np.int64) - 1
+    n_slots = int(events["slot"].max()) + 2
+    n_students = int(events["student"].max()) + 1
+    group = events["group"].to_numpy(np.int64)
+    student = events["student"].to_numpy(np.int64)
+    events["code"] = (group * n_students + student) * n_slots + events["slot"].to_numpy(np.int64)
+    codes = np.sort(events["code"].to_numpy())
+
+    first_slot = events.groupby(["group", "student"])["slot"].transform("min")
+    events["new"] = events["slot"] == first_slot
+    events["retained"] = np.isin(events["code"] - 1, codes, assume_unique=True) & (events["slot"] > 0)
+    events["returned"] = ~events["new"] & ~events["retained"]
+    # Present this month but absent next month: counted as churned in the next month.
+    last_slot = events.groupby("group")["slot"].transform("max")
+    staying = np.isin(events["code"] + 1, codes, assume_unique=True)
+    events["leaves_next"] = ~staying & (events["slot"] < last_slot)
+    return events
+
+
+def churn_by_month(events: pd.DataFrame) -> pd.DataFrame:
+    grouped = events.groupby(["center", "subject", "group", "slot", "month"], sort=True)
+    table = grouped.agg(
+        active=("student", "size"),
+        new=("new", "sum"),
+        returned=("returned", "sum"),
+        retained=("retained", "sum"),
+        leaving=("leaves_next", "sum"),
+    ).reset_index()
+    # Students who left before a month are the previous month's leavers.
+    table["churned"] = table.groupby("group")["leaving"].shift(1).fillna(0).astype(int)
+    previous_active = table.groupby("group")["active"].shift(1)
+    table["retention_rate"] = (table["retained"] / previous_active).round(3)
+    return table[
+        ["center", "subject", "month", "active", "new", "returned", "retained", "churned", "retention_rate"]
+    ]
+
+
+def cohorts(events: pd.DataFrame, horizon: int) -> tuple[pd.DataFrame, pd.DataFrame]:
+    first = events.groupby(["group", "student"])["slot"].transform("min")
+    events = events.assign(cohort_slot=first, age=events["slot"] - first)
+    cohort_month = events[events["age"] == 0][["group", "slot", "month"]].drop_duplicates()
+    cohort_month = cohort_month.rename(columns={"slot": "cohort_slot", "month": "cohort"})
+
+    counts = (
+        events[events["age"] <= horizon]
+        .groupby(["center", "subject", "group", "cohort_slot", "age"])["student"]
+        .size()
+        .unstack("age", fill_value=0)
+    )
+    size = counts[0]
+    share = counts.div(size, axis=0).round(3)
+    # Months a cohort has not reached yet stay blank rather than 0.
+    last_slot = events.groupby("group")["slot"].max()
+    cohort_last = share.index.get_level_values("group").map(last_slot).to_numpy()
+    cohort_first = share.index.get_level_values("cohort_slot").to_numpy()
+    for age in share.columns:
+        share.loc[cohort_first + age > cohort_last, age] = np.nan
+    share.columns = [f"m{age}" for age in share.columns]
+    table = share.reset_index().merge(cohort_month, on=["group", "cohort_slot"])
+    table.insert(3, "size", size.to_numpy())
+    table = table.drop(columns=["cohort_slot"])
+    cohort_table = table[["center", "subject", "cohort", "size"] + list(share.columns)]
+
+    # Retention curve: students still active k months after joining / cohort size, over the
+    # cohorts old enough to have reached month k.
+    long = counts.stack().rename("students").reset_index()
+    long["size"] = long.set_index(["center", "subject", "group", "cohort_slot"]).index.map(size).to_numpy()
+    long["observable"] = long["cohort_slot"] + long["age"] <= long["group"].map(last_slot)
+    long = long[long["observable"]]
+    curve = long.groupby(["center", "subject", "age"])[["students", "size"]].sum().reset_index()
+    curve["retained_pct"] = (100 * curve["students"] / curve["size"]).round(1)
+    curve = curve.rename(columns={"age": "months_since_join", "size": "cohort_students"})
+    return cohort_table, curve
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Month-over-month churn, retention curves and cohort tables.")
+    parser.add_argument("--source", choices=["csv", "db"], default="csv", help="Read a progress CSV or pel.progress.")
+    parser.add_argument(
+        "--csv",
+        default=None,
+        help="Combined progress CSV or DB backup (default: progress.csv, else latest archive/backups backup).",
+    )
+    parser.add_argument("--horizon", type=int, default=12, help="Months tracked per cohort (default: 12).")
+    parser.add_argument("--prefix", default="churn", help="Output file prefix (default: churn).")
+    args = parser.parse_args(argv)
+
+    raw = read_progress(args.source, args.csv, COLUMNS)
+
+    events = month_presence(prepare(raw))
+    monthly = churn_by_month(events)
+    cohort_table, curve = cohorts(events, args.horizon)
+
+    outputs = {
+        f"{args.prefix}_by_month.csv": monthly,
+        f"{args.prefix}_cohorts.csv": cohort_table,
+        f"{args.prefix}_retention_curve.csv": curve,
+    }
+    for path, frame in outputs.items():
+        frame.to_csv(path, index=False)
+        print(f"{path}: {len(frame)} rows")
+
+    latest = monthly[monthly["month"] == monthly["month"].max()]
+    print(latest.to_string(index=False))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
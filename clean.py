@@ -1,5 +1,8 @@
+import argparse
 import os
 import re
+from typing import Optional
+
 import pandas as pd
 
 
@@ -54,86 +57,121 @@ def _canonicalize_progress_columns(df: pd.DataFrame) -> pd.DataFrame:
     return df
 
 
-def turn_into_csv(folder_path, output_folder):
+def convert_workbook(file_path: str, output_folder: str) -> str:
+    df = pd.read_excel(file_path, sheet_name="S")
+    df = df.iloc[3:]
+
+    csv_filename = os.path.basename(file_path).replace(".xlsx", ".csv")
+    csv_path = os.path.join(output_folder, csv_filename)
 
+    df.to_csv(csv_path, index=False,header=False)
+    return csv_path
+
+
+def turn_into_csv(folder_path, output_folder):
+    converted = []
     for filename in os.listdir(folder_path):
         if filename.endswith(".xlsx") :
             print("processing file: "+filename)
 
             file_path = os.path.join(folder_path, filename)
+            converted.append(convert_workbook(file_path, output_folder))
+    return converted
 
-            df = pd.read_excel(file_path, sheet_name="S")
-            df = df.iloc[3:]
 
+def clean_csv_file(file_path: str, nan_threshold: int) -> None:
+    df = pd.read_csv(file_path)
+    df = _canonicalize_progress_columns(df)
 
-            csv_filename = filename.replace(".xlsx", ".csv")
-            csv_path = os.path.join(output_folder, csv_filename)
+    columns_to_drop = [col for col in df.columns if pd.isna(col) or 'Unnamed:' in str(col)]
+    df.drop(columns=columns_to_drop, inplace=True)
 
-            df.to_csv(csv_path, index=False,header=False)
+    # Fallback for unexpected historical files with shifted headers.
+    if "PEL Wks. Level" not in df.columns and len(df.columns) > 10:
+        df = df.rename(columns={df.columns[10]: "PEL Wks. Level"})
+    if "PEL Wks. No." not in df.columns and len(df.columns) > 11:
+        df = df.rename(columns={df.columns[11]: "PEL Wks. No."})
 
 
-def clean_csv_files(folder_path, nan_threshold):
-
-    for filename in os.listdir(folder_path):
-        if filename.endswith(".csv"):
-            file_path = os.path.join(folder_path, filename)
-            
+    cutoff_index = None
 
-            df = pd.read_csv(file_path)
-            df = _canonicalize_progress_columns(df)
+    for i, row in df.iterrows():
+        if row.isna().sum() > nan_threshold:
+            cutoff_index = i
+            break
 
-            columns_to_drop = [col for col in df.columns if pd.isna(col) or 'Unnamed:' in str(col)]
-            df.drop(columns=columns_to_drop, inplace=True)
+    if cutoff_index is not None:
+        df = df.iloc[:cutoff_index]
 
-            # Fallback for unexpected historical files with shifted headers.
-            if "PEL Wks. Level" not in df.columns and len(df.columns) > 10:
-                df = df.rename(columns={df.columns[10]: "PEL Wks. Level"})
-            if "PEL Wks. No." not in df.columns and len(df.columns) > 11:
-                df = df.rename(columns={df.columns[11]: "PEL Wks. No."})
 
+    df.to_csv(file_path, index=False)
 
-            cutoff_index = None
 
-            for i, row in df.iterrows():
-                if row.isna().sum() > nan_threshold:
-                    cutoff_index = i
-                    break
-
-            if cutoff_index is not None:
-                df = df.iloc[:cutoff_index]
-            
+def clean_csv_files(folder_path, nan_threshold):
 
-            df.to_csv(file_path, index=False)
+    for filename in os.listdir(folder_path):
+        if filename.endswith(".csv"):
+            file_path = os.path.join(folder_path, filename)
+            clean_csv_file(file_path, nan_threshold)
             print(f"Processed {filename}")
 
-folder_path = "PAS Fremont"
-output_folder = "PAS Fremont CSV"
 
-folder_path1 = "PAS Milpitas"
-output_folder1 = "PAS Milpitas CSV"
-
-#turn_into_csv(folder_path, output_folder)
-#clean_csv_files(output_folder, nan_threshold=10)
-
-turn_into_csv(folder_path1, output_folder1)
-clean_csv_files(output_folder1, nan_threshold=10)
-
-folders = ["PAS Fremont CSV", "PAS Milpitas CSV"]
-
-for folder_path in folders:
-    for filename in os.listdir(folder_path):
-        if "DEC" in filename.upper():
-
-            digit = filename[-5]
-            if digit.isdigit():
-                if digit == "0":
-                    new_filename = filename[:-6] + "19"
-
-                else:
-                    last_digit = int(digit)
-                    new_last_digit = str(last_digit - 1)
-                    new_filename = filename[:-5] + new_last_digit
-            old_path = os.path.join(folder_path, filename)
-            new_path = os.path.join(folder_path, new_filename+".csv")
-            os.rename(old_path, new_path)
-            print(f"Renamed {filename} to {new_filename}")
+def dec_report_name(filename: str) -> str:
+    # DEC reports are dated in January of the next year; shift the year back so the
+    # file date lands on the December it reports (e.g. DEC 011226 -> DEC 011225).
+    stem = filename[:-4] if filename.lower().endswith(".csv") else filename
+    digit = stem[-1]
+    if not digit.isdigit():
+        return filename
+    if digit == "0":
+        new_stem = stem[:-2] + "19"
+    else:
+        new_stem = stem[:-1] + str(int(digit) - 1)
+    return new_stem + ".csv"
+
+
+def rename_dec_file(csv_path: str) -> str:
+    folder_path, filename = os.path.split(csv_path)
+    if "DEC" not in filename.upper():
+        return csv_path
+    new_filename = dec_report_name(filename)
+    new_path = os.path.join(folder_path, new_filename)
+    os.rename(csv_path, new_path)
+    print(f"Renamed {filename} to {new_filename[:-4]}")
+    return new_path
+
+
+CENTERS = {
+    "Fremont": ("PAS Fremont", "PAS Fremont CSV"),
+    "Milpitas": ("PAS Milpitas", "PAS Milpitas CSV"),
+}
+
+
+def ingest_center(center: str, nan_threshold: int = 10) -> list[str]:
+    folder_path, output_folder = CENTERS[center]
+    converted = turn_into_csv(folder_path, output_folder)
+    clean_csv_files(output_folder, nan_threshold=nan_threshold)
+
+    # Only shift files converted in this run; already-renamed DEC files stay as they are.
+    return [rename_dec_file(csv_path) for csv_path in converted]
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Convert PAS workbooks to CSV and clean them.")
+    parser.add_argument(
+        "--center",
+        nargs="+",
+        choices=list(CENTERS),
+        default=["Milpitas"],
+        help="Centers to convert (default: Milpitas).",
+    )
+    parser.add_argument("--nan-threshold", type=int, default=10, help="Cut a file at the first row with more blanks.")
+    args = parser.parse_args(argv)
+
+    for center in args.center:
+        ingest_center(center, args.nan_threshold)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,93 @@
+import pandas as pd
+# Student DOB / enrollment date parsing for student_combine.py, validate_to_load.py and the loaders.
+# Each distinct raw value is parsed once (the same students repeat every month) by trying the
+# formats seen in the PAS sheets in turn; anything left over is NaT and reported by the validator.
+
+EXCEL_EPOCH = pd.Timestamp("1899-12-30")
+# Excel serials 10000..80000 are 1927-05-18..2119-01-10; shorter numbers are not dates.
+SERIAL_RANGE = (10000, 80000)
+YEAR_RANGE = (1900, 2100)
+MONTHS = {name: number for number, name in enumerate(
+    ["jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"], start=1
+)}
+TIME = r"(?:[ T]\d{1,2}:\d{2}(?::\d{2})?(?:\.\d+)?(?: ?[AaPp][Mm])?)?"
+# (regex, order of the captured year/month/day groups)
+FORMATS = [
+    (rf"^(\d{{4}})-(\d{{1,2}})-(\d{{1,2}}){TIME}$", "ymd"),  # 2016-05-14 00:00:00
+    (rf"^(\d{{1,2}}) ?[/.-] ?(\d{{1,2}}) ?[/.-] ?(\d{{4}}|\d{{2}}){TIME}$", "mdy"),  # 5/14/2016 0:00, 5-14-16
+    (r"^(\d{1,2})-([A-Za-z]{3})[a-z]*-(\d{4}|\d{2})$", "dmy"),  # 3-Jul-24
+    (r"^([A-Za-z]{3})[a-z]*\.? ?(\d{1,2}),? (\d{4})$", "mdy"),  # Oct.1, 2023 / Jul 3, 2024
+]
+
+# Raw student date column -> typed column written next to it by student_combine.py.
+STUDENT_DATE_COLUMNS = {
+    "DOB (MM/DD/YY)": "DOB",
+    "DOE (Date of Enrollment MM/DD/YY)": "Enrollment Date",
+}
+ENROLLMENT_COLUMN = "DOE (Date of Enrollment MM/DD/YY)"
+# A two-digit year is 20yy unless that lands after the column's pivot: today for a DOB (5/28/68 is
+# 1968), a year ahead for an enrollment date, which is often entered early (11/1/26 is 2026).
+PIVOT_YEARS = {ENROLLMENT_COLUMN: 1}
+# Earliest enrollment in the PAS sheets is April 2016 (Milpitas); earlier DOE values are typos.
+CENTERS_OPENED = pd.Timestamp("2016-01-01")
+
+# Parsed values per pivot date.
+_cache: dict[pd.Timestamp, dict[str, pd.Timestamp]] = {}
+
+
+def _month_number(month: pd.Series) -> pd.Series:
+    numeric = pd.to_numeric(month, errors="coerce")
+    named = month.str.lower().map(MONTHS)
+    return numeric.fillna(named)
+
+
+def _parse_unique(text: pd.Series, pivot: pd.Timestamp) -> pd.Series:
+    parsed = pd.Series(pd.NaT, index=text.index, dtype="datetime64[ns]")
+    todo = pd.Series(True, index=text.index)
+    for pattern, order in FORMATS:
+        parts = text[todo].str.extract(pattern)
+        parts = parts[parts.notna().all(axis=1)]
+        if parts.empty:
+            continue
+        parts.columns = list(order)
+        year = pd.to_numeric(parts["y"], errors="coerce")
+        short = parts["y"].str.len() == 2
+        year = year.where(~short, 2000 + year)
+        year = year.where(year.between(*YEAR_RANGE))
+        parts = parts.assign(
+            year=year.astype("float64"),
+            month=_month_number(parts["m"]).astype("float64"),
+            day=pd.to_numeric(parts["d"], errors="coerce").astype("float64"),
+        )
+        dates = pd.to_datetime(parts[["year", "month", "day"]], errors="coerce").astype("datetime64[ns]")
+        future = short & (dates > pivot)
+        dates = dates.where(~future, dates - pd.DateOffset(years=100))
+        parsed.loc[dates.index] = dates
+        todo.loc[dates.index[dates.notna()]] = False
+
+    serial = pd.to_numeric(text[todo].str.replace(r"\.0+$", "", regex=True), errors="coerce")
+    serial = serial[serial.between(*SERIAL_RANGE) & (serial == serial.round())]
+    parsed.loc[serial.index] = EXCEL_EPOCH + pd.to_timedelta(serial, unit="D")
+    return parsed
+
+
+def parse_dates(values: pd.Series, today: pd.Timestamp | None = None, column: str | None = None) -> pd.Series:
+    today = pd.Timestamp.today().normalize() if today is None else today
+    pivot = today + pd.DateOffset(years=PIVOT_YEARS.get(column, 0))
+    cache = _cache.setdefault(pivot, {})
+    codes, uniques = pd.factorize(values.astype("string").str.strip(), use_na_sentinel=True)
+    unique_values = pd.Series(uniques, dtype="string")
+    todo = unique_values[~unique_values.isin(list(cache))]
+    if len(todo):
+        cache.update(zip(todo.tolist(), _parse_unique(todo.reset_index(drop=True), pivot).tolist()))
+    mapped = pd.DatetimeIndex([cache[value] for value in unique_values.tolist()] + [pd.NaT]).to_numpy()
+    return pd.Series(mapped[codes], index=values.index, dtype="datetime64[ns]")
+
+
+def format_dates(values: pd.Series, column: str | None = None) -> pd.Series:
+    # ISO dates for the CSV, so the COPY into a date column needs no server-side parsing.
+    return parse_dates(values, column=column).dt.strftime("%Y-%m-%d").astype("string")
+
+
+def clear_cache() -> None:
+    _cache.clear()
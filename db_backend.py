@@ -0,0 +1,216 @@
+import argparse
+import csv
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Optional
+# Where the loaders connect. "postgres" is the DATABASE_URL database (Neon in production);
+# "embedded" is a throwaway local Postgres (pgserver) with the pel schema from pel_schema.sql,
+# so the loaders' SQL can be run, tested and timed offline. Select with PEL_BACKEND.
+
+BASE_DIR = Path(__file__).resolve().parent
+SCHEMA_FILE = BASE_DIR / "pel_schema.sql"
+EMBEDDED_DIR = BASE_DIR / ".pel_embedded"
+BACKUP_DIR = BASE_DIR / "archive" / "backups"
+
+
+def connect_url(url: str):
+    try:
+        import psycopg  # type: ignore
+
+        return "psycopg", psycopg.connect(url)
+    except ModuleNotFoundError:
+        try:
+            import psycopg2  # type: ignore
+
+            return "psycopg2", psycopg2.connect(url)
+        except ModuleNotFoundError as exc:
+            raise RuntimeError("Install psycopg (v3) or psycopg2 to use this loader.") from exc
+
+
+class PostgresBackend:
+    name = "postgres"
+
+    def __init__(self, url: str):
+        self.url = url
+
+    def connect(self):
+        return connect_url(self.url)
+
+
+class EmbeddedBackend(PostgresBackend):
+    name = "embedded"
+
+    def __init__(self, data_dir: Path = EMBEDDED_DIR):
+        try:
+            import pgserver  # type: ignore
+        except ModuleNotFoundError as exc:
+            raise RuntimeError("Install pgserver (pip install pgserver) to use the embedded backend.") from exc
+        # The server stops when this process exits; data stays in data_dir between runs.
+        self.server = pgserver.get_server(data_dir)
+        super().__init__(self.server.get_uri())
+        self.data_dir = data_dir
+        if not self.has_schema():
+            self.apply_schema()
+
+    def has_schema(self) -> bool:
+        driver, conn = self.connect()
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT to_regclass('pel.progress') IS NOT NULL")
+                return bool(cur.fetchone()[0])
+        finally:
+            conn.close()
+
+    def apply_schema(self) -> None:
+        driver, conn = self.connect()
+        try:
+            with conn.cursor() as cur:
+                cur.execute(SCHEMA_FILE.read_text(encoding="utf-8"))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def reset(self) -> None:
+        driver, conn = self.connect()
+        try:
+            with conn.cursor() as cur:
+                cur.execute("DROP SCHEMA IF EXISTS pel CASCADE")
+            conn.commit()
+        finally:
+            conn.close()
+        self.apply_schema()
+
+    def seed(self, students_csv: Path, progress_csv: Path, repeat: int = 1) -> dict[str, int]:
+        driver, conn = self.connect()
+        try:
+            counts = {}
+            for table, path in [("students", students_csv), ("progress", progress_csv)]:
+                with open(path, "r", encoding="utf-8", newline="") as handle:
+                    columns = ", ".join(next(csv.reader(handle)))
+                copy_sql = f"COPY pel.{table} ({columns}) FROM STDIN WITH (FORMAT csv, HEADER true)"
+                with conn.cursor() as cur:
+                    with open(path, "r", encoding="utf-8", newline="") as handle:
+                        if driver == "psycopg":
+                            with cur.copy(copy_sql) as copy:
+                                while True:
+                                    chunk = handle.read(65536)
+                                    if not chunk:
+                                        break
+                                    copy.write(chunk)
+                        else:
+                            cur.copy_expert(copy_sql, handle)
+            with conn.cursor() as cur:
+                if repeat > 1:
+                    # Grow history for benchmarks: copies of every progress row under new names.
+                    cur.execute(
+                        "INSERT INTO pel.progress (first_name, last_name, email, subject, pel_wks_level, "
+                        "pel_wks_no, progress_date, full_name, center, lvs) "
+                        "SELECT first_name, last_name, email, subject, pel_wks_level, pel_wks_no, "
+                        "progress_date, full_name || ' #' || n, center, lvs "
+                        "FROM pel.progress CROSS JOIN generate_series(2, %s) AS n",
+                        (repeat,),
+                    )
+                for table, id_col in [("students", "student_id"), ("progress", "progress_id")]:
+                    cur.execute(
+                        f"SELECT setval(pg_get_serial_sequence('pel.{table}', '{id_col}'), "
+                        f"COALESCE((SELECT MAX({id_col}) FROM pel.{table}), 1))"
+                    )
+                    cur.execute(f"SELECT COUNT(*) FROM pel.{table}")
+                    counts[table] = int(cur.fetchone()[0])
+            conn.commit()
+        finally:
+            conn.close()
+        return counts
+
+
+_backend = None
+
+
+def current_backend() -> PostgresBackend:
+    global _backend
+    if _backend is None:
+        if os.environ.get("PEL_BACKEND", "postgres") == "embedded":
+            _backend = EmbeddedBackend(Path(os.environ.get("PEL_EMBEDDED_DIR", EMBEDDED_DIR)))
+        else:
+            _backend = PostgresBackend(os.environ["DATABASE_URL"])
+    return _backend
+
+
+def latest_backup(kind: str) -> Path:
+    backups = sorted(BACKUP_DIR.glob(f"backup_pel_{kind}_*.csv"))
+    if not backups:
+        raise SystemExit(f"No backup_pel_{kind}_*.csv in {BACKUP_DIR}")
+    return backups[-1]
+
+
+def embedded_env(backend: EmbeddedBackend) -> dict[str, str]:
+    # DATABASE_URL points at the embedded server too, so nothing in the child reaches production.
+    env = dict(os.environ)
+    env["PEL_BACKEND"] = "embedded"
+    env["PEL_EMBEDDED_DIR"] = str(backend.data_dir)
+    env["DATABASE_URL"] = backend.url
+    return env
+
+
+def run_script(backend: EmbeddedBackend, script: str, script_args: list[str]) -> tuple[int, float]:
+    started = time.perf_counter()
+    code = subprocess.call([sys.executable, script, *script_args], env=embedded_env(backend), cwd=BASE_DIR)
+    return code, time.perf_counter() - started
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Embedded (throwaway local Postgres) pel database.")
+    parser.add_argument("--dir", default=str(EMBEDDED_DIR), help=f"Data directory (default: {EMBEDDED_DIR.name}).")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    reset_parser = sub.add_parser("reset", help="Recreate the pel schema, optionally seeded from backups.")
+    reset_parser.add_argument("--seed", action="store_true", help="Load the latest archive/backups CSVs.")
+    reset_parser.add_argument("--repeat", type=int, default=1, help="Copies of the progress history to seed.")
+
+    sub.add_parser("url", help="Print the embedded connection URL (server runs only while this command runs).")
+
+    run_parser = sub.add_parser("run", help="Run a script against the embedded database.")
+    run_parser.add_argument("script")
+    run_parser.add_argument("script_args", nargs=argparse.REMAINDER)
+
+    bench_parser = sub.add_parser("bench", help="Reset, seed, then time the loaders on the to-load files.")
+    bench_parser.add_argument("--repeat", type=int, default=1, help="Copies of the progress history to seed.")
+    bench_parser.add_argument(
+        "--scripts",
+        nargs="+",
+        default=["load_student_csv.py", "load_progress_csv.py"],
+        help="Scripts to time, in order (default: the two loaders).",
+    )
+    args = parser.parse_args(argv)
+
+    backend = EmbeddedBackend(Path(args.dir))
+    if args.command == "url":
+        print(backend.url)
+        return 0
+    if args.command == "run":
+        code, seconds = run_script(backend, args.script, args.script_args)
+        print(f"[embedded] {args.script} exited {code} in {seconds:.2f}s")
+        return code
+
+    backend.reset()
+    if args.command == "reset" and not args.seed:
+        print("Embedded pel schema recreated (empty).")
+        return 0
+    counts = backend.seed(latest_backup("students"), latest_backup("progress"), args.repeat)
+    print(f"Seeded: {counts['students']} students, {counts['progress']} progress rows")
+    if args.command == "reset":
+        return 0
+
+    for script in args.scripts:
+        code, seconds = run_script(backend, script, [])
+        print(f"[bench] {script}: exit {code}, {seconds:.2f}s")
+        if code != 0:
+            return code
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,105 @@
+import numpy as np
+import pandas as pd
+# Column dtypes for the combined progress/student frames, applied once at ingest.
+# Low-cardinality text becomes categorical, free text becomes (Arrow-backed when available) strings.
+
+try:
+    import pyarrow  # type: ignore  # noqa: F401
+
+    TEXT = pd.StringDtype("pyarrow")
+except ModuleNotFoundError:
+    TEXT = pd.StringDtype("python")
+
+CENTER = pd.CategoricalDtype(["Fremont", "Milpitas"])
+SUBJECT = pd.CategoricalDtype(["English", "Math"])
+
+PROGRESS_DTYPES = {
+    "First Name": TEXT,
+    "Last Name": TEXT,
+    "Full Name": TEXT,
+    "Email": TEXT,
+    "Subject (M/E)": "category",
+    "Subject": SUBJECT,
+    "PEL Wks. Level": "category",
+    "lvs": "Int64",
+    "PEL Wks. No.": TEXT,
+    "Notes": TEXT,
+    "Date": "datetime64[s]",
+    "Center": CENTER,
+}
+
+STUDENT_DTYPES = {
+    "First Name": TEXT,
+    "Last Name": TEXT,
+    "Full Name": TEXT,
+    "DOB (MM/DD/YY)": TEXT,
+    "Address": TEXT,
+    "Tel:": TEXT,
+    "Source": "category",
+    "Email": TEXT,
+    "DOE (Date of Enrollment MM/DD/YY)": TEXT,
+    "Center": CENTER,
+}
+
+
+def apply_dtype_plan(df: pd.DataFrame, plan: dict) -> pd.DataFrame:
+    for col, dtype in plan.items():
+        if col not in df.columns or df[col].dtype == dtype:
+            continue
+        if isinstance(dtype, pd.StringDtype) and not pd.api.types.is_string_dtype(df[col]):
+            # Numbers read from CSV (e.g. PEL Wks. No. 35.0) keep their integer text.
+            df[col] = df[col].astype("string").str.replace(r"\.0$", "", regex=True).astype(dtype)
+        else:
+            df[col] = df[col].astype(dtype)
+    return df
+
+
+def normalized_category(series: pd.Series, func) -> pd.Series:
+    # Run func once per distinct raw value and keep the result as a categorical.
+    codes, uniques = pd.factorize(series, use_na_sentinel=True)
+    cleaned = np.array([func(v) for v in uniques] + [None], dtype=object)
+    return pd.Series(pd.Categorical(cleaned[codes]), index=series.index)
+
+
+def concat_planned(frames) -> pd.DataFrame:
+    frames = [f for f in frames if f is not None]
+    if not frames:
+        raise ValueError("No frames to combine.")
+    # pd.concat falls back to object when categories differ; align them first.
+    for col in frames[0].columns:
+        if not all(isinstance(f[col].dtype, pd.CategoricalDtype) for f in frames if col in f.columns):
+            continue
+        categories = pd.Index([])
+        for f in frames:
+            if col in f.columns:
+                categories = categories.union(f[col].cat.categories)
+        for f in frames:
+            if col in f.columns:
+                f[col] = f[col].cat.set_categories(categories)
+    return pd.concat(frames, ignore_index=True)
+
+
+def legacy_frame(df: pd.DataFrame) -> pd.DataFrame:
+    # The pre-plan representation: every text column as Python object strings.
+    legacy = df.copy()
+    for col in legacy.columns:
+        dtype = legacy[col].dtype
+        if isinstance(dtype, pd.CategoricalDtype) or pd.api.types.is_string_dtype(dtype):
+            legacy[col] = legacy[col].astype(object)
+    return legacy
+
+
+def memory_report(before: pd.DataFrame, after: pd.DataFrame) -> pd.DataFrame:
+    report = pd.DataFrame(
+        {
+            "before_dtype": before.dtypes.astype(str),
+            "after_dtype": after.dtypes.astype(str),
+            "before_bytes": before.memory_usage(deep=True, index=False),
+            "after_bytes": after.memory_usage(deep=True, index=False),
+        }
+    )
+    report.loc["TOTAL"] = ["", "", report["before_bytes"].sum(), report["after_bytes"].sum()]
+    report["saved_pct"] = (
+        100 * (1 - report["after_bytes"] / report["before_bytes"].where(report["before_bytes"] > 0))
+    ).round(1)
+    return report
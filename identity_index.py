@@ -0,0 +1,144 @@
+import argparse
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+import pandas as pd
+
+from load_progress_csv import get_connection, load_dotenv
+# Local identity index: normalized (full name, email) -> student_id, refreshed from pel.students.
+# The combine scripts use it (--resolve-ids) to write a "Student ID" on every student and progress
+# row. Students not in the DB yet get an id from the pel.students sequence, kept in the index so
+# both combine outputs and later months reuse it; load_student_csv.py inserts that id as given.
+
+BASE_DIR = Path(__file__).resolve().parent
+INDEX_CSV = BASE_DIR / "identity_index.csv"
+INDEX_COLUMNS = ["name_key", "email_key", "student_id", "origin", "updated_at"]
+KEY = ["name_key", "email_key"]
+
+STUDENTS_SQL = "SELECT student_id, full_name, email FROM pel.students"
+ALLOCATE_SQL = "SELECT nextval(pg_get_serial_sequence('pel.students', 'student_id')) FROM generate_series(1, %s)"
+
+
+def identity_keys(full_name: pd.Series, email: pd.Series) -> pd.DataFrame:
+    # Case and spacing differences are the same student; a missing email (or the old combine's
+    # 'nan') is an empty key part. Same expressions as key_columns.NAME_KEY_SQL / EMAIL_KEY_SQL.
+    name = full_name.astype("string").str.strip().str.replace(r"\s+", " ", regex=True).str.lower()
+    mail = email.astype("string").str.replace(r"\s+", "", regex=True).str.lower()
+    mail = mail.mask(mail == "nan")
+    return pd.DataFrame({"name_key": name.fillna(""), "email_key": mail.fillna("")}, index=full_name.index)
+
+
+def read_index(path: Path = INDEX_CSV) -> pd.DataFrame:
+    if not path.exists():
+        return pd.DataFrame(columns=INDEX_COLUMNS).astype({"student_id": "Int64"})
+    index = pd.read_csv(path, dtype="string", keep_default_na=False)
+    # Keys written before 'nan' normalized to '' would now collide with the '' entry.
+    index.loc[index["email_key"] == "nan", "email_key"] = ""
+    return index.drop_duplicates(KEY).astype({"student_id": "Int64"})[INDEX_COLUMNS]
+
+
+def refresh_index(conn, index: pd.DataFrame) -> pd.DataFrame:
+    with conn.cursor() as cur:
+        cur.execute(STUDENTS_SQL)
+        rows = cur.fetchall()
+    students = pd.DataFrame(rows, columns=["student_id", "full_name", "email"])
+    db = identity_keys(students["full_name"], students["email"]).assign(
+        student_id=pd.array(students["student_id"], dtype="Int64"), origin="db"
+    )
+    # Duplicate students in the DB: the oldest id wins, like the post-load link did in practice.
+    db = db.sort_values("student_id").drop_duplicates(KEY).assign(updated_at=datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+    # Keep allocated ids whose student has not been loaded yet; the DB wins for everything else.
+    pending = index[(index["origin"] == "allocated") & ~pd.MultiIndex.from_frame(index[KEY]).isin(pd.MultiIndex.from_frame(db[KEY]))]
+    return pd.concat([db[INDEX_COLUMNS], pending], ignore_index=True)
+
+
+def allocate_ids(conn, count: int) -> list[int]:
+    if not count:
+        return []
+    with conn.cursor() as cur:
+        cur.execute(ALLOCATE_SQL, (count,))
+        ids = [int(row[0]) for row in cur.fetchall()]
+    conn.commit()
+    return ids
+
+
+def resolve_ids(conn, index: pd.DataFrame, keys: pd.DataFrame) -> tuple[pd.Series, pd.DataFrame]:
+    known = index.set_index(KEY)["student_id"]
+    key_index = pd.MultiIndex.from_frame(keys[KEY])
+    missing = keys[~key_index.isin(known.index)].drop_duplicates(KEY)
+    # One round trip for every new student in the batch.
+    new_ids = allocate_ids(conn, len(missing))
+    if new_ids:
+        allocated = missing.assign(
+            student_id=pd.array(new_ids, dtype="Int64"),
+            origin="allocated",
+            updated_at=datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        )
+        index = pd.concat([index, allocated[INDEX_COLUMNS]], ignore_index=True)
+        known = index.set_index(KEY)["student_id"]
+    positions = known.index.get_indexer(key_index)
+    ids = pd.Series(known.to_numpy()[positions], index=keys.index, dtype="Int64")
+    return ids, index
+
+
+class IdentityIndex:
+    # Open once per combine run: one refresh from pel.students, then add_ids() per frame or chunk.
+
+    def __init__(self, path: Path = INDEX_CSV):
+        load_dotenv(BASE_DIR / ".env")
+        if "DATABASE_URL" not in os.environ:
+            raise RuntimeError("--resolve-ids needs pel.students: DATABASE_URL is not set. Put it in .env or set it in your shell.")
+        self.path = path
+        self.rows = 0
+        self.driver, self.conn = get_connection()
+        self.index = refresh_index(self.conn, read_index(path))
+        self.allocated_before = int((self.index["origin"] == "allocated").sum())
+
+    def add_ids(self, df: pd.DataFrame) -> pd.DataFrame:
+        ids, self.index = resolve_ids(self.conn, self.index, identity_keys(df["Full Name"], df["Email"]))
+        self.rows += len(df)
+        df = df.drop(columns=["Student ID"], errors="ignore")
+        df.insert(df.columns.get_loc("Email") + 1, "Student ID", ids)
+        return df
+
+    def close(self) -> None:
+        self.conn.close()
+        self.index.to_csv(self.path, index=False)
+        allocated = int((self.index["origin"] == "allocated").sum()) - self.allocated_before
+        print(f"Student IDs resolved for {self.rows} rows ({allocated} new ids allocated) -> {self.path.name}")
+
+
+def add_student_ids(df: pd.DataFrame, path: Path = INDEX_CSV) -> pd.DataFrame:
+    identities = IdentityIndex(path)
+    try:
+        return identities.add_ids(df)
+    finally:
+        identities.close()
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Refresh the local identity index from pel.students.")
+    parser.add_argument("--index", default=str(INDEX_CSV), help="Index CSV (default: identity_index.csv).")
+    args = parser.parse_args(argv)
+
+    load_dotenv(BASE_DIR / ".env")
+    if "DATABASE_URL" not in os.environ:
+        print("DATABASE_URL is not set. Put it in .env or set it in your shell.")
+        return 1
+
+    path = Path(args.index)
+    driver, conn = get_connection()
+    try:
+        index = refresh_index(conn, read_index(path))
+    finally:
+        conn.close()
+    index.to_csv(path, index=False)
+    counts = index["origin"].value_counts()
+    print(f"{path.name}: {int(counts.get('db', 0))} students from pel.students, {int(counts.get('allocated', 0))} allocated, not loaded yet")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
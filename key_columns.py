@@ -0,0 +1,148 @@
+import argparse
+import os
+from pathlib import Path
+from typing import Optional
+
+from db_backend import current_backend
+# Generated normalized-key columns on pel.students and pel.progress: name_key (trimmed,
+# whitespace-collapsed, lowercased full_name) and email_key (whitespace-free, lowercased email),
+# both '' instead of NULL, with an index on (name_key, email_key). Once migrated, the loaders
+# and progress_diff.py match on them with plain equality, so inserts, the student_id link and
+# lookups are indexed hash/nested-loop joins instead of IS NOT DISTINCT FROM scans.
+
+BASE_DIR = Path(__file__).resolve().parent
+TABLES = ["students", "progress"]
+KEY_COLUMNS = ["name_key", "email_key"]
+
+# Same normalization as identity_index.identity_keys; all functions immutable, as generated
+# columns require.
+NAME_KEY_SQL = "lower(regexp_replace(btrim(coalesce({col}, '')), '\\s+', ' ', 'g'))"
+# 'nan' is how the old combine wrote a missing email, so it is the same key as NULL.
+EMAIL_KEY_SQL = "coalesce(nullif(lower(regexp_replace(coalesce({col}, ''), '\\s+', '', 'g')), 'nan'), '')"
+
+# The combine scripts before name_normalize.py wrote a missing email as the text 'nan'; the
+# loaders' raw-text matching then treats those rows as different from the NULL-email rows
+# written now. One-off: turn them into NULL (run by migrate, or on its own).
+NAN_EMAIL_SQL = "UPDATE pel.{table} SET email = NULL WHERE lower(btrim(email)) = 'nan'"
+
+KEY_COLUMNS_SQL = (
+    "SELECT COUNT(*) FROM information_schema.columns "
+    "WHERE table_schema = 'pel' AND table_name = %s AND is_generated = 'ALWAYS' "
+    "AND column_name IN ('name_key', 'email_key')"
+)
+# email_key columns added before 'nan' was folded into '' keep the old expression until re-added.
+STALE_EMAIL_KEY_SQL = (
+    "SELECT COUNT(*) FROM information_schema.columns "
+    "WHERE table_schema = 'pel' AND table_name = %s AND column_name = 'email_key' "
+    "AND generation_expression NOT LIKE '%%''nan''%%'"
+)
+STORED_COLUMNS_SQL = (
+    "SELECT column_name FROM information_schema.columns "
+    "WHERE table_schema = 'pel' AND table_name = %s AND is_generated = 'NEVER' ORDER BY ordinal_position"
+)
+
+
+def name_key(col: str) -> str:
+    return NAME_KEY_SQL.format(col=col)
+
+
+def email_key(col: str) -> str:
+    return EMAIL_KEY_SQL.format(col=col)
+
+
+def key_match(dest: str, src: str) -> str:
+    # dest has the generated columns; src is a staging table, so its keys are computed inline.
+    return f"{dest}.name_key = {name_key(f'{src}.full_name')} AND {dest}.email_key = {email_key(f'{src}.email')}"
+
+
+def table_has_keys(cur, table: str) -> bool:
+    cur.execute(KEY_COLUMNS_SQL, (table,))
+    return int(cur.fetchone()[0]) == len(KEY_COLUMNS)
+
+
+def has_key_columns(conn, table: str) -> bool:
+    with conn.cursor() as cur:
+        return table_has_keys(cur, table)
+
+
+def stored_columns(cur, table: str) -> list[str]:
+    # Columns an INSERT may name; generated columns are computed by the table itself.
+    cur.execute(STORED_COLUMNS_SQL, (table,))
+    return [row[0] for row in cur.fetchall()]
+
+
+def stale_email_key(cur, table: str) -> bool:
+    cur.execute(STALE_EMAIL_KEY_SQL, (table,))
+    return int(cur.fetchone()[0]) > 0
+
+
+def migrate_sql(table: str, stale: bool = False) -> list[str]:
+    # Generated expressions cannot be altered before PostgreSQL 17, so a stale email_key is re-added.
+    replace = [
+        f"DROP INDEX IF EXISTS pel.{table}_identity_key_idx",
+        f"ALTER TABLE pel.{table} DROP COLUMN email_key",
+    ] if stale else []
+    return replace + [
+        f"ALTER TABLE pel.{table} "
+        f"ADD COLUMN IF NOT EXISTS name_key text GENERATED ALWAYS AS ({name_key('full_name')}) STORED, "
+        f"ADD COLUMN IF NOT EXISTS email_key text GENERATED ALWAYS AS ({email_key('email')}) STORED",
+        f"CREATE INDEX IF NOT EXISTS {table}_identity_key_idx ON pel.{table} (name_key, email_key)",
+        f"ANALYZE pel.{table}",
+    ]
+
+
+def drop_sql(table: str) -> list[str]:
+    return [
+        f"DROP INDEX IF EXISTS pel.{table}_identity_key_idx",
+        f"ALTER TABLE pel.{table} DROP COLUMN IF EXISTS name_key, DROP COLUMN IF EXISTS email_key",
+    ]
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Add or drop the normalized key columns on pel tables.")
+    parser.add_argument(
+        "command",
+        choices=["migrate", "drop", "status", "clean-emails"],
+        help="migrate: clean 'nan' emails, add columns + indexes; clean-emails: only the 'nan' -> NULL update.",
+    )
+    parser.add_argument("--tables", nargs="+", choices=TABLES, default=TABLES, help="Tables (default: both).")
+    args = parser.parse_args(argv)
+
+    # Imported here: load_progress_csv imports this module.
+    from load_progress_csv import load_dotenv
+
+    load_dotenv(BASE_DIR / ".env")
+    if "DATABASE_URL" not in os.environ:
+        print("DATABASE_URL is not set. Put it in .env or set it in your shell.")
+        return 1
+
+    driver, conn = current_backend().connect()
+    try:
+        for table in args.tables:
+            if args.command in ("migrate", "clean-emails"):
+                with conn.cursor() as cur:
+                    cur.execute(NAN_EMAIL_SQL.format(table=table))
+                    print(f"pel.{table}: {cur.rowcount} 'nan' emails set to NULL")
+                conn.commit()
+            if args.command in ("migrate", "drop"):
+                # One transaction per table: the rewrite for the stored columns locks it meanwhile.
+                with conn.cursor() as cur:
+                    if args.command == "migrate":
+                        statements = migrate_sql(table, stale_email_key(cur, table))
+                    else:
+                        statements = drop_sql(table)
+                    for sql in statements:
+                        cur.execute(sql)
+                conn.commit()
+            state = "normalized keys" if has_key_columns(conn, table) else "no key columns"
+            print(f"pel.{table}: {state}")
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,144 @@
+import difflib
+import re
+from functools import lru_cache
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+import numpy as np
+import pandas as pd
+# Parses PEL worksheet level codes (EG6, MG9, EK1, EG2B, MM2-16, MHT) and maps them to
+# subject and lvs using worksheets.csv. Lookups run once per distinct code.
+
+WORKSHEETS_CSV = Path(__file__).resolve().parent / "worksheets.csv"
+
+SUBJECTS = {"E": "English", "M": "Math"}
+
+LEVEL_RE = re.compile(
+    r"^(?P<subject>[EM])(?P<series>[A-Z])(?P<sublevel>\d+)?(?P<variant>[A-Z]?)(?:-(?P<page>\d+))?$"
+)
+
+
+class LevelCode(NamedTuple):
+    code: str
+    subject: str
+    series: str
+    sublevel: Optional[int]
+    variant: str
+    page: Optional[int]
+
+    @property
+    def base(self) -> str:
+        sublevel = "" if self.sublevel is None else str(self.sublevel)
+        return f"{self.subject}{self.series}{sublevel}{self.variant}"
+
+
+def clean_code(value) -> str:
+    if value is None or value is pd.NA or (isinstance(value, float) and np.isnan(value)):
+        return ""
+    return re.sub(r"\s+", "", str(value)).upper()
+
+
+@lru_cache(maxsize=None)
+def parse_level(value: str) -> Optional[LevelCode]:
+    code = clean_code(value)
+    match = LEVEL_RE.match(code)
+    if not match:
+        return None
+    sublevel = match.group("sublevel")
+    page = match.group("page")
+    return LevelCode(
+        code=code,
+        subject=match.group("subject"),
+        series=match.group("series"),
+        sublevel=int(sublevel) if sublevel else None,
+        variant=match.group("variant"),
+        page=int(page) if page else None,
+    )
+
+
+@lru_cache(maxsize=None)
+def level_table(path: Path = WORKSHEETS_CSV) -> pd.DataFrame:
+    worksheets = pd.read_csv(path, dtype={"PEL Wks. Level": "string"})
+    codes = worksheets["PEL Wks. Level"].map(clean_code)
+    table = pd.DataFrame(
+        {
+            "lvs": pd.to_numeric(worksheets["Lvs Value"], errors="coerce").astype("Int64").values,
+        },
+        index=pd.Index(codes.values, name="code"),
+    )
+    table = table[~table.index.duplicated(keep="first")]
+    table["subject"] = [SUBJECTS.get(code[:1], "Math") for code in table.index]
+    return table
+
+
+def level_dtype(path: Path = WORKSHEETS_CSV) -> pd.CategoricalDtype:
+    return pd.CategoricalDtype(categories=level_table(path).index)
+
+
+def subject_for_code(code: str) -> str:
+    # Historical rule: anything that does not start with E is Math.
+    return "English" if code.startswith("E") else "Math"
+
+
+def normalize_level_codes(series: pd.Series) -> pd.Series:
+    codes, uniques = pd.factorize(series, use_na_sentinel=True)
+    cleaned = np.array([clean_code(v) for v in uniques] + [""], dtype=object)
+    out = pd.Series(cleaned[codes], index=series.index, dtype="string")
+    return out.mask(out == "")
+
+
+def lookup_levels(levels: pd.Series, path: Path = WORKSHEETS_CSV) -> pd.DataFrame:
+    table = level_table(path)
+    if isinstance(levels.dtype, pd.CategoricalDtype):
+        # Already normalized at ingest: work on the categories and take by code.
+        codes = levels.cat.codes.to_numpy()
+        uniques = list(levels.cat.categories)
+    else:
+        codes, uniques = pd.factorize(normalize_level_codes(levels), use_na_sentinel=True)
+        uniques = list(uniques)
+
+    positions = table.index.get_indexer(uniques)
+    lvs_values = table["lvs"].to_numpy(dtype="float64", na_value=np.nan)
+    unique_lvs = np.append(np.where(positions >= 0, lvs_values[positions], np.nan), np.nan)
+    unique_subject = np.array([subject_for_code(u) for u in uniques] + [pd.NA], dtype=object)
+
+    return pd.DataFrame(
+        {
+            "level": pd.Categorical(
+                np.array(uniques + [pd.NA], dtype=object)[codes],
+                categories=pd.Index(uniques).union(table.index),
+            ),
+            "subject": pd.Categorical(unique_subject[codes], categories=list(SUBJECTS.values())),
+            "lvs": pd.array(unique_lvs[codes], dtype="Float64").astype("Int64"),
+        },
+        index=levels.index,
+    )
+
+
+def suggest_levels(code: str, limit: int = 3, path: Path = WORKSHEETS_CSV) -> list[str]:
+    known = list(level_table(path).index)
+    same_subject = [k for k in known if k[:1] == clean_code(code)[:1]]
+    parsed = parse_level(code)
+    suggestions = []
+    if parsed and parsed.base in known and parsed.base != parsed.code:
+        suggestions.append(parsed.base)
+    for match in difflib.get_close_matches(clean_code(code), same_subject or known, n=limit, cutoff=0.5):
+        if match not in suggestions:
+            suggestions.append(match)
+    return suggestions[:limit]
+
+
+def unknown_levels(levels: pd.Series, path: Path = WORKSHEETS_CSV) -> pd.DataFrame:
+    if isinstance(levels.dtype, pd.CategoricalDtype):
+        counts = levels.value_counts()
+        counts = counts[(counts > 0) & ~counts.index.isin(level_table(path).index)]
+    else:
+        codes = normalize_level_codes(levels).dropna()
+        counts = codes[~codes.isin(level_table(path).index)].value_counts()
+    return pd.DataFrame(
+        {
+            "code": counts.index.astype(str),
+            "rows": counts.values,
+            "suggestions": [", ".join(suggest_levels(c, path=path)) for c in counts.index],
+        }
+    )
@@ -0,0 +1,217 @@
+import argparse
+import asyncio
+import os
+import time
+from pathlib import Path
+from typing import Optional
+
+import key_columns
+import load_progress_csv as progress_loader
+import load_student_csv as student_loader
+import progress_summary
+from db_backend import current_backend
+from load_progress_csv import load_dotenv, read_csv_header
+# Loads student_to_load.csv and progress_to_load.csv concurrently on two connections
+# (psycopg v3 async). Only the final student_id link waits for both loads.
+
+
+async def connect_async():
+    try:
+        import psycopg  # type: ignore
+    except ModuleNotFoundError as exc:
+        raise RuntimeError("Install psycopg (v3) to use the async loader.") from exc
+    return await psycopg.AsyncConnection.connect(current_backend().url)
+
+
+async def execute_async(conn, sql: str) -> int:
+    async with conn.cursor() as cur:
+        await cur.execute(sql)
+        return cur.rowcount
+
+
+async def fetch_count_async(conn, sql: str) -> int:
+    async with conn.cursor() as cur:
+        await cur.execute(sql)
+        row = await cur.fetchone()
+    return int(row[0]) if row else 0
+
+
+async def fetch_date_range_async(conn):
+    async with conn.cursor() as cur:
+        await cur.execute(progress_loader.DATE_RANGE_SQL)
+        first, last, nulls = await cur.fetchone()
+    return None if first is None or nulls else (first, last)
+
+
+async def has_key_columns_async(conn, table: str) -> bool:
+    async with conn.cursor() as cur:
+        await cur.execute(key_columns.KEY_COLUMNS_SQL, (table,))
+        row = await cur.fetchone()
+    return int(row[0]) == len(key_columns.KEY_COLUMNS)
+
+
+async def copy_csv_async(conn, sql: str, csv_path: Path) -> None:
+    async with conn.cursor() as cur:
+        async with cur.copy(sql) as copy:
+            with open(csv_path, "r", encoding="utf-8", newline="") as handle:
+                while True:
+                    chunk = handle.read(65536)
+                    if not chunk:
+                        break
+                    await copy.write(chunk)
+
+
+async def refresh_months_async(conn, months: list) -> int:
+    rowcount = 0
+    async with conn.cursor() as cur:
+        for sql, params in progress_summary.refresh_statements(months):
+            await cur.execute(sql, params)
+            rowcount = cur.rowcount
+    return rowcount
+
+
+async def load_students(csv_path: Path) -> dict[str, int]:
+    conn = await connect_async()
+    try:
+        sql = student_loader.build_sql(read_csv_header(csv_path), await has_key_columns_async(conn, "students"))
+        await execute_async(conn, sql["create_temp"])
+        await copy_csv_async(conn, sql["copy"], csv_path)
+        if "normalize_dates" in sql:
+            await execute_async(conn, sql["normalize_dates"])
+        total_rows = await fetch_count_async(conn, "SELECT COUNT(*) FROM temp_students")
+        await execute_async(conn, sql["dedup"])
+        dedup_rows = await fetch_count_async(conn, "SELECT COUNT(*) FROM temp_students_dedup")
+        await execute_async(conn, "TRUNCATE temp_students")
+        await execute_async(conn, "INSERT INTO temp_students SELECT * FROM temp_students_dedup")
+        inserted = await execute_async(conn, sql["insert"])
+        await conn.commit()
+    finally:
+        await conn.close()
+    return {"processed": total_rows, "deduped": dedup_rows, "inserted": inserted}
+
+
+async def load_progress(csv_path: Path) -> dict[str, int]:
+    header = read_csv_header(csv_path)
+    conn = await connect_async()
+    try:
+        keyed = await has_key_columns_async(conn, "progress")
+        sql = progress_loader.build_sql(header, keyed=keyed)
+        await execute_async(conn, sql["add_notes"])
+        await conn.commit()
+        await execute_async(conn, sql["create_temp"])
+        await copy_csv_async(conn, sql["copy"], csv_path)
+        total_rows = await fetch_count_async(conn, "SELECT COUNT(*) FROM temp_progress")
+        await execute_async(conn, sql["dedup"])
+        dedup_rows = await fetch_count_async(conn, "SELECT COUNT(*) FROM temp_progress_dedup")
+        await execute_async(conn, "TRUNCATE temp_progress")
+        await execute_async(conn, "INSERT INTO temp_progress SELECT * FROM temp_progress_dedup")
+        date_range = await fetch_date_range_async(conn)
+        inserted = await execute_async(conn, progress_loader.build_insert_sql(header, date_range, keyed))
+        unlinked = await fetch_count_async(conn, progress_loader.UNLINKED_SQL)
+        async with conn.cursor() as cur:
+            await cur.execute(progress_summary.AFFECTED_MONTHS_SQL)
+            months = [row[0] for row in await cur.fetchall()]
+        # Same transaction as the insert, like load_progress_csv.py: the summary never lags the rows.
+        await refresh_months_async(conn, months)
+        await conn.commit()
+    finally:
+        await conn.close()
+    return {
+        "processed": total_rows,
+        "deduped": dedup_rows,
+        "inserted": inserted,
+        "months": len(months),
+        "date_range": date_range,
+        "unlinked": unlinked,
+    }
+
+
+async def link_student_ids() -> int:
+    conn = await connect_async()
+    try:
+        keyed = await has_key_columns_async(conn, "progress") and await has_key_columns_async(conn, "students")
+        link_sql = progress_loader.LINK_STUDENT_ID_KEYED_SQL if keyed else progress_loader.LINK_STUDENT_ID_SQL
+        linked = await execute_async(conn, link_sql)
+        await conn.commit()
+    finally:
+        await conn.close()
+    return linked
+
+
+async def run(students_csv: Path, progress_csv: Path) -> dict[str, dict[str, int]]:
+    started = time.perf_counter()
+    student_stats, progress_stats = await asyncio.gather(
+        load_students(students_csv),
+        load_progress(progress_csv),
+    )
+    loaded_at = time.perf_counter()
+    unlinked = progress_stats.pop("unlinked")
+    linked = await link_student_ids() if unlinked else 0
+    summary_months = progress_stats.pop("months")
+    date_range = progress_stats.pop("date_range")
+    finished = time.perf_counter()
+    return {
+        "students": student_stats,
+        "progress": progress_stats,
+        "link": {"linked": linked, "skipped": not unlinked},
+        "summary_months": summary_months,
+        "date_range": date_range,
+        "seconds": {"load": loaded_at - started, "link": finished - loaded_at},
+    }
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    base_dir = Path(__file__).resolve().parent
+    parser = argparse.ArgumentParser(
+        description="Load students and progress concurrently, then link progress.student_id."
+    )
+    parser.add_argument("--students", default=None, help="Student CSV (default: student_to_load.csv).")
+    parser.add_argument("--progress", default=None, help="Progress CSV (default: progress_to_load.csv).")
+    args = parser.parse_args(argv)
+
+    load_dotenv(base_dir / ".env")
+    if "DATABASE_URL" not in os.environ:
+        print("DATABASE_URL is not set. Put it in .env or set it in your shell.")
+        return 1
+
+    students_csv = Path(args.students) if args.students else student_loader.resolve_students_csv(base_dir)
+    progress_csv = Path(args.progress) if args.progress else progress_loader.resolve_progress_csv(base_dir)
+    missing = [str(p) for p in [students_csv, progress_csv] if not p or not p.exists()]
+    if missing:
+        print("Missing CSV files:")
+        for path in missing:
+            print(f"  - {path}")
+        return 1
+
+    errors = [
+        student_loader.check_header(read_csv_header(students_csv), students_csv.name),
+        progress_loader.check_header(read_csv_header(progress_csv), progress_csv.name),
+    ]
+    errors = [e for e in errors if e]
+    if errors:
+        for error in errors:
+            print(error)
+        return 1
+
+    result = asyncio.run(run(students_csv, progress_csv))
+
+    for table in ["students", "progress"]:
+        stats = result[table]
+        print(f"{table}: processed {stats['processed']}, after key dedupe {stats['deduped']}, "
+              f"inserted {stats['inserted']}, skipped existing {stats['deduped'] - stats['inserted']}")
+    if result["link"]["skipped"]:
+        print("Every progress row arrived with a Student ID; student_id link skipped.")
+    else:
+        print(f"Progress rows linked to student_id: {result['link']['linked']}")
+    print(f"Summary months refreshed: {result['summary_months']}")
+    print(f"Load time: {result['seconds']['load']:.2f}s concurrent + {result['seconds']['link']:.2f}s link")
+
+    if result["date_range"]:
+        from progress_anomalies import report_after_load
+
+        report_after_load(*result["date_range"])
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,6 +1,13 @@
+import argparse
 import os
 import csv
+from datetime import date
 from pathlib import Path
+from typing import Optional
+
+import progress_summary
+from db_backend import current_backend
+from key_columns import email_key, has_key_columns, key_match, name_key
 # This script loads the combined progress CSV file into the PostgreSQL database.
 
 def load_dotenv(dotenv_path: Path) -> None:
@@ -16,17 +23,8 @@ def load_dotenv(dotenv_path: Path) -> None:
 
 
 def get_connection():
-    try:
-        import psycopg  # type: ignore
-
-        return "psycopg", psycopg.connect(os.environ["DATABASE_URL"])
-    except ModuleNotFoundError:
-        try:
-            import psycopg2  # type: ignore
-
-            return "psycopg2", psycopg2.connect(os.environ["DATABASE_URL"])
-        except ModuleNotFoundError as exc:
-            raise RuntimeError("Install psycopg (v3) or psycopg2 to use this loader.") from exc
+    # DATABASE_URL by default; PEL_BACKEND=embedded uses the local throwaway database.
+    return current_backend().connect()
 
 
 def copy_csv_psycopg(conn, sql: str, csv_path: Path) -> None:
@@ -70,116 +68,198 @@ def read_csv_header(csv_path: Path) -> list[str]:
     return [col.strip() for col in header]
 
 
-def main() -> int:
-    base_dir = Path(__file__).resolve().parent
-    load_dotenv(base_dir / ".env")
+HEADER_TO_DB = {
+    "First Name": "first_name",
+    "Last Name": "last_name",
+    "Full Name": "full_name",
+    "Email": "email",
+    "Subject": "subject",
+    "PEL Wks. Level": "pel_wks_level",
+    "PEL Wks. No.": "pel_wks_no",
+    "Date": "progress_date",
+    "Center": "center",
+    "lvs": "lvs",
+    "Notes": "notes",
+    "Student ID": "student_id",
+}
+REQUIRED_COLS = {
+    "First Name",
+    "Last Name",
+    "Full Name",
+    "Email",
+    "Subject",
+    "PEL Wks. Level",
+    "PEL Wks. No.",
+    "Date",
+    "Center",
+    "lvs",
+}
+LINK_STUDENT_ID_SQL = """
+    UPDATE pel.progress AS p
+    SET student_id = s.student_id::text
+    FROM pel.students AS s
+    WHERE p.student_id IS NULL
+      AND p.full_name IS NOT DISTINCT FROM s.full_name
+      AND p.email IS NOT DISTINCT FROM s.email
+"""
+# With key_columns.py migrated on both tables: an indexed equality join on the generated keys.
+LINK_STUDENT_ID_KEYED_SQL = """
+    UPDATE pel.progress AS p
+    SET student_id = s.student_id::text
+    FROM pel.students AS s
+    WHERE p.student_id IS NULL
+      AND p.name_key = s.name_key
+      AND p.email_key = s.email_key
+"""
 
-    if "DATABASE_URL" not in os.environ:
-        print("DATABASE_URL is not set. Put it in .env or set it in your shell.")
-        return 1
+# Rows combined with --resolve-ids arrive with student_id set; the link only runs for the rest.
+UNLINKED_SQL = "SELECT COUNT(*) FROM temp_progress WHERE student_id IS NULL"
+
+DATE_RANGE_SQL = (
+    "SELECT MIN(progress_date), MAX(progress_date), COUNT(*) FILTER (WHERE progress_date IS NULL) "
+    "FROM temp_progress"
+)
 
+
+def resolve_progress_csv(base_dir: Path) -> Path:
     progress_csv = base_dir / "progress_to_load.csv"
     if not progress_csv.exists():
         progress_csv = base_dir / "progress.csv"
+    return progress_csv
 
-    missing = [str(progress_csv)] if not progress_csv.exists() else []
-    if missing:
-        print("Missing CSV files:")
-        for path in missing:
-            print(f"  - {path}")
-        return 1
 
-    header = read_csv_header(progress_csv)
-    header_to_db = {
-        "First Name": "first_name",
-        "Last Name": "last_name",
-        "Full Name": "full_name",
-        "Email": "email",
-        "Subject": "subject",
-        "PEL Wks. Level": "pel_wks_level",
-        "PEL Wks. No.": "pel_wks_no",
-        "Date": "progress_date",
-        "Center": "center",
-        "lvs": "lvs",
-        "Notes": "notes",
-        "Student ID": "student_id",
-    }
-    required_cols = {
-        "First Name",
-        "Last Name",
-        "Full Name",
-        "Email",
-        "Subject",
-        "PEL Wks. Level",
-        "PEL Wks. No.",
-        "Date",
-        "Center",
-        "lvs",
-    }
-    missing_required = [col for col in required_cols if col not in header]
+def check_header(header: list[str], csv_name: str) -> Optional[str]:
+    missing_required = [col for col in REQUIRED_COLS if col not in header]
     if missing_required:
-        print(f"Missing required columns in {progress_csv.name}: {', '.join(sorted(missing_required))}")
-        return 1
-    unknown_cols = [col for col in header if col not in header_to_db]
+        return f"Missing required columns in {csv_name}: {', '.join(sorted(missing_required))}"
+    unknown_cols = [col for col in header if col not in HEADER_TO_DB]
     if unknown_cols:
-        print(f"Unknown columns in {progress_csv.name}: {', '.join(unknown_cols)}")
-        return 1
+        return f"Unknown columns in {csv_name}: {', '.join(unknown_cols)}"
+    return None
 
-    progress_columns = ", ".join(header_to_db[col] for col in header)
-    copy_progress = (
-        f"COPY temp_progress ({progress_columns}) "
-        "FROM STDIN WITH (FORMAT csv, HEADER true)"
+
+def fetch_date_range(conn) -> Optional[tuple[date, date]]:
+    # Bounds of the batch being loaded; None when it has no dates or some are NULL.
+    with conn.cursor() as cur:
+        cur.execute(DATE_RANGE_SQL)
+        first, last, nulls = cur.fetchone()
+    if first is None or nulls:
+        return None
+    return first, last
+
+
+def link_sql(conn) -> str:
+    keyed = has_key_columns(conn, "progress") and has_key_columns(conn, "students")
+    return LINK_STUDENT_ID_KEYED_SQL if keyed else LINK_STUDENT_ID_SQL
+
+
+def build_insert_sql(header: list[str], date_range: Optional[tuple[date, date]] = None, keyed: bool = False) -> str:
+    progress_columns = ", ".join(HEADER_TO_DB[col] for col in header)
+    # Literal date bounds let the planner prune pel.progress partitions in the anti-join.
+    date_filter = (
+        f"    AND dest.progress_date BETWEEN DATE '{date_range[0]:%Y-%m-%d}' AND DATE '{date_range[1]:%Y-%m-%d}' "
+        if date_range
+        else ""
     )
-    insert_progress = (
+    return (
         f"INSERT INTO pel.progress ({progress_columns}) "
         "SELECT "
-        + ", ".join(f"src.{header_to_db[col]}" for col in header)
+        + ", ".join(f"src.{HEADER_TO_DB[col]}" for col in header)
         + " "
         "FROM temp_progress AS src "
         "WHERE NOT EXISTS ("
         "  SELECT 1 "
         "  FROM pel.progress AS dest "
-        "  WHERE dest.full_name IS NOT DISTINCT FROM src.full_name "
-        "    AND dest.email IS NOT DISTINCT FROM src.email "
-        "    AND dest.subject IS NOT DISTINCT FROM src.subject "
+        + (
+            f"  WHERE {key_match('dest', 'src')} "
+            if keyed
+            else "  WHERE dest.full_name IS NOT DISTINCT FROM src.full_name "
+            "    AND dest.email IS NOT DISTINCT FROM src.email "
+        )
+        + "    AND dest.subject IS NOT DISTINCT FROM src.subject "
         "    AND dest.progress_date IS NOT DISTINCT FROM src.progress_date "
-        "    AND dest.center IS NOT DISTINCT FROM src.center"
-        ")"
+        "    AND dest.center IS NOT DISTINCT FROM src.center "
+        + date_filter
+        + ")"
+    )
+
+
+def build_sql(header: list[str], date_range: Optional[tuple[date, date]] = None, keyed: bool = False) -> dict[str, str]:
+    progress_columns = ", ".join(HEADER_TO_DB[col] for col in header)
+    copy_progress = (
+        f"COPY temp_progress ({progress_columns}) "
+        "FROM STDIN WITH (FORMAT csv, HEADER true)"
     )
+    # With key columns, rows differing only in name spacing or email case are one record.
+    identity = f"{name_key('full_name')}, {email_key('email')}" if keyed else "full_name, email"
     dedup_temp_progress = (
         "CREATE TEMP TABLE temp_progress_dedup AS "
-        "SELECT DISTINCT ON (full_name, email, subject, progress_date, center) * "
+        f"SELECT DISTINCT ON ({identity}, subject, progress_date, center) * "
         "FROM temp_progress "
-        "ORDER BY full_name, email, subject, progress_date, center, lvs DESC NULLS LAST, pel_wks_no DESC NULLS LAST"
+        f"ORDER BY {identity}, subject, progress_date, center, lvs DESC NULLS LAST, pel_wks_no DESC NULLS LAST"
     )
+    return {
+        "add_notes": "ALTER TABLE pel.progress ADD COLUMN IF NOT EXISTS notes text",
+        "create_temp": "CREATE TEMP TABLE temp_progress (LIKE pel.progress INCLUDING DEFAULTS)",
+        "copy": copy_progress,
+        "dedup": dedup_temp_progress,
+        "insert": build_insert_sql(header, date_range, keyed),
+    }
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Insert-only load of progress_to_load.csv into pel.progress.")
+    parser.add_argument("--csv", default=None, help="Progress CSV (default: progress_to_load.csv, else progress.csv).")
+    args = parser.parse_args(argv)
+
+    base_dir = Path(__file__).resolve().parent
+    load_dotenv(base_dir / ".env")
+
+    if "DATABASE_URL" not in os.environ:
+        print("DATABASE_URL is not set. Put it in .env or set it in your shell.")
+        return 1
+
+    progress_csv = Path(args.csv) if args.csv else resolve_progress_csv(base_dir)
+
+    missing = [str(progress_csv)] if not progress_csv.exists() else []
+    if missing:
+        print("Missing CSV files:")
+        for path in missing:
+            print(f"  - {path}")
+        return 1
+
+    header = read_csv_header(progress_csv)
+    error = check_header(header, progress_csv.name)
+    if error:
+        print(error)
+        return 1
 
     driver, conn = get_connection()
     try:
-        execute_sql(conn, "ALTER TABLE pel.progress ADD COLUMN IF NOT EXISTS notes text")
-        execute_sql(conn, "CREATE TEMP TABLE temp_progress (LIKE pel.progress INCLUDING DEFAULTS)")
+        keyed = has_key_columns(conn, "progress")
+        sql = build_sql(header, keyed=keyed)
+        execute_sql(conn, sql["add_notes"])
+        execute_sql(conn, sql["create_temp"])
         if driver == "psycopg":
-            copy_csv_psycopg(conn, copy_progress, progress_csv)
+            copy_csv_psycopg(conn, sql["copy"], progress_csv)
         else:
-            copy_csv_psycopg2(conn, copy_progress, progress_csv)
+            copy_csv_psycopg2(conn, sql["copy"], progress_csv)
         total_rows = fetch_count(conn, "SELECT COUNT(*) FROM temp_progress")
-        execute_sql(conn, dedup_temp_progress)
+        execute_sql(conn, sql["dedup"])
         dedup_rows = fetch_count(conn, "SELECT COUNT(*) FROM temp_progress_dedup")
         with conn.cursor() as cur:
             cur.execute("TRUNCATE temp_progress")
             cur.execute("INSERT INTO temp_progress SELECT * FROM temp_progress_dedup")
-            cur.execute(insert_progress)
+            date_range = fetch_date_range(conn)
+            cur.execute(build_insert_sql(header, date_range, keyed))
             inserted = cur.rowcount
-            cur.execute(
-                """
-                UPDATE pel.progress AS p
-                SET student_id = s.student_id::text
-                FROM pel.students AS s
-                WHERE p.student_id IS NULL
-                  AND p.full_name IS NOT DISTINCT FROM s.full_name
-                  AND p.email IS NOT DISTINCT FROM s.email
-                """
-            )
-            linked_student_id = cur.rowcount
+            linked_student_id = 0
+            unlinked = fetch_count(conn, UNLINKED_SQL)
+            if unlinked:
+                cur.execute(link_sql(conn))
+                linked_student_id = cur.rowcount
+            summary_months = progress_summary.affected_months(cur)
+            progress_summary.refresh_months(cur, summary_months)
         conn.commit()
     finally:
         conn.close()
@@ -189,7 +269,17 @@ def main() -> int:
     print(f"CSV records after key dedupe: {dedup_rows}")
     print(f"Inserted records: {inserted}")
     print(f"Skipped existing records: {dedup_rows - inserted}")
-    print(f"Progress rows linked to student_id: {linked_student_id}")
+    if unlinked:
+        print(f"Progress rows linked to student_id: {linked_student_id}")
+    else:
+        print("Every row arrived with a Student ID; student_id link skipped.")
+    print(f"Summary months refreshed: {len(summary_months)}")
+
+    if date_range:
+        # Imported here: progress_anomalies reads through progress_source, which imports this module.
+        from progress_anomalies import report_after_load
+
+        report_after_load(*date_range)
     return 0
 
 
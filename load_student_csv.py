@@ -1,8 +1,12 @@
+import argparse
 import csv
 import os
 from pathlib import Path
 from typing import Optional
 
+from db_backend import current_backend
+from key_columns import email_key, has_key_columns, key_match, name_key
+
 #  This script loads the student CSV file into the PostgreSQL database.
 
 
@@ -19,17 +23,8 @@ def load_dotenv(dotenv_path: Path) -> None:
 
 
 def get_connection():
-    try:
-        import psycopg  # type: ignore
-
-        return "psycopg", psycopg.connect(os.environ["DATABASE_URL"])
-    except ModuleNotFoundError:
-        try:
-            import psycopg2  # type: ignore
-
-            return "psycopg2", psycopg2.connect(os.environ["DATABASE_URL"])
-        except ModuleNotFoundError as exc:
-            raise RuntimeError("Install psycopg (v3) or psycopg2 to use this loader.") from exc
+    # DATABASE_URL by default; PEL_BACKEND=embedded uses the local throwaway database.
+    return current_backend().connect()
 
 
 def copy_csv_psycopg(conn, sql: str, csv_path: Path) -> None:
@@ -86,69 +81,64 @@ def read_csv_header(csv_path: Path) -> list[str]:
     return [col.strip() for col in header]
 
 
-def main() -> int:
-    base_dir = Path(__file__).resolve().parent
-    load_dotenv(base_dir / ".env")
-
-    if "DATABASE_URL" not in os.environ:
-        print("DATABASE_URL is not set. Put it in .env or set it in your shell.")
-        return 1
-
-    students_csv = resolve_students_csv(base_dir)
-    if not students_csv:
-        print("Missing CSV file: student_to_load.csv, student.csv, or students.csv")
-        return 1
-
-    header = read_csv_header(students_csv)
-    required_cols = {"Full Name", "Email"}
-    missing_required = [col for col in required_cols if col not in header]
+REQUIRED_COLS = {"Full Name", "Email"}
+HEADER_TO_DB = {
+    "First Name": "first_name",
+    "Last Name": "last_name",
+    "Full Name": "full_name",
+    "DOB (MM/DD/YY)": "dob_raw",
+    "Address": "address",
+    "Tel:": "tel",
+    "Tel": "tel",
+    "Telephone": "tel",
+    "Phone": "tel",
+    "Phone Number": "tel",
+    "Source": "source",
+    "Email": "email",
+    "DOE (Date of Enrollment MM/DD/YY)": "enrollment_date_raw",
+    "Center": "center",
+    # Typed ISO dates written by student_combine.py (date_parse.py); no server-side parsing needed.
+    "DOB": "dob",
+    "Enrollment Date": "enrollment_date",
+    # Written by the combine scripts with --resolve-ids (identity_index.py).
+    "Student ID": "student_id",
+}
+NORMALIZE_DATES_SQL = """
+    UPDATE temp_students
+    SET
+        dob = CASE
+            WHEN dob_raw IS NULL OR btrim(dob_raw) = '' THEN NULL
+            WHEN dob_raw ~ '^\\d{4}-\\d{2}-\\d{2}(\\s+\\d{2}:\\d{2}:\\d{2})?$' THEN (dob_raw::timestamp)::date
+            WHEN dob_raw ~ '^\\d{1,2}/\\d{1,2}/\\d{2}$' THEN to_date(dob_raw, 'MM/DD/YY')
+            WHEN dob_raw ~ '^\\d{1,2}/\\d{1,2}/\\d{4}$' THEN to_date(dob_raw, 'MM/DD/YYYY')
+            ELSE NULL
+        END,
+        enrollment_date = CASE
+            WHEN enrollment_date_raw IS NULL OR btrim(enrollment_date_raw) = '' THEN NULL
+            WHEN enrollment_date_raw ~ '^\\d{4}-\\d{2}-\\d{2}(\\s+\\d{2}:\\d{2}:\\d{2})?$' THEN (enrollment_date_raw::timestamp)::date
+            WHEN enrollment_date_raw ~ '^\\d{1,2}/\\d{1,2}/\\d{2}$' THEN to_date(enrollment_date_raw, 'MM/DD/YY')
+            WHEN enrollment_date_raw ~ '^\\d{1,2}/\\d{1,2}/\\d{4}$' THEN to_date(enrollment_date_raw, 'MM/DD/YYYY')
+            ELSE NULL
+        END
+"""
+
+
+def check_header(header: list[str], csv_name: str) -> Optional[str]:
+    missing_required = [col for col in REQUIRED_COLS if col not in header]
     if missing_required:
-        print(f"Missing required columns in {students_csv.name}: {', '.join(sorted(missing_required))}")
-        return 1
-    header_to_db = {
-        "First Name": "first_name",
-        "Last Name": "last_name",
-        "Full Name": "full_name",
-        "DOB (MM/DD/YY)": "dob_raw",
-        "Address": "address",
-        "Tel:": "tel",
-        "Tel": "tel",
-        "Telephone": "tel",
-        "Phone": "tel",
-        "Phone Number": "tel",
-        "Source": "source",
-        "Email": "email",
-        "DOE (Date of Enrollment MM/DD/YY)": "enrollment_date_raw",
-        "Center": "center",
-    }
-    unknown_cols = [col for col in header if col not in header_to_db]
+        return f"Missing required columns in {csv_name}: {', '.join(sorted(missing_required))}"
+    unknown_cols = [col for col in header if col not in HEADER_TO_DB]
     if unknown_cols:
-        print(f"Unknown columns in {students_csv.name}: {', '.join(unknown_cols)}")
-        return 1
+        return f"Unknown columns in {csv_name}: {', '.join(unknown_cols)}"
+    return None
 
-    db_columns = [header_to_db[col] for col in header]
+
+def build_sql(header: list[str], keyed: bool = False) -> dict[str, str]:
+    db_columns = [HEADER_TO_DB[col] for col in header]
     copy_students = (
         f"COPY temp_students ({', '.join(db_columns)}) "
         "FROM STDIN WITH (FORMAT csv, HEADER true)"
     )
-    normalize_dates_sql = """
-        UPDATE temp_students
-        SET
-            dob = CASE
-                WHEN dob_raw IS NULL OR btrim(dob_raw) = '' THEN NULL
-                WHEN dob_raw ~ '^\\d{4}-\\d{2}-\\d{2}(\\s+\\d{2}:\\d{2}:\\d{2})?$' THEN (dob_raw::timestamp)::date
-                WHEN dob_raw ~ '^\\d{1,2}/\\d{1,2}/\\d{2}$' THEN to_date(dob_raw, 'MM/DD/YY')
-                WHEN dob_raw ~ '^\\d{1,2}/\\d{1,2}/\\d{4}$' THEN to_date(dob_raw, 'MM/DD/YYYY')
-                ELSE NULL
-            END,
-            enrollment_date = CASE
-                WHEN enrollment_date_raw IS NULL OR btrim(enrollment_date_raw) = '' THEN NULL
-                WHEN enrollment_date_raw ~ '^\\d{4}-\\d{2}-\\d{2}(\\s+\\d{2}:\\d{2}:\\d{2})?$' THEN (enrollment_date_raw::timestamp)::date
-                WHEN enrollment_date_raw ~ '^\\d{1,2}/\\d{1,2}/\\d{2}$' THEN to_date(enrollment_date_raw, 'MM/DD/YY')
-                WHEN enrollment_date_raw ~ '^\\d{1,2}/\\d{1,2}/\\d{4}$' THEN to_date(enrollment_date_raw, 'MM/DD/YYYY')
-                ELSE NULL
-            END
-    """
     insert_db_columns = db_columns + [
         col for col in ["dob", "enrollment_date"] if col not in db_columns
     ]
@@ -160,32 +150,79 @@ def main() -> int:
         "WHERE NOT EXISTS ("
         "  SELECT 1 "
         "  FROM pel.students AS dest "
-        "  WHERE dest.full_name IS NOT DISTINCT FROM src.full_name "
-        "    AND dest.email IS NOT DISTINCT FROM src.email"
-        ")"
+        + (
+            f"  WHERE {key_match('dest', 'src')}"
+            if keyed
+            else "  WHERE dest.full_name IS NOT DISTINCT FROM src.full_name "
+            "    AND dest.email IS NOT DISTINCT FROM src.email"
+        )
+        + ")"
     )
+    if "student_id" in db_columns:
+        # Resolved ids: spelling variants of one student share an id, and the first one wins.
+        insert_students += " ORDER BY src.full_name, src.email ON CONFLICT (student_id) DO NOTHING"
+    identity = f"{name_key('full_name')}, {email_key('email')}" if keyed else "full_name, email"
     dedup_temp_students = (
         "CREATE TEMP TABLE temp_students_dedup AS "
-        "SELECT DISTINCT ON (full_name, email) * "
+        f"SELECT DISTINCT ON ({identity}) * "
         "FROM temp_students "
-        "ORDER BY full_name, email"
+        f"ORDER BY {identity}"
     )
+    sql = {
+        "create_temp": "CREATE TEMP TABLE temp_students (LIKE pel.students INCLUDING DEFAULTS)",
+        "copy": copy_students,
+        "dedup": dedup_temp_students,
+        "insert": insert_students,
+    }
+    # Older files carry only the raw date text; parse it in SQL as before.
+    if not {"dob", "enrollment_date"} <= set(db_columns):
+        sql["normalize_dates"] = NORMALIZE_DATES_SQL
+    return sql
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Insert-only load of student_to_load.csv into pel.students.")
+    parser.add_argument("--csv", default=None, help="Student CSV (default: student_to_load.csv, else student.csv).")
+    args = parser.parse_args(argv)
+
+    base_dir = Path(__file__).resolve().parent
+    load_dotenv(base_dir / ".env")
+
+    if "DATABASE_URL" not in os.environ:
+        print("DATABASE_URL is not set. Put it in .env or set it in your shell.")
+        return 1
+
+    students_csv = Path(args.csv) if args.csv else resolve_students_csv(base_dir)
+    if not students_csv:
+        print("Missing CSV file: student_to_load.csv, student.csv, or students.csv")
+        return 1
+    if not students_csv.exists():
+        print(f"Missing CSV file: {students_csv}")
+        return 1
+
+    header = read_csv_header(students_csv)
+    error = check_header(header, students_csv.name)
+    if error:
+        print(error)
+        return 1
 
     driver, conn = get_connection()
     try:
-        execute_sql(conn, "CREATE TEMP TABLE temp_students (LIKE pel.students INCLUDING DEFAULTS)")
+        sql = build_sql(header, has_key_columns(conn, "students"))
+        execute_sql(conn, sql["create_temp"])
         if driver == "psycopg":
-            copy_csv_psycopg(conn, copy_students, students_csv)
+            copy_csv_psycopg(conn, sql["copy"], students_csv)
         else:
-            copy_csv_psycopg2(conn, copy_students, students_csv)
-        execute_sql(conn, normalize_dates_sql)
+            copy_csv_psycopg2(conn, sql["copy"], students_csv)
+        if "normalize_dates" in sql:
+            execute_sql(conn, sql["normalize_dates"])
         total_rows = fetch_count(conn, "SELECT COUNT(*) FROM temp_students")
-        execute_sql(conn, dedup_temp_students)
+        execute_sql(conn, sql["dedup"])
         dedup_rows = fetch_count(conn, "SELECT COUNT(*) FROM temp_students_dedup")
         with conn.cursor() as cur:
             cur.execute("TRUNCATE temp_students")
             cur.execute("INSERT INTO temp_students SELECT * FROM temp_students_dedup")
-            cur.execute(insert_students)
+            cur.execute(sql["insert"])
             inserted = cur.rowcount
         conn.commit()
     finally:
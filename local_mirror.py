@@ -0,0 +1,435 @@
+import argparse
+import os
+import sqlite3
+from datetime import date, datetime
+from pathlib import Path
+from typing import Optional
+
+import pandas as pd
+
+from load_progress_csv import get_connection, load_dotenv
+# Local read-only mirror of pel.students / pel.progress in DuckDB (SQLite when duckdb is not
+# installed). sync pulls only rows above the last synced id, plus the rows pel.change_log lists
+# as updated or deleted since the last sync (see "track"); query runs canned analyses locally.
+
+DEFAULT_DUCKDB = "pel_mirror.duckdb"
+DEFAULT_SQLITE = "pel_mirror.sqlite"
+BATCH_ROWS = 50000
+
+MIRRORED = {
+    "students": "student_id",
+    "progress": "progress_id",
+}
+TYPE_MAP = {
+    "smallint": "INTEGER",
+    "integer": "INTEGER",
+    "bigint": "BIGINT",
+    "numeric": "DOUBLE",
+    "double precision": "DOUBLE",
+    "boolean": "BOOLEAN",
+    "date": "DATE",
+    "timestamp without time zone": "TIMESTAMP",
+    "timestamp with time zone": "TIMESTAMP",
+}
+
+SYNC_STATE_SQL = """
+    CREATE TABLE IF NOT EXISTS sync_state (
+        table_name VARCHAR PRIMARY KEY,
+        high_water BIGINT,
+        synced_at VARCHAR
+    )
+"""
+
+# Change tracking (local_mirror.py track, once): statement triggers log the id of every updated
+# or deleted row (progress_diff.py --apply, the student_id link, manual fixes). Inserts need no
+# log; they are above the high-water mark. The sync reads only the log entries it has not seen.
+CHANGE_LOG = "change_log"
+CHANGE_LOG_SQL = """
+    CREATE TABLE IF NOT EXISTS pel.change_log (
+        log_id bigserial PRIMARY KEY,
+        table_name text NOT NULL,
+        row_id bigint NOT NULL,
+        changed_at timestamptz NOT NULL DEFAULT now()
+    )
+"""
+LOG_FUNCTION_SQL = """
+    CREATE OR REPLACE FUNCTION pel.log_change() RETURNS trigger LANGUAGE plpgsql AS $$
+    BEGIN
+        EXECUTE format(
+            'INSERT INTO pel.change_log (table_name, row_id) SELECT %L, (to_jsonb(o) ->> %L)::bigint FROM old_rows AS o',
+            TG_ARGV[0], TG_ARGV[1]
+        );
+        RETURN NULL;
+    END
+    $$
+"""
+CHANGES_SQL = (
+    "SELECT table_name, array_agg(DISTINCT row_id), MAX(log_id) FROM pel.change_log "
+    "WHERE log_id > %s GROUP BY table_name"
+)
+ID_BATCH = 1000
+
+
+def track_sql(table: str) -> list[str]:
+    # Transition tables allow one event per trigger, hence one trigger each for UPDATE and DELETE.
+    statements = [CHANGE_LOG_SQL, LOG_FUNCTION_SQL]
+    for event in ["UPDATE", "DELETE"]:
+        trigger = f"{table}_log_{event.lower()}"
+        statements += [
+            f"DROP TRIGGER IF EXISTS {trigger} ON pel.{table}",
+            f"CREATE TRIGGER {trigger} AFTER {event} ON pel.{table} REFERENCING OLD TABLE AS old_rows "
+            f"FOR EACH STATEMENT EXECUTE FUNCTION pel.log_change('{table}', '{MIRRORED[table]}')",
+        ]
+    return statements
+
+
+def is_tracked(pg_cur) -> bool:
+    pg_cur.execute("SELECT to_regclass('pel.change_log')")
+    return pg_cur.fetchone()[0] is not None
+
+
+# Dates are compared as 'YYYY-MM' text so the same SQL runs on DuckDB and SQLite.
+MONTH_EXPR = "substr(CAST(progress_date AS VARCHAR), 1, 7)"
+
+QUERIES = {
+    "monthly": (
+        "Rows, students and mean lvs per center x subject x month.",
+        f"""
+        SELECT center, subject, {MONTH_EXPR} AS month,
+               COUNT(*) AS entries,
+               COUNT(DISTINCT full_name || '|' || COALESCE(email, '')) AS students,
+               ROUND(AVG(lvs), 2) AS mean_lvs
+        FROM progress
+        GROUP BY 1, 2, 3
+        ORDER BY 3, 1, 2
+        """,
+    ),
+    "lvs-drops": (
+        "Every lvs drop (vs. the previous date in that subject) for students active in --month.",
+        f"""
+        WITH daily AS (
+            SELECT full_name, email, subject, progress_date, MAX(lvs) AS day_lvs
+            FROM progress
+            GROUP BY 1, 2, 3, 4
+        ),
+        previous AS (
+            SELECT full_name, email, subject, progress_date,
+                   LAG(day_lvs) OVER (PARTITION BY full_name, email, subject ORDER BY progress_date) AS prev_lvs
+            FROM daily
+        ),
+        ranked AS (
+            SELECT p.full_name, p.email, p.subject, p.center, p.progress_date, p.lvs, previous.prev_lvs
+            FROM progress AS p
+            JOIN previous
+              ON previous.full_name = p.full_name
+             AND previous.email = p.email
+             AND previous.subject = p.subject
+             AND previous.progress_date = p.progress_date
+        )
+        SELECT full_name AS "Full Name", email AS "Email", subject AS "Subject", center AS "Center",
+               progress_date AS "Date", lvs, prev_lvs
+        FROM ranked
+        WHERE lvs < prev_lvs
+          AND EXISTS (
+              SELECT 1 FROM progress AS active
+              WHERE active.full_name = ranked.full_name
+                AND active.email = ranked.email
+                AND substr(CAST(active.progress_date AS VARCHAR), 1, 7) = ?
+          )
+        ORDER BY 1, 2, 3, 5, 6
+        """,
+    ),
+    "month-compare": (
+        "Per center x subject: entries and mean lvs in --month next to the month before.",
+        f"""
+        WITH monthly AS (
+            SELECT center, subject, {MONTH_EXPR} AS month, COUNT(*) AS entries, AVG(lvs) AS mean_lvs
+            FROM progress
+            GROUP BY 1, 2, 3
+        ),
+        previous AS (
+            SELECT MAX(month) AS month FROM monthly WHERE month < ?
+        )
+        SELECT cur.center, cur.subject,
+               prev.entries AS prev_entries, cur.entries,
+               ROUND(prev.mean_lvs, 2) AS prev_mean_lvs, ROUND(cur.mean_lvs, 2) AS mean_lvs
+        FROM monthly AS cur
+        LEFT JOIN monthly AS prev
+          ON prev.center = cur.center
+         AND prev.subject = cur.subject
+         AND prev.month = (SELECT month FROM previous)
+        WHERE cur.month = ?
+        ORDER BY 1, 2
+        """,
+    ),
+    "duplicates": (
+        "Progress rows sharing the loader key (full_name, email, subject, progress_date, center).",
+        """
+        SELECT full_name, email, subject, progress_date, center, COUNT(*) AS copies
+        FROM progress
+        GROUP BY 1, 2, 3, 4, 5
+        HAVING COUNT(*) > 1
+        ORDER BY 1, 4
+        """,
+    ),
+    "unlinked": (
+        "Progress rows without a student_id, per center.",
+        """
+        SELECT center, COUNT(*) AS rows, COUNT(DISTINCT full_name || '|' || COALESCE(email, '')) AS students
+        FROM progress
+        WHERE student_id IS NULL
+        GROUP BY 1
+        ORDER BY 1
+        """,
+    ),
+}
+
+
+class Mirror:
+    def __init__(self, path: Path):
+        self.path = path
+        self.kind = "sqlite" if path.suffix in (".sqlite", ".db") else "duckdb"
+        if self.kind == "duckdb":
+            import duckdb  # type: ignore
+
+            self.conn = duckdb.connect(str(path))
+        else:
+            self.conn = sqlite3.connect(str(path))
+
+    def execute(self, sql: str, params=()):
+        return self.conn.execute(sql, params)
+
+    def insert_rows(self, table: str, columns: list[str], rows: list[tuple]) -> None:
+        if self.kind == "duckdb":
+            batch = pd.DataFrame.from_records(rows, columns=columns)
+            self.conn.register("batch_rows", batch)
+            self.conn.execute(f"INSERT INTO {table} ({', '.join(columns)}) SELECT * FROM batch_rows")
+            self.conn.unregister("batch_rows")
+        else:
+            # sqlite3 has no date type; keep ISO text so comparisons and substr() work.
+            rows = [
+                tuple(v.isoformat() if isinstance(v, (date, datetime)) else v for v in row) for row in rows
+            ]
+            marks = ", ".join("?" for _ in columns)
+            self.conn.executemany(f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({marks})", rows)
+
+    def columns(self, table: str) -> set[str]:
+        if self.kind == "duckdb":
+            rows = self.conn.execute(
+                "SELECT column_name FROM information_schema.columns WHERE table_name = ?", (table,)
+            ).fetchall()
+            return {row[0] for row in rows}
+        return {row[1] for row in self.conn.execute(f"PRAGMA table_info('{table}')").fetchall()}
+
+    def query(self, sql: str, params=()) -> pd.DataFrame:
+        cur = self.conn.execute(sql, params)
+        columns = [d[0] for d in cur.description]
+        return pd.DataFrame(cur.fetchall(), columns=columns)
+
+    def commit(self) -> None:
+        self.conn.commit()
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+def default_mirror_path() -> Path:
+    try:
+        import duckdb  # type: ignore  # noqa: F401
+
+        return Path(DEFAULT_DUCKDB)
+    except ModuleNotFoundError:
+        return Path(DEFAULT_SQLITE)
+
+
+def source_columns(pg_cur, table: str) -> list[tuple[str, str]]:
+    pg_cur.execute(
+        "SELECT column_name, data_type FROM information_schema.columns "
+        "WHERE table_schema = 'pel' AND table_name = %s ORDER BY ordinal_position",
+        (table,),
+    )
+    return [(name, TYPE_MAP.get(data_type, "VARCHAR")) for name, data_type in pg_cur.fetchall()]
+
+
+def high_water(mirror: Mirror, table: str) -> int:
+    row = mirror.execute("SELECT high_water FROM sync_state WHERE table_name = ?", (table,)).fetchone()
+    return int(row[0]) if row and row[0] is not None else 0
+
+
+def ensure_table(mirror: Mirror, table: str, columns: list[tuple[str, str]]) -> None:
+    existing = mirror.columns(table)
+    if not existing:
+        ddl = ", ".join(f"{name} {sql_type}" for name, sql_type in columns)
+        mirror.execute(f"CREATE TABLE {table} ({ddl})")
+        return
+    # Columns added upstream later (e.g. pel.progress.notes) are added to the mirror too.
+    for name, sql_type in columns:
+        if name not in existing:
+            mirror.execute(f"ALTER TABLE {table} ADD COLUMN {name} {sql_type}")
+
+
+def pull_rows(pg_conn, mirror: Mirror, table: str, names: list[str], where: str, params: tuple) -> tuple[int, int]:
+    id_col = MIRRORED[table]
+    pulled = 0
+    last = 0
+    # Named (server-side) cursor: rows stream in batches instead of one big fetch.
+    with pg_conn.cursor(name=f"mirror_{table}") as pg_cur:
+        pg_cur.execute(f"SELECT {', '.join(names)} FROM pel.{table} WHERE {where} ORDER BY {id_col}", params)
+        while True:
+            rows = pg_cur.fetchmany(BATCH_ROWS)
+            if not rows:
+                break
+            mirror.insert_rows(table, names, rows)
+            pulled += len(rows)
+            last = rows[-1][names.index(id_col)]
+    return pulled, last
+
+
+def fetch_changes(pg_conn, since: int) -> tuple[dict[str, list[int]], int]:
+    with pg_conn.cursor() as pg_cur:
+        pg_cur.execute(CHANGES_SQL, (since,))
+        rows = pg_cur.fetchall()
+    changes = {table: sorted(ids) for table, ids, _ in rows}
+    return changes, max([since] + [int(last) for _, _, last in rows])
+
+
+def repull_rows(pg_conn, mirror: Mirror, table: str, names: list[str], ids: list[int]) -> int:
+    # Rows updated in place are replaced; deleted ones are just removed.
+    id_col = MIRRORED[table]
+    pulled = 0
+    for i in range(0, len(ids), ID_BATCH):
+        batch = ids[i:i + ID_BATCH]
+        marks = ", ".join("?" for _ in batch)
+        mirror.execute(f"DELETE FROM {table} WHERE {id_col} IN ({marks})", tuple(batch))
+        pulled += pull_rows(pg_conn, mirror, table, names, f"{id_col} = ANY(%s)", (batch,))[0]
+    return pulled
+
+
+def sync_table(pg_conn, mirror: Mirror, table: str, full: bool, changed_ids: list[int]) -> tuple[int, int]:
+    id_col = MIRRORED[table]
+    with pg_conn.cursor() as pg_cur:
+        columns = source_columns(pg_cur, table)
+    if full:
+        mirror.execute(f"DROP TABLE IF EXISTS {table}")
+        mirror.execute("DELETE FROM sync_state WHERE table_name = ?", (table,))
+    ensure_table(mirror, table, columns)
+    start = high_water(mirror, table)
+    names = [name for name, _ in columns]
+
+    # Changed rows above the high-water mark arrive with the id pull below.
+    refreshed = repull_rows(pg_conn, mirror, table, names, [i for i in changed_ids if i <= start]) if start else 0
+    pulled, last = pull_rows(pg_conn, mirror, table, names, f"{id_col} > %s", (start,))
+    set_high_water(mirror, table, max(start, last))
+    return pulled, refreshed
+
+
+def set_high_water(mirror: Mirror, table: str, value: int) -> None:
+    mirror.execute("DELETE FROM sync_state WHERE table_name = ?", (table,))
+    mirror.execute(
+        "INSERT INTO sync_state (table_name, high_water, synced_at) VALUES (?, ?, ?)",
+        (table, value, datetime.now().isoformat(timespec="seconds")),
+    )
+
+
+def run_sync(mirror: Mirror, full: bool) -> None:
+    driver, pg_conn = get_connection()
+    try:
+        mirror.execute(SYNC_STATE_SQL)
+        with pg_conn.cursor() as pg_cur:
+            tracked = is_tracked(pg_cur)
+        changes: dict[str, list[int]] = {}
+        if tracked:
+            # Read the log first: anything changed while the tables are pulled is logged after it.
+            changes, last_log = fetch_changes(pg_conn, 0 if full else high_water(mirror, CHANGE_LOG))
+        for table in MIRRORED:
+            pulled, refreshed = sync_table(pg_conn, mirror, table, full, changes.get(table, []))
+            print(f"{table}: pulled {pulled} new rows, refreshed {refreshed} changed rows (high-water {high_water(mirror, table)})")
+        if tracked:
+            set_high_water(mirror, CHANGE_LOG, last_log)
+        else:
+            print("Updates and deletes are not tracked: run 'local_mirror.py track' once, or sync --full after corrections.")
+        mirror.commit()
+    finally:
+        pg_conn.close()
+
+
+def run_track() -> None:
+    driver, pg_conn = get_connection()
+    try:
+        with pg_conn.cursor() as pg_cur:
+            for table in MIRRORED:
+                for sql in track_sql(table):
+                    pg_cur.execute(sql)
+        pg_conn.commit()
+    finally:
+        pg_conn.close()
+    print(f"Updates and deletes on {', '.join(f'pel.{t}' for t in MIRRORED)} are now logged to pel.{CHANGE_LOG}.")
+
+
+def run_query(mirror: Mirror, name: str, month: str | None, output: str | None) -> int:
+    _, sql = QUERIES[name]
+    params: tuple = ()
+    if "?" in sql:
+        if month is None:
+            month = mirror.execute(f"SELECT MAX({MONTH_EXPR}) FROM progress").fetchone()[0]
+        params = tuple(month for _ in range(sql.count("?")))
+    result = mirror.query(sql, params)
+    if output:
+        result.to_csv(output, index=False)
+        print(f"{name}: {len(result)} rows -> {output}")
+    else:
+        with pd.option_context("display.max_rows", 200, "display.width", 200):
+            print(result.to_string(index=False))
+    return 0
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    base_dir = Path(__file__).resolve().parent
+    parser = argparse.ArgumentParser(description="Local DuckDB/SQLite mirror of pel.students and pel.progress.")
+    parser.add_argument(
+        "--mirror",
+        default=None,
+        help=f"Mirror file (default: {DEFAULT_DUCKDB}, or {DEFAULT_SQLITE} without duckdb; .sqlite/.db uses SQLite).",
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    sync_parser = sub.add_parser("sync", help="Pull rows added since the last sync.")
+    sync_parser.add_argument("--full", action="store_true", help="Drop the mirror tables and pull everything.")
+
+    query_parser = sub.add_parser("query", help="Run a canned query against the mirror.")
+    query_parser.add_argument("name", choices=sorted(QUERIES))
+    query_parser.add_argument("--month", default=None, help="YYYY-MM (default: latest month in the mirror).")
+    query_parser.add_argument("--output", default=None, help="Write the result to this CSV instead of printing.")
+
+    sub.add_parser("list", help="List canned queries.")
+    sub.add_parser("track", help="Install the pel.change_log triggers so sync picks up updates and deletes.")
+    args = parser.parse_args(argv)
+
+    if args.command == "list":
+        for name, (description, _) in sorted(QUERIES.items()):
+            print(f"{name:<15} {description}")
+        return 0
+    if args.command == "track":
+        load_dotenv(base_dir / ".env")
+        if "DATABASE_URL" not in os.environ:
+            print("DATABASE_URL is not set. Put it in .env or set it in your shell.")
+            return 1
+        run_track()
+        return 0
+
+    mirror = Mirror(Path(args.mirror) if args.mirror else default_mirror_path())
+    try:
+        if args.command == "sync":
+            load_dotenv(base_dir / ".env")
+            if "DATABASE_URL" not in os.environ:
+                print("DATABASE_URL is not set. Put it in .env or set it in your shell.")
+                return 1
+            run_sync(mirror, args.full)
+            return 0
+        return run_query(mirror, args.name, args.month, args.output)
+    finally:
+        mirror.close()
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,91 @@
+import csv
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+# Shared name / email normalization for student_combine.py and progress_combine.py.
+# Exact fixes live in name_corrections.csv (column,raw,corrected); rules below run first.
+
+CORRECTIONS_CSV = Path(__file__).resolve().parent / "name_corrections.csv"
+
+NULL_TOKENS = {"", "NAN", "NONE", "NULL", "NAT", "<NA>"}
+NAME_COLUMNS = ["First Name", "Last Name"]
+EMAIL_COLUMNS = ["Email"]
+
+# Normalized value per (column, raw value); the same students repeat every month.
+_cache: dict[str, dict[str, object]] = {}
+_corrections: dict[str, dict[str, str]] | None = None
+
+
+def load_corrections(path: Path = CORRECTIONS_CSV) -> dict[str, dict[str, str]]:
+    global _corrections
+    if _corrections is not None and path == CORRECTIONS_CSV:
+        return _corrections
+
+    table: dict[str, dict[str, str]] = {}
+    if path.exists():
+        with path.open(newline="", encoding="utf-8-sig") as handle:
+            for row in csv.DictReader(handle):
+                column = (row.get("column") or "").strip()
+                raw = " ".join((row.get("raw") or "").split())
+                if column and raw:
+                    table.setdefault(column, {})[raw] = (row.get("corrected") or "").strip()
+    if path == CORRECTIONS_CSV:
+        _corrections = table
+    return table
+
+
+def _apply_rules(values: pd.Series, column: str) -> pd.Series:
+    text = values.astype("string").str.strip().str.replace(r"\s+", " ", regex=True)
+    text = text.mask(text.str.upper().isin(NULL_TOKENS))
+
+    if column in EMAIL_COLUMNS:
+        text = text.str.replace(" ", "", regex=False).str.lower()
+        text = text.str.replace(r"[.,;]+$", "", regex=True)
+    else:
+        # Stray second capital from typing, e.g. "SInghal" -> "Singhal".
+        text = text.str.replace(
+            r"\b([A-Z])([A-Z])(?=[a-z]{2,})",
+            lambda m: m.group(1) + m.group(2).lower(),
+            regex=True,
+        )
+
+    fixes = load_corrections().get(column)
+    if fixes:
+        corrected = text.map(fixes)
+        text = corrected.where(corrected.notna(), text)
+        text = text.mask(text == "")
+    return text
+
+
+def normalize_column(series: pd.Series, column: str) -> pd.Series:
+    codes, uniques = pd.factorize(series.astype("string"), use_na_sentinel=True)
+    cache = _cache.setdefault(column, {})
+
+    unique_values = pd.Series(uniques, dtype="string")
+    todo = unique_values[~unique_values.isin(list(cache))]
+    if len(todo):
+        cache.update(zip(todo.tolist(), _apply_rules(todo, column).tolist()))
+
+    mapped = np.array([cache[value] for value in unique_values.tolist()] + [pd.NA], dtype=object)
+    return pd.Series(mapped[codes], index=series.index, dtype="string")
+
+
+def normalize_identity(df: pd.DataFrame) -> pd.DataFrame:
+    for column in NAME_COLUMNS + EMAIL_COLUMNS:
+        if column in df.columns:
+            df[column] = normalize_column(df[column], column)
+    return df
+
+
+def build_full_name(df: pd.DataFrame) -> pd.Series:
+    last = df["Last Name"].astype("string")
+    first = df["First Name"].astype("string")
+    both = last + ", " + first
+    return both.fillna(last).fillna(first)
+
+
+def clear_cache() -> None:
+    global _corrections
+    _cache.clear()
+    _corrections = None
@@ -0,0 +1,224 @@
+import argparse
+import os
+import re
+from datetime import date
+from pathlib import Path
+from typing import Optional
+
+from key_columns import migrate_sql, stored_columns, table_has_keys
+from load_progress_csv import get_connection, load_dotenv
+from local_mirror import is_tracked, track_sql
+# Converts pel.progress into a table range-partitioned by progress_date (per month or per
+# year) and keeps partitions created ahead of the months being loaded.
+
+PARENT = "pel.progress"
+LEGACY = "progress_unpartitioned"
+DEFAULT_PARTITION = "progress_default"
+PARTITION_NAME_RE = re.compile(r"^progress_y(\d{4})(?:m(\d{2}))?$")
+KEY_INDEX_SQL = (
+    "CREATE INDEX IF NOT EXISTS progress_load_key_idx "
+    "ON pel.progress (progress_date, full_name, email, subject, center)"
+)
+ID_INDEX_SQL = "CREATE INDEX IF NOT EXISTS progress_progress_id_idx ON pel.progress (progress_id)"
+
+
+def period_start(day: date, by: str) -> date:
+    return date(day.year, 1, 1) if by == "year" else date(day.year, day.month, 1)
+
+
+def next_period(start: date, by: str) -> date:
+    if by == "year":
+        return date(start.year + 1, 1, 1)
+    return date(start.year + (start.month == 12), start.month % 12 + 1, 1)
+
+
+def partition_name(start: date, by: str) -> str:
+    return f"progress_y{start.year}" if by == "year" else f"progress_y{start.year}m{start.month:02d}"
+
+
+def periods(first: date, last: date, by: str) -> list[date]:
+    result = []
+    start = period_start(first, by)
+    while start <= last:
+        result.append(start)
+        start = next_period(start, by)
+    return result
+
+
+def is_partitioned(cur) -> bool:
+    cur.execute(
+        "SELECT c.relkind FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace "
+        "WHERE n.nspname = 'pel' AND c.relname = 'progress'"
+    )
+    row = cur.fetchone()
+    if row is None:
+        raise RuntimeError("pel.progress does not exist.")
+    return row[0] == "p"
+
+
+def list_partitions(cur) -> list[tuple[str, str, int]]:
+    cur.execute(
+        "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid), c.reltuples::bigint "
+        "FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid "
+        "JOIN pg_class p ON p.oid = i.inhparent "
+        "JOIN pg_namespace n ON n.oid = p.relnamespace "
+        "WHERE n.nspname = 'pel' AND p.relname = 'progress' "
+        "ORDER BY c.relname"
+    )
+    return [(name, bound, max(int(rows), 0)) for name, bound, rows in cur.fetchall()]
+
+
+def detect_granularity(cur) -> str:
+    for name, _, _ in list_partitions(cur):
+        match = PARTITION_NAME_RE.match(name)
+        if match:
+            return "month" if match.group(2) else "year"
+    return "month"
+
+
+def ensure_partition(cur, start: date, by: str) -> bool:
+    name = partition_name(start, by)
+    cur.execute("SELECT to_regclass(%s)", (f"pel.{name}",))
+    if cur.fetchone()[0] is not None:
+        return False
+    end = next_period(start, by)
+    # Build the partition standalone and pull any rows that already landed in the default
+    # partition for this range, so ATTACH does not fail on them.
+    cur.execute(f"CREATE TABLE pel.{name} (LIKE pel.progress INCLUDING DEFAULTS INCLUDING GENERATED)")
+    cur.execute("SELECT to_regclass(%s)", (f"pel.{DEFAULT_PARTITION}",))
+    if cur.fetchone()[0] is not None:
+        # Named columns: generated key columns (key_columns.py) cannot be inserted into.
+        columns = ", ".join(stored_columns(cur, "progress"))
+        cur.execute(
+            f"WITH moved AS ("
+            f"  DELETE FROM pel.{DEFAULT_PARTITION} "
+            f"  WHERE progress_date >= DATE '{start}' AND progress_date < DATE '{end}' "
+            f"  RETURNING *"
+            f") INSERT INTO pel.{name} ({columns}) SELECT {columns} FROM moved"
+        )
+    cur.execute(
+        f"ALTER TABLE pel.progress ATTACH PARTITION pel.{name} "
+        f"FOR VALUES FROM ('{start}') TO ('{end}')"
+    )
+    return True
+
+
+def migrate(cur, by: str, ahead: int, keep_old: bool) -> None:
+    if is_partitioned(cur):
+        raise RuntimeError("pel.progress is already partitioned.")
+    cur.execute("LOCK TABLE pel.progress IN ACCESS EXCLUSIVE MODE")
+    cur.execute("SELECT COUNT(*), MIN(progress_date), MAX(progress_date) FROM pel.progress")
+    total, first, last = cur.fetchone()
+
+    cur.execute(f"ALTER TABLE pel.progress RENAME TO {LEGACY}")
+    keyed = table_has_keys(cur, LEGACY)
+    if keyed:
+        # Frees the index name for the partitioned table's own key index.
+        cur.execute(f"ALTER INDEX IF EXISTS pel.progress_identity_key_idx RENAME TO {LEGACY}_identity_key_idx")
+    cur.execute(
+        f"CREATE TABLE pel.progress (LIKE pel.{LEGACY} INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING GENERATED) "
+        "PARTITION BY RANGE (progress_date)"
+    )
+    # progress_id keeps drawing from the existing sequence; move its ownership to the new table.
+    cur.execute("SELECT pg_get_serial_sequence(%s, 'progress_id')", (f"pel.{LEGACY}",))
+    sequence = cur.fetchone()[0]
+    if sequence:
+        cur.execute(f"ALTER SEQUENCE {sequence} OWNED BY pel.progress.progress_id")
+    cur.execute(f"CREATE TABLE pel.{DEFAULT_PARTITION} PARTITION OF pel.progress DEFAULT")
+
+    today = date.today()
+    last = max(last or today, today)
+    horizon = last
+    for _ in range(ahead):
+        horizon = next_period(period_start(horizon, "month"), "month")
+    for start in periods(first or today, horizon, by):
+        ensure_partition(cur, start, by)
+
+    columns = ", ".join(stored_columns(cur, LEGACY))
+    cur.execute(f"INSERT INTO pel.progress ({columns}) SELECT {columns} FROM pel.{LEGACY}")
+    moved = cur.rowcount
+    if moved != total:
+        raise RuntimeError(f"Copied {moved} rows but pel.{LEGACY} has {total}; rolled back.")
+    # Uniqueness on progress_id alone cannot be enforced across partitions.
+    cur.execute(ID_INDEX_SQL)
+    cur.execute(KEY_INDEX_SQL)
+    if keyed:
+        # The key index only; the columns came over with the table definition.
+        cur.execute(migrate_sql("progress")[1])
+    if is_tracked(cur):
+        # The change-log triggers stayed on the renamed table; the mirror follows the new one.
+        for event in ["update", "delete"]:
+            cur.execute(f"DROP TRIGGER IF EXISTS progress_log_{event} ON pel.{LEGACY}")
+        for sql in track_sql("progress"):
+            cur.execute(sql)
+    if not keep_old:
+        cur.execute(f"DROP TABLE pel.{LEGACY}")
+    print(f"Migrated {moved} rows into pel.progress partitioned by {by}.")
+
+
+def create_ahead(cur, months: int) -> list[str]:
+    if not is_partitioned(cur):
+        raise RuntimeError("pel.progress is not partitioned yet; run migrate first.")
+    by = detect_granularity(cur)
+    first = period_start(date.today(), "month")
+    last = first
+    for _ in range(months):
+        last = next_period(last, "month")
+    created = []
+    for start in periods(first, last, by):
+        if ensure_partition(cur, start, by):
+            created.append(partition_name(start, by))
+    return created
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    base_dir = Path(__file__).resolve().parent
+    parser = argparse.ArgumentParser(description="Manage date partitions of pel.progress.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    migrate_parser = sub.add_parser("migrate", help="Convert pel.progress into a partitioned table.")
+    migrate_parser.add_argument("--by", choices=["month", "year"], default="month")
+    migrate_parser.add_argument(
+        "--ahead", type=int, default=3, help="Months past today to create partitions for (default: 3)."
+    )
+    migrate_parser.add_argument(
+        "--keep-old", action="store_true", help=f"Keep the old table as pel.{LEGACY}."
+    )
+
+    ahead_parser = sub.add_parser("create-ahead", help="Create partitions for the coming months.")
+    ahead_parser.add_argument("--months", type=int, default=3, help="Months past today (default: 3).")
+
+    sub.add_parser("list", help="List partitions with approximate row counts.")
+    args = parser.parse_args(argv)
+
+    load_dotenv(base_dir / ".env")
+    if "DATABASE_URL" not in os.environ:
+        print("DATABASE_URL is not set. Put it in .env or set it in your shell.")
+        return 1
+
+    driver, conn = get_connection()
+    try:
+        with conn.cursor() as cur:
+            if args.command == "migrate":
+                migrate(cur, args.by, args.ahead, args.keep_old)
+            elif args.command == "create-ahead":
+                created = create_ahead(cur, args.months)
+                print(f"Created partitions: {', '.join(created) if created else 'none needed'}")
+            else:
+                if not is_partitioned(cur):
+                    print("pel.progress is not partitioned.")
+                    return 0
+                for name, bound, rows in list_partitions(cur):
+                    print(f"{name:<24} {rows:>10}  {bound}")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
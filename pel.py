@@ -0,0 +1,108 @@
+import argparse
+import importlib
+import sys
+from typing import Optional
+# One entry point for the workflow: "python3 pel.py <command> [target] [options]". Each command
+# runs an existing script's main() with the remaining options, and the script is only imported
+# when its command runs, so --help and quick commands do not pay for pandas/openpyxl/psycopg.
+# "python3 pel.py <command> [target] --help" shows that script's own options.
+
+# command -> (help, {target: (module, description)}); a single target named "" needs no target.
+COMMANDS = {
+    "ingest": (
+        "Convert PAS workbooks to cleaned CSVs.",
+        {"": ("clean", "clean.py")},
+    ),
+    "combine": (
+        "Combine center CSVs into student.csv / progress.csv.",
+        {
+            "students": ("student_combine", "student_combine.py"),
+            "progress": ("progress_combine", "progress_combine.py"),
+            "transfers": ("transfers", "transfers.py: resolve cross-center transfer months in a progress CSV"),
+        },
+    ),
+    "validate": (
+        "Validate *_to_load.csv before loading.",
+        {"": ("validate_to_load", "validate_to_load.py")},
+    ),
+    "load": (
+        "Load into pel.students / pel.progress.",
+        {
+            "students": ("load_student_csv", "load_student_csv.py"),
+            "progress": ("load_progress_csv", "load_progress_csv.py"),
+            "async": ("load_async", "load_async.py: both tables concurrently"),
+            "backfill": ("backfill_load", "backfill_load.py: chunked, resumable"),
+        },
+    ),
+    "backup": (
+        "Back up pel tables to archive/backups.",
+        {"": ("backup_db", "backup_db.py")},
+    ),
+    "keys": (
+        "Add, drop or check the normalized key columns on pel tables.",
+        {"": ("key_columns", "key_columns.py")},
+    ),
+    "identities": (
+        "Refresh identity_index.csv (name + email -> student_id) from pel.students.",
+        {"": ("identity_index", "identity_index.py")},
+    ),
+    "reconcile": (
+        "Compare pel.progress against a CSV.",
+        {"": ("reconcile", "reconcile.py")},
+    ),
+    "apply-levels": (
+        "Apply LevelUpdates.csv to PAS Milpitas CSV files.",
+        {"": ("update_milpitas_levels", "update_milpitas_levels.py")},
+    ),
+    "report": (
+        "Reports over progress history.",
+        {
+            "summary": ("progress_summary", "progress_summary.py: monthly summary table"),
+            "churn": ("churn_report", "churn_report.py: churn, cohorts, retention"),
+            "velocity": ("velocity", "velocity.py: pace and next-level projection"),
+            "anomalies": ("progress_anomalies", "progress_anomalies.py: ranked exceptions"),
+            "dups": ("student_dups", "student_dups.py: likely duplicate students"),
+            "diff": ("progress_diff", "progress_diff.py: corrections vs pel.progress"),
+            "review": ("review_workbook", "review_workbook.py: pre-load review workbook"),
+            "students": ("student_reports", "student_reports.py: per-student progress reports"),
+        },
+    ),
+}
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="pel.py",
+        description="PEL data workflow. Options after the command go to the underlying script.",
+    )
+    sub = parser.add_subparsers(dest="command", required=True, metavar="command")
+    for command, (help_text, targets) in COMMANDS.items():
+        # add_help=False so "--help" after a command reaches the script's own parser.
+        command_parser = sub.add_parser(command, help=help_text, add_help=False)
+        if "" not in targets:
+            command_parser.add_argument("target", nargs="?", choices=list(targets))
+    return parser
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = build_parser()
+    args, rest = parser.parse_known_args(argv)
+    help_text, targets = COMMANDS[args.command]
+    target = getattr(args, "target", "")
+    if target is None:
+        listing = ", ".join(targets)
+        if "-h" in rest or "--help" in rest:
+            print(f"usage: pel.py {args.command} {{{listing}}} [options]\n\n{help_text}")
+            for name, (_, description) in targets.items():
+                print(f"  {name}: {description}")
+            return 0
+        print(f"pel.py {args.command}: choose one of: {listing}", file=sys.stderr)
+        return 2
+    module_name, _ = targets[target]
+    module = importlib.import_module(module_name)
+    sys.argv[0] = f"pel.py {args.command}" + (f" {target}" if target else "")
+    return module.main(rest)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,76 @@
+-- pel schema as used by the loaders; applied to embedded/throwaway databases by db_backend.py.
+CREATE SCHEMA IF NOT EXISTS pel;
+
+CREATE TABLE IF NOT EXISTS pel.students (
+    student_id serial PRIMARY KEY,
+    first_name text,
+    last_name text,
+    dob_raw text,
+    address text,
+    email text,
+    enrollment_date_raw text,
+    full_name text,
+    center text,
+    tel text,
+    source text,
+    active boolean DEFAULT true,
+    alert boolean DEFAULT false,
+    dob date,
+    enrollment_date date,
+    -- Normalized match keys (key_columns.py); the loaders use them when present.
+    name_key text GENERATED ALWAYS AS (lower(regexp_replace(btrim(coalesce(full_name, '')), '\s+', ' ', 'g'))) STORED,
+    email_key text GENERATED ALWAYS AS (coalesce(nullif(lower(regexp_replace(coalesce(email, ''), '\s+', '', 'g')), 'nan'), '')) STORED
+);
+
+CREATE INDEX IF NOT EXISTS students_identity_key_idx ON pel.students (name_key, email_key);
+
+CREATE TABLE IF NOT EXISTS pel.progress (
+    progress_id serial PRIMARY KEY,
+    first_name text,
+    last_name text,
+    email text,
+    subject text,
+    pel_wks_level text,
+    pel_wks_no text,
+    progress_date date,
+    full_name text,
+    center text,
+    lvs integer,
+    student_id text,
+    notes text,
+    name_key text GENERATED ALWAYS AS (lower(regexp_replace(btrim(coalesce(full_name, '')), '\s+', ' ', 'g'))) STORED,
+    email_key text GENERATED ALWAYS AS (coalesce(nullif(lower(regexp_replace(coalesce(email, ''), '\s+', '', 'g')), 'nan'), '')) STORED
+);
+
+CREATE INDEX IF NOT EXISTS progress_identity_key_idx ON pel.progress (name_key, email_key);
+
+-- Ids of updated and deleted rows, for local_mirror.py sync (installed by local_mirror.py track).
+CREATE TABLE IF NOT EXISTS pel.change_log (
+    log_id bigserial PRIMARY KEY,
+    table_name text NOT NULL,
+    row_id bigint NOT NULL,
+    changed_at timestamptz NOT NULL DEFAULT now()
+);
+
+CREATE OR REPLACE FUNCTION pel.log_change() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    EXECUTE format(
+        'INSERT INTO pel.change_log (table_name, row_id) SELECT %L, (to_jsonb(o) ->> %L)::bigint FROM old_rows AS o',
+        TG_ARGV[0], TG_ARGV[1]
+    );
+    RETURN NULL;
+END
+$$;
+
+DROP TRIGGER IF EXISTS students_log_update ON pel.students;
+CREATE TRIGGER students_log_update AFTER UPDATE ON pel.students REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION pel.log_change('students', 'student_id');
+DROP TRIGGER IF EXISTS students_log_delete ON pel.students;
+CREATE TRIGGER students_log_delete AFTER DELETE ON pel.students REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION pel.log_change('students', 'student_id');
+DROP TRIGGER IF EXISTS progress_log_update ON pel.progress;
+CREATE TRIGGER progress_log_update AFTER UPDATE ON pel.progress REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION pel.log_change('progress', 'progress_id');
+DROP TRIGGER IF EXISTS progress_log_delete ON pel.progress;
+CREATE TRIGGER progress_log_delete AFTER DELETE ON pel.progress REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION pel.log_change('progress', 'progress_id');
@@ -0,0 +1,243 @@
+import argparse
+from datetime import date
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from level_codes import SUBJECTS, normalize_level_codes
+from progress_source import read_progress
+# Exception report over progress history: lvs drops, implausible lvs jumps, worksheets that have
+# not moved for several months, and level codes recorded under the other subject. Rules run as
+# grouped offsets over the history sorted once by student, subject and date; results are ranked
+# by score (rule weight x size of the anomaly) into one CSV.
+
+COLUMNS = ["full_name", "email", "subject", "center", "progress_date", "pel_wks_level", "pel_wks_no", "lvs"]
+REPORT = "progress_anomalies.csv"
+REPORT_COLUMNS = [
+    "rank",
+    "score",
+    "rule",
+    "full_name",
+    "email",
+    "subject",
+    "center",
+    "progress_date",
+    "pel_wks_level",
+    "pel_wks_no",
+    "lvs",
+    "prev_date",
+    "prev_lvs",
+    "detail",
+]
+
+# Per-rule defaults; each can be changed with --set RULE.OPTION=VALUE.
+RULES = {
+    "lvs_drop": {"min_drop": 1, "weight": 3.0},
+    "lvs_jump": {"max_per_month": 2, "weight": 2.0},
+    "stalled": {"months": 3, "weight": 1.0},
+    "subject_mismatch": {"weight": 4.0},
+}
+# After a load only recent history is read: an lvs change is compared with a previous entry at most
+# this many months before the loaded dates (longer when stalled.months is larger).
+LOOKBACK_MONTHS = 12
+
+
+def parse_settings(settings: list[str]) -> dict[str, dict[str, float]]:
+    rules = {name: dict(options) for name, options in RULES.items()}
+    for setting in settings:
+        name, _, value = setting.partition("=")
+        rule, _, option = name.partition(".")
+        if rule not in rules or option not in rules[rule] or not value:
+            raise SystemExit(f"Unknown rule setting: {setting} (known: {describe_rules()})")
+        try:
+            rules[rule][option] = float(value)
+        except ValueError:
+            raise SystemExit(f"Invalid rule setting: {setting} (the value must be a number)") from None
+    return rules
+
+
+def describe_rules() -> str:
+    return ", ".join(f"{rule}.{option}" for rule, options in RULES.items() for option in options)
+
+
+def prepare(df: pd.DataFrame) -> pd.DataFrame:
+    df = df.copy()
+    df["lvs"] = pd.to_numeric(df["lvs"], errors="coerce")
+    df["progress_date"] = pd.to_datetime(df["progress_date"], errors="coerce")
+    df["sheet"] = pd.to_numeric(df["pel_wks_no"].str.extract(r"^\s*(\d+)", expand=False), errors="coerce")
+    df["key"] = df["full_name"].fillna("").str.strip().str.lower() + "|" + df["email"].fillna("").str.strip().str.lower()
+    return df.dropna(subset=["progress_date", "subject"])
+
+
+def daily_series(df: pd.DataFrame) -> pd.DataFrame:
+    # One record per student, subject and date (highest lvs, then worksheet), the same
+    # "previous record" the monthly summary and the mirror's lvs-drops query use.
+    df = df.sort_values(["key", "subject", "progress_date", "lvs", "sheet"], na_position="first")
+    df = df.drop_duplicates(["key", "subject", "progress_date"], keep="last").reset_index(drop=True)
+    first = np.r_[True, (df["key"].to_numpy()[1:] != df["key"].to_numpy()[:-1])
+                  | (df["subject"].to_numpy()[1:] != df["subject"].to_numpy()[:-1])]
+    df["series_start"] = first
+    prev = np.where(first, 0, np.arange(len(df)) - 1)
+    df["prev_date"] = df["progress_date"].to_numpy()[prev]
+    df["prev_lvs"] = df["lvs"].to_numpy()[prev]
+    df.loc[first, ["prev_date", "prev_lvs"]] = np.nan
+    dates = df["progress_date"]
+    df["months"] = dates.dt.year * 12 + dates.dt.month
+    df["gap_months"] = df["months"] - df["months"].to_numpy()[prev]
+    df.loc[first, "gap_months"] = np.nan
+    return df
+
+
+def lvs_changes(series: pd.DataFrame, rules: dict) -> list[pd.DataFrame]:
+    found = []
+    change = series["lvs"] - series["prev_lvs"]
+    drop = -change
+    settings = rules.get("lvs_drop")
+    if settings:
+        mask = drop >= settings["min_drop"]
+        found.append(flag(series, mask, "lvs_drop", drop * settings["weight"], "lvs down " + fmt(drop)))
+    settings = rules.get("lvs_jump")
+    if settings:
+        per_month = change / series["gap_months"].clip(lower=1)
+        mask = per_month > settings["max_per_month"]
+        detail = "lvs up " + fmt(change) + " in " + fmt(series["gap_months"]) + " month(s)"
+        found.append(flag(series, mask, "lvs_jump", per_month * settings["weight"], detail))
+    return found
+
+
+def stalled(series: pd.DataFrame, rules: dict) -> list[pd.DataFrame]:
+    settings = rules.get("stalled")
+    if not settings:
+        return []
+    level = series["pel_wks_level"].fillna("").str.strip().str.upper().to_numpy()
+    wks_no = series["pel_wks_no"].fillna("").str.strip().str.lower().to_numpy()
+    start = series["series_start"].to_numpy()
+    # A run continues while level and worksheet number repeat; a blank worksheet never repeats.
+    same = np.r_[False, (level[1:] == level[:-1]) & (wks_no[1:] == wks_no[:-1]) & (wks_no[1:] != "")]
+    run = np.cumsum(~same | start)
+    run_start = series.groupby(run)["months"].transform("min")
+    months = series["months"] - run_start
+    since = series.groupby(run)["progress_date"].transform("min")
+    mask = months >= settings["months"]
+    detail = "PEL Wks. No. " + series["pel_wks_no"].fillna("") + " since " + since.dt.strftime("%Y-%m-%d")
+    return [flag(series, mask, "stalled", months / settings["months"] * settings["weight"], detail)]
+
+
+def subject_mismatch(df: pd.DataFrame, rules: dict) -> list[pd.DataFrame]:
+    settings = rules.get("subject_mismatch")
+    if not settings:
+        return []
+    codes = normalize_level_codes(df["pel_wks_level"])
+    code_subject = codes.str[:1].map(SUBJECTS)
+    mask = code_subject.notna() & (code_subject != df["subject"].str.strip())
+    detail = "level " + codes.fillna("") + " is " + code_subject.fillna("")
+    rows = df.assign(prev_date=pd.NaT, prev_lvs=np.nan)
+    return [flag(rows, mask, "subject_mismatch", pd.Series(settings["weight"], index=df.index), detail)]
+
+
+def flag(df: pd.DataFrame, mask: pd.Series, rule: str, score: pd.Series, detail: pd.Series) -> pd.DataFrame:
+    mask = mask.fillna(False).to_numpy(dtype=bool)
+    out = df.loc[mask, REPORT_COLUMNS[3:-1]].copy()
+    out.insert(0, "rule", rule)
+    out.insert(0, "score", score[mask].round(2).to_numpy())
+    out["detail"] = detail[mask].to_numpy()
+    return out
+
+
+def fmt(values: pd.Series) -> pd.Series:
+    return values.map(lambda v: "" if pd.isna(v) else f"{v:g}")
+
+
+def detect(df: pd.DataFrame, rules: dict, start: Optional[date] = None, end: Optional[date] = None) -> pd.DataFrame:
+    df = prepare(df)
+    series = daily_series(df)
+    found = lvs_changes(series, rules) + stalled(series, rules) + subject_mismatch(df, rules)
+    found = [frame for frame in found if not frame.empty]
+    if not found:
+        return pd.DataFrame(columns=REPORT_COLUMNS)
+    report = pd.concat(found, ignore_index=True)
+    # History is needed for the windows, but only anomalies on dates in scope are reported.
+    if start is not None:
+        report = report[report["progress_date"] >= pd.Timestamp(start)]
+    if end is not None:
+        report = report[report["progress_date"] <= pd.Timestamp(end)]
+    report = report.sort_values(["score", "rule", "full_name", "subject"], ascending=[False, True, True, True])
+    report.insert(0, "rank", np.arange(1, len(report) + 1))
+    for col in ["progress_date", "prev_date"]:
+        report[col] = pd.to_datetime(report[col]).dt.strftime("%Y-%m-%d")
+    return report[REPORT_COLUMNS]
+
+
+def history_since(start: date, rules: dict) -> date:
+    months = max(LOOKBACK_MONTHS, int(rules.get("stalled", {}).get("months", 0)))
+    # read_progress keeps dates after `since`: the last day of the month before the lookback.
+    return (pd.Period(start, freq="M") - months - 1).end_time.date()
+
+
+def write_report(
+    source: str,
+    csv: Optional[str],
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    output: str = REPORT,
+    rules: Optional[dict] = None,
+    since: Optional[date] = None,
+) -> pd.DataFrame:
+    report = detect(read_progress(source, csv, COLUMNS, since), rules or RULES, start, end)
+    report.to_csv(output, index=False)
+    return report
+
+
+def report_after_load(start: date, end: date) -> None:
+    # The load is already committed; a failed report is printed, not raised.
+    try:
+        report = write_report("db", None, start, end, since=history_since(start, RULES))
+    except Exception as exc:
+        print(f"Anomaly report failed: {exc}")
+        return
+    print_summary(report, REPORT)
+
+
+def print_summary(report: pd.DataFrame, output: str) -> None:
+    print(f"Anomalies: {len(report)} (ranked in {output})")
+    for rule, count in report["rule"].value_counts().items():
+        print(f"  - {rule}: {count}")
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Ranked exception report over progress history.")
+    parser.add_argument("--source", choices=["csv", "db"], default="db", help="Read pel.progress or a progress CSV.")
+    parser.add_argument("--csv", default=None, help="Progress CSV (default: progress.csv, else latest backup).")
+    parser.add_argument("--month", default=None, help="Report anomalies in YYYY-MM (default: the newest month).")
+    parser.add_argument("--all", action="store_true", help="Report anomalies over the whole history.")
+    parser.add_argument(
+        "--rules", nargs="+", choices=list(RULES), default=list(RULES), help="Rules to run (default: all)."
+    )
+    parser.add_argument(
+        "--set",
+        dest="settings",
+        action="append",
+        default=[],
+        metavar="RULE.OPTION=VALUE",
+        help=f"Override a rule setting, e.g. stalled.months=4 ({describe_rules()}).",
+    )
+    parser.add_argument("--output", default=REPORT, help=f"Report path (default: {REPORT}).")
+    args = parser.parse_args(argv)
+
+    rules = parse_settings(args.settings)
+    rules = {rule: rules[rule] for rule in args.rules}
+    df = read_progress(args.source, args.csv, COLUMNS)
+    start = end = None
+    if not args.all:
+        month = pd.Period(args.month, freq="M") if args.month else pd.to_datetime(df["progress_date"]).max().to_period("M")
+        start, end = month.start_time.date(), month.end_time.date()
+        print(f"Reporting anomalies dated {month}")
+    report = detect(df, rules, start, end)
+    report.to_csv(args.output, index=False)
+    print_summary(report, args.output)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
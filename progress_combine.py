@@ -1,8 +1,25 @@
+import argparse
+import csv
+import heapq
 import os
 import re
+import tempfile
 from datetime import datetime
+from typing import Iterator, Optional
 
 import pandas as pd
+
+from dtype_plan import (
+    PROGRESS_DTYPES,
+    apply_dtype_plan,
+    concat_planned,
+    legacy_frame,
+    memory_report,
+    normalized_category,
+)
+from level_codes import clean_code, lookup_levels, unknown_levels
+from name_normalize import build_full_name, normalize_identity
+from validate_to_load import is_blank
 #This file pulls together progress data from both Fremont and Milpitas PAS CSV files and generates a combined progress.csv file.
 
 MONTH_MAP = {
@@ -20,6 +37,26 @@ MONTH_MAP = {
     "DEC": 12,
 }
 
+CENTER_FOLDERS = {
+    "Fremont": "PAS Fremont CSV",
+    "Milpitas": "PAS Milpitas CSV",
+}
+
+PROGRESS_COLUMNS = [
+    "First Name",
+    "Last Name",
+    "Email",
+    "Subject (M/E)",
+    "PEL Wks. Level",
+    "PEL Wks. No.",
+    "Notes",
+    "Date",
+]
+# Output order of both paths; --stream --sort merges per-file runs sorted on the same keys, and
+# ties keep file order in both because every sort is stable.
+SORT_COLUMNS = ["Center", "First Name", "Last Name", "Subject", "Date"]
+REQUIRED_COLUMNS = ["Full Name", "Subject", "PEL Wks. Level", "lvs", "Date"]
+
 
 def _merge_columns(df: pd.DataFrame, candidates: list[str], target: str) -> pd.DataFrame:
     if not candidates:
@@ -36,162 +73,286 @@ def _merge_columns(df: pd.DataFrame, candidates: list[str], target: str) -> pd.D
     return df
 
 
-def build_progress(output_folder: str) -> pd.DataFrame:
-    rows = []
+def file_date(filename: str) -> datetime:
+    fname = filename.upper()
 
-    for filename in os.listdir(output_folder):
-        if not filename.endswith(".csv"):
-            continue
+    month = None
+    for key, value in MONTH_MAP.items():
+        if key in fname:
+            month = value
+            break
 
-        try:
-            fname = filename.upper()
-
-            month = None
-            for key, value in MONTH_MAP.items():
-                if key in fname:
-                    month = value
-                    break
-
-            date_match = re.search(r"(\d{2})(\d{2})$", fname.replace(".CSV", ""))
-
-            df = pd.read_csv(os.path.join(output_folder, filename))
-            df = df.rename(columns=lambda c: str(c).strip())
-            df = df.rename(
-                columns={
-                    "Subject1 (M/E)": "Subject (M/E)",
-                }
-            )
-
-            def is_level_col(col: str) -> bool:
-                c = str(col).upper()
-                return bool(re.search(r"\bWKS?\b", c)) and ("LEVEL" in c or bool(re.search(r"\bLV\b", c)))
-
-            def is_no_col(col: str) -> bool:
-                c = str(col).upper()
-                return bool(re.search(r"\bWKS?\b", c)) and ("NO" in c or "#" in c)
-
-            level_cols = [c for c in df.columns if is_level_col(c)]
-            no_cols = [c for c in df.columns if is_no_col(c)]
-            subject_cols = [c for c in df.columns if c == "Subject (M/E)" or c.startswith("Subject (M/E).")]
-
-            if "PEL Wks. Level" in level_cols:
-                level_cols = ["PEL Wks. Level"] + [c for c in level_cols if c != "PEL Wks. Level"]
-            if "PEL Wks. No." in no_cols:
-                no_cols = ["PEL Wks. No."] + [c for c in no_cols if c != "PEL Wks. No."]
-
-            df = _merge_columns(df, level_cols, "PEL Wks. Level")
-            df = _merge_columns(df, no_cols, "PEL Wks. No.")
-            df = _merge_columns(df, subject_cols, "Subject (M/E)")
-            if "Notes" not in df.columns:
-                df["Notes"] = pd.NA
-
-            year = 2000 + int(date_match.group(2))
-            file_date = datetime(year, month, 1)
-
-            df["First Name"] = df["First Name"].astype(str).str.strip()
-            df["Last Name"] = df["Last Name"].astype(str).str.strip()
-            df["Email"] = df["Email"].astype(str).str.strip()
-            df["PEL Wks. Level"] = df["PEL Wks. Level"].astype(str).str.strip().str.upper()
-            if "Subject (M/E)" not in df.columns:
-                level_subjects = df["PEL Wks. Level"].astype(str).str.strip().str.upper()
-                df["Subject (M/E)"] = level_subjects.str.startswith("E").map(
-                    {True: "E", False: "M"}
-                )
-            else:
-                df["Subject (M/E)"] = df["Subject (M/E)"].astype(str).str.strip().str.upper()
-
-            df["Date"] = file_date
-            rows.append(
-                df[
-                    [
-                        "First Name",
-                        "Last Name",
-                        "Email",
-                        "Subject (M/E)",
-                        "PEL Wks. Level",
-                        "PEL Wks. No.",
-                        "Notes",
-                        "Date",
-                    ]
-                ]
-            )
-        except KeyError as exc:
-            print(filename, exc)
+    date_match = re.search(r"(\d{2})(\d{2})$", fname.replace(".CSV", "").replace(".XLSX", ""))
+
+    year = 2000 + int(date_match.group(2))
+    return datetime(year, month, 1)
 
-    progress_df = pd.concat(rows, ignore_index=True)
 
-    return (
-        progress_df.sort_values(["First Name", "Last Name", "Subject (M/E)", "Date"])
-        .reset_index(drop=True)
+def read_progress_file(output_folder: str, filename: str) -> pd.DataFrame:
+    df = pd.read_csv(os.path.join(output_folder, filename))
+    df = df.rename(columns=lambda c: str(c).strip())
+    df = df.rename(
+        columns={
+            "Subject1 (M/E)": "Subject (M/E)",
+        }
     )
 
+    def is_level_col(col: str) -> bool:
+        c = str(col).upper()
+        return bool(re.search(r"\bWKS?\b", c)) and ("LEVEL" in c or bool(re.search(r"\bLV\b", c)))
+
+    def is_no_col(col: str) -> bool:
+        c = str(col).upper()
+        return bool(re.search(r"\bWKS?\b", c)) and ("NO" in c or "#" in c)
+
+    level_cols = [c for c in df.columns if is_level_col(c)]
+    no_cols = [c for c in df.columns if is_no_col(c)]
+    subject_cols = [c for c in df.columns if c == "Subject (M/E)" or c.startswith("Subject (M/E).")]
+
+    if "PEL Wks. Level" in level_cols:
+        level_cols = ["PEL Wks. Level"] + [c for c in level_cols if c != "PEL Wks. Level"]
+    if "PEL Wks. No." in no_cols:
+        no_cols = ["PEL Wks. No."] + [c for c in no_cols if c != "PEL Wks. No."]
+
+    df = _merge_columns(df, level_cols, "PEL Wks. Level")
+    df = _merge_columns(df, no_cols, "PEL Wks. No.")
+    df = _merge_columns(df, subject_cols, "Subject (M/E)")
+    if "Notes" not in df.columns:
+        df["Notes"] = pd.NA
+
+    # Each column is normalized exactly once here; later steps rely on the planned dtypes.
+    df = normalize_identity(df)
+    df["PEL Wks. Level"] = normalized_category(df["PEL Wks. Level"], lambda v: clean_code(v) or None)
+    if "Subject (M/E)" not in df.columns:
+        df["Subject (M/E)"] = lookup_levels(df["PEL Wks. Level"])["subject"].map(
+            {"English": "E", "Math": "M"}
+        )
+    else:
+        df["Subject (M/E)"] = normalized_category(
+            df["Subject (M/E)"], lambda v: str(v).strip().upper() or None
+        )
 
-def main() -> int:
-    fremont_progress = build_progress("Pas Fremont CSV")
-    milpitas_progress = build_progress("Pas Milpitas CSV")
+    df["Date"] = file_date(filename)
+    return apply_dtype_plan(df[PROGRESS_COLUMNS], PROGRESS_DTYPES)
 
-    #fremont_progress.to_csv("Fremont progress.csv", index=False)
-    #milpitas_progress.to_csv("Milpitas progress.csv", index=False)
 
-    fremont_progress["Center"] = "Fremont"
-    milpitas_progress["Center"] = "Milpitas"
+def iter_progress_files(output_folder: str) -> Iterator[pd.DataFrame]:
+    for filename in sorted(os.listdir(output_folder)):
+        if not filename.endswith(".csv"):
+            continue
+        try:
+            yield read_progress_file(output_folder, filename)
+        except KeyError as exc:
+            print(filename, exc)
 
-    combined = pd.concat([fremont_progress, milpitas_progress], ignore_index=True)
 
+def build_progress(output_folder: str) -> pd.DataFrame:
+    return concat_planned(iter_progress_files(output_folder))
+
+
+def finish_progress(combined: pd.DataFrame) -> tuple[pd.DataFrame, pd.DataFrame]:
     combined = combined.rename(columns={"Subject (M/E)": "Subject"})
-    subject_levels = combined["PEL Wks. Level"].astype(str).str.strip().str.upper()
-    combined["Subject"] = subject_levels.str.startswith("E").map(
-        {True: "English", False: "Math"}
-    )
+    levels = lookup_levels(combined["PEL Wks. Level"])
+    combined["PEL Wks. Level"] = levels["level"]
+    combined["Subject"] = levels["subject"]
     if "Full Name" in combined.columns:
         combined = combined.drop(columns=["Full Name"])
-    full_name = (
-        combined["Last Name"].astype(str).str.strip()
-        + ", "
-        + combined["First Name"].astype(str).str.strip()
-    )
     insert_at = combined.columns.get_loc("Last Name") + 1
-    combined.insert(insert_at, "Full Name", full_name)
+    combined.insert(insert_at, "Full Name", build_full_name(combined))
 
-    worksheets = pd.read_csv("worksheets.csv")
-    level_key = worksheets["PEL Wks. Level"].astype(str).str.strip().str.upper()
-    level_to_lvs = pd.Series(worksheets["Lvs Value"].values, index=level_key)
-    combined_levels = combined["PEL Wks. Level"].astype(str).str.strip().str.upper()
-    lvs_values = combined_levels.map(level_to_lvs)
     if "lvs" in combined.columns:
         combined = combined.drop(columns=["lvs"])
     insert_at = combined.columns.get_loc("PEL Wks. Level") + 1
-    combined.insert(
-        insert_at, "lvs", pd.to_numeric(lvs_values, errors="coerce").astype("Int64")
-    )
+    combined.insert(insert_at, "lvs", levels["lvs"])
+
+    unknown = unknown_levels(combined["PEL Wks. Level"])
 
     # Drop rows missing required fields.
-    required_cols = ["Full Name", "Subject", "PEL Wks. Level", "lvs", "Date"]
-    for col in required_cols:
+    for col in REQUIRED_COLUMNS:
         if col not in combined.columns:
             raise KeyError(f"Missing required column: {col}")
 
-    def is_blank(series: pd.Series) -> pd.Series:
-        stripped = series.astype(str).str.strip()
-        return series.isna() | stripped.eq("") | stripped.str.upper().isin(
-            ["NAN", "NONE", "NULL"]
-        )
-
     blank_mask = pd.concat(
-        [is_blank(combined[col]) for col in required_cols], axis=1
+        [is_blank(combined[col]) for col in REQUIRED_COLUMNS], axis=1
     ).any(axis=1)
     combined = combined.loc[~blank_mask].reset_index(drop=True)
+    return apply_dtype_plan(combined, PROGRESS_DTYPES), unknown
+
+
+def combine_month(centers: dict[str, str], target: datetime) -> tuple[pd.DataFrame, pd.DataFrame]:
+    # Only the files whose report month is `target`; used for incremental runs.
+    frames = []
+    for center, folder in centers.items():
+        for filename in sorted(os.listdir(folder)):
+            if not filename.endswith(".csv"):
+                continue
+            try:
+                if file_date(filename) != target:
+                    continue
+                df = read_progress_file(folder, filename)
+            except (AttributeError, KeyError, TypeError, ValueError) as exc:
+                print(filename, exc)
+                continue
+            df["Center"] = center
+            frames.append(df)
+    if not frames:
+        raise ValueError(f"No PAS CSV files for {target:%Y-%m}.")
+    return finish_progress(concat_planned(frames))
+
+
+def print_unknown_levels(unknown: pd.DataFrame) -> None:
+    if unknown.empty:
+        return
+    print("Level codes not in worksheets.csv (rows dropped):")
+    for row in unknown.itertuples(index=False):
+        hint = f" -> did you mean {row.suggestions}?" if row.suggestions else ""
+        print(f"  - {row.code}: {row.rows} rows{hint}")
+
+
+def iter_finished_chunks(centers: dict[str, str]) -> Iterator[tuple[pd.DataFrame, pd.DataFrame]]:
+    for center, folder in centers.items():
+        for df in iter_progress_files(folder):
+            df["Center"] = center
+            yield finish_progress(df)
+
+
+def merge_runs(run_paths: list[str], output_path: str, sort_columns: list[str]) -> int:
+    handles = [open(path, "r", encoding="utf-8", newline="") for path in run_paths]
+    try:
+        readers = [csv.reader(handle) for handle in handles]
+        headers = [next(reader) for reader in readers]
+        header = headers[0]
+        positions = [header.index(col) for col in sort_columns]
+
+        def sort_key(row: list[str]) -> tuple:
+            # Blank values sort last, like pandas sort_values puts NA last.
+            return tuple((row[i] == "", row[i]) for i in positions)
+
+        written = 0
+        with open(output_path, "w", encoding="utf-8", newline="") as out:
+            writer = csv.writer(out, lineterminator="\n")
+            writer.writerow(header)
+            for row in heapq.merge(*readers, key=sort_key):
+                writer.writerow(row)
+                written += 1
+        return written
+    finally:
+        for handle in handles:
+            handle.close()
+
+
+def stream_progress(centers: dict[str, str], output_path: str, sort: bool, identities=None) -> int:
+    unknown_parts = []
+    written = 0
+    with tempfile.TemporaryDirectory(prefix="progress_runs_") as run_dir:
+        run_paths = []
+        for df, unknown in iter_finished_chunks(centers):
+            unknown_parts.append(unknown)
+            if df.empty:
+                continue
+            if identities is not None:
+                df = identities.add_ids(df)
+            if sort:
+                run_path = os.path.join(run_dir, f"run_{len(run_paths):05d}.csv")
+                df.sort_values(SORT_COLUMNS, kind="stable").to_csv(run_path, index=False)
+                run_paths.append(run_path)
+            else:
+                df.to_csv(output_path, mode="w" if written == 0 else "a", header=written == 0, index=False)
+                written += len(df)
+
+        if sort and run_paths:
+            written = merge_runs(run_paths, output_path, SORT_COLUMNS)
+
+    unknown = pd.concat(unknown_parts, ignore_index=True)
+    if not unknown.empty:
+        unknown = (
+            unknown.groupby("code", as_index=False)
+            .agg(rows=("rows", "sum"), suggestions=("suggestions", "first"))
+            .sort_values("rows", ascending=False)
+        )
+    print_unknown_levels(unknown)
+    return written
 
-    combined.to_csv("progress.csv", index=False)
 
-    #students_df1 = pd.read_csv("Fremont students.csv")
-    #students_df2 = pd.read_csv("Milpitas students.csv")
+def main(argv: Optional[list[str]] = None) -> int:
+    # Imported here: transfers.py imports this module.
+    from transfers import RULES, resolve_csv, resolve_transfers
 
-    #students_df1["Center"] = "Fremont"
-    #students_df2["Center"] = "Milpitas"
+    parser = argparse.ArgumentParser(
+        description="Combine Fremont and Milpitas PAS CSV files into progress.csv."
+    )
+    parser.add_argument("--output", default="progress.csv", help="Output CSV (default: progress.csv).")
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Process one file at a time and append to the output, keeping memory flat.",
+    )
+    parser.add_argument(
+        "--sort",
+        action="store_true",
+        help="With --stream, produce a sorted output using an external merge of per-file runs.",
+    )
+    parser.add_argument(
+        "--memory-report",
+        action="store_true",
+        help="Print per-column memory of the combined frame with and without the dtype plan.",
+    )
+    parser.add_argument(
+        "--resolve-ids",
+        action="store_true",
+        help="Add a Student ID column from the identity index, so the load needs no student_id link.",
+    )
+    parser.add_argument(
+        "--transfer-rule",
+        choices=RULES,
+        default="destination",
+        help="Which row to keep when a student has rows at both centers in one month (see transfers.py).",
+    )
+    parser.add_argument(
+        "--transfers-report", default="transfers_report.csv", help="Transfer report CSV (default: transfers_report.csv)."
+    )
+    args = parser.parse_args(argv)
+    if args.sort and not args.stream:
+        parser.error("--sort only applies with --stream; the in-memory output is always sorted.")
 
-    #students_combined = pd.concat([students_df1, students_df2], ignore_index=True)
-    #students_combined.to_csv("students.csv", index=False)
+    if args.stream:
+        identities = None
+        if args.resolve_ids:
+            from identity_index import IdentityIndex
+
+            identities = IdentityIndex()
+        try:
+            written = stream_progress(CENTER_FOLDERS, args.output, args.sort, identities)
+        finally:
+            if identities is not None:
+                identities.close()
+        # Transfers pair rows from different files, so they are resolved on the written output.
+        written -= resolve_csv(args.output, args.transfer_rule, args.transfers_report)
+        print(f"Wrote {written} rows to {args.output}")
+        return 0
+
+    centers = []
+    for center, folder in CENTER_FOLDERS.items():
+        center_progress = build_progress(folder)
+        center_progress["Center"] = center
+        centers.append(center_progress)
+
+    combined = concat_planned(centers)
+    combined, unknown = finish_progress(combined)
+    print_unknown_levels(unknown)
+    combined = resolve_transfers(combined, args.transfer_rule, args.transfers_report)
+    combined = combined.sort_values(SORT_COLUMNS, kind="stable").reset_index(drop=True)
+
+    if args.memory_report:
+        report = memory_report(legacy_frame(combined), combined)
+        print(f"Memory by column ({len(combined)} rows):")
+        print(report.to_string())
+
+    if args.resolve_ids:
+        from identity_index import add_student_ids
+
+        combined = add_student_ids(combined)
+    combined.to_csv(args.output, index=False)
 
     return 0
 
@@ -0,0 +1,197 @@
+import argparse
+import os
+from pathlib import Path
+from typing import Optional
+
+import pandas as pd
+
+import key_columns
+import progress_summary
+from load_progress_csv import (
+    HEADER_TO_DB,
+    build_sql,
+    check_header,
+    copy_csv_psycopg,
+    copy_csv_psycopg2,
+    execute_sql,
+    fetch_date_range,
+    get_connection,
+    load_dotenv,
+    read_csv_header,
+    resolve_progress_csv,
+)
+# Stages a progress CSV the same way the loader does and classifies every key as new, duplicate,
+# identical or changed (with the changed columns) against pel.progress. --apply writes the
+# changes with one UPDATE ... FROM the staging table (replaces one-off fix scripts).
+
+KEY_COLUMNS = ["full_name", "email", "subject", "progress_date", "center"]
+NEVER_COMPARED = set(KEY_COLUMNS) | {"student_id"}
+# Matched on name_key/email_key when keyed, so case/spacing corrections to the raw text are diffs.
+NORMALIZED_KEYS = {"full_name", "email"}
+
+
+def never_compared(keyed: bool) -> set[str]:
+    return NEVER_COMPARED - NORMALIZED_KEYS if keyed else NEVER_COMPARED
+
+
+def key_match(date_range, keyed: bool = False) -> str:
+    # Equality on coalesced keys is hash-joinable (IS NOT DISTINCT FROM is not); the IS NULL
+    # check keeps NULL and '' apart, so the result is the same as IS NOT DISTINCT FROM.
+    # With key_columns.py migrated, name and email match on the indexed generated keys instead.
+    parts = [key_columns.key_match("dest", "src")] if keyed else []
+    for col in KEY_COLUMNS:
+        if keyed and col in ("full_name", "email"):
+            continue
+        blank = "DATE '0001-01-01'" if col == "progress_date" else "''"
+        parts.append(f"coalesce(dest.{col}, {blank}) = coalesce(src.{col}, {blank})")
+        parts.append(f"(dest.{col} IS NULL) = (src.{col} IS NULL)")
+    match = " AND ".join(parts)
+    if date_range:
+        # Same literal bounds as the loader so a partitioned pel.progress is pruned.
+        match += (
+            f" AND dest.progress_date BETWEEN DATE '{date_range[0]:%Y-%m-%d}' "
+            f"AND DATE '{date_range[1]:%Y-%m-%d}'"
+        )
+    return match
+
+
+def diff_sql(columns: list[str], date_range, keyed: bool = False) -> str:
+    changed = ", ".join(
+        f"CASE WHEN dest.{col} IS DISTINCT FROM src.{col} THEN '{col}' END" for col in columns
+    )
+    values = ", ".join(f"dest.{col} AS db_{col}, src.{col} AS new_{col}" for col in columns)
+    return f"""
+        SELECT
+            CASE
+                WHEN dest.progress_id IS NULL THEN 'new'
+                WHEN cardinality(diff.changed) = 0 THEN 'identical'
+                ELSE 'changed'
+            END AS status,
+            {", ".join(f"src.{col}" for col in KEY_COLUMNS)},
+            array_to_string(diff.changed, ',') AS changed_columns,
+            dest.progress_id,
+            {values}
+        FROM temp_progress AS src
+        LEFT JOIN pel.progress AS dest ON {key_match(date_range, keyed)}
+        CROSS JOIN LATERAL (
+            SELECT array_remove(ARRAY[{changed}]::text[], NULL) AS changed
+        ) AS diff
+        ORDER BY src.progress_date, src.center, src.full_name, src.subject
+    """
+
+
+def update_sql(columns: list[str], date_range, keyed: bool = False) -> str:
+    assignments = ", ".join(f"{col} = src.{col}" for col in columns)
+    differs = " OR ".join(f"dest.{col} IS DISTINCT FROM src.{col}" for col in columns)
+    return (
+        f"UPDATE pel.progress AS dest SET {assignments} "
+        f"FROM temp_progress AS src "
+        f"WHERE {key_match(date_range, keyed)} AND ({differs})"
+    )
+
+
+def resolve_columns(header: list[str], requested: list[str] | None, keyed: bool = False) -> list[str]:
+    available = [HEADER_TO_DB[col] for col in header if HEADER_TO_DB[col] not in never_compared(keyed)]
+    if not requested:
+        return available
+    columns = [HEADER_TO_DB.get(col, col) for col in requested]
+    unknown = [col for col in columns if col not in available]
+    if unknown:
+        raise SystemExit(f"Cannot compare {', '.join(unknown)}; comparable columns: {', '.join(available)}")
+    return columns
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    base_dir = Path(__file__).resolve().parent
+    parser = argparse.ArgumentParser(
+        description="Diff a progress CSV against pel.progress by key; optionally apply the changes."
+    )
+    parser.add_argument("csv", nargs="?", default=None, help="Progress CSV (default: progress_to_load.csv).")
+    parser.add_argument(
+        "--columns",
+        nargs="+",
+        default=None,
+        help="Only compare/apply these columns (CSV header or DB names, e.g. 'PEL Wks. No.' notes).",
+    )
+    parser.add_argument("--report", default="progress_diff.csv", help="Per-key report (default: progress_diff.csv).")
+    parser.add_argument("--apply", action="store_true", help="Update changed rows in pel.progress.")
+    args = parser.parse_args(argv)
+
+    load_dotenv(base_dir / ".env")
+    if "DATABASE_URL" not in os.environ:
+        print("DATABASE_URL is not set. Put it in .env or set it in your shell.")
+        return 1
+
+    progress_csv = Path(args.csv) if args.csv else resolve_progress_csv(base_dir)
+    if not progress_csv.exists():
+        print(f"Missing CSV file: {progress_csv}")
+        return 1
+    header = read_csv_header(progress_csv)
+    error = check_header(header, progress_csv.name)
+    if error:
+        print(error)
+        return 1
+    driver, conn = get_connection()
+    try:
+        keyed = key_columns.has_key_columns(conn, "progress")
+        columns = resolve_columns(header, args.columns, keyed)
+        sql = build_sql(header, keyed=keyed)
+        if "notes" in columns:
+            execute_sql(conn, sql["add_notes"])
+        execute_sql(conn, sql["create_temp"])
+        if driver == "psycopg":
+            copy_csv_psycopg(conn, sql["copy"], progress_csv)
+        else:
+            copy_csv_psycopg2(conn, sql["copy"], progress_csv)
+        execute_sql(conn, sql["dedup"])
+        with conn.cursor() as cur:
+            cur.execute("TRUNCATE temp_progress")
+            cur.execute("INSERT INTO temp_progress SELECT * FROM temp_progress_dedup")
+        date_range = fetch_date_range(conn)
+
+        with conn.cursor() as cur:
+            cur.execute(diff_sql(columns, date_range, keyed))
+            names = [d[0] for d in cur.description]
+            report = pd.DataFrame(cur.fetchall(), columns=names)
+        # A key that matches several pel.progress rows fans out; it is reported, never applied.
+        matches = report.groupby(KEY_COLUMNS, dropna=False)["progress_id"].transform("count")
+        report.loc[matches > 1, "status"] = "duplicate"
+        duplicates = report.loc[matches > 1, KEY_COLUMNS].drop_duplicates()
+
+        updated = 0
+        if args.apply and len(duplicates):
+            conn.rollback()
+            report.to_csv(args.report, index=False)
+            print(f"Not applied: {len(duplicates)} keys match more than one pel.progress row:")
+            for row in duplicates.itertuples(index=False):
+                print("  - " + ", ".join("" if pd.isna(value) else str(value) for value in row))
+            print(f"Report: {args.report}")
+            return 1
+        if args.apply:
+            with conn.cursor() as cur:
+                cur.execute(update_sql(columns, date_range, keyed))
+                updated = cur.rowcount
+                # lvs corrections change the monthly summary for these months.
+                progress_summary.refresh_months(cur, progress_summary.affected_months(cur))
+        conn.commit()
+    finally:
+        conn.close()
+
+    report.to_csv(args.report, index=False)
+    counts = report["status"].value_counts()
+    print(f"Compared columns: {', '.join(columns)}")
+    for status in ["new", "identical", "changed", "duplicate"]:
+        print(f"{status}: {int(counts.get(status, 0))}")
+    changed = report.loc[report["status"] == "changed", "changed_columns"].str.split(",").explode()
+    for col, n in changed.value_counts().items():
+        print(f"  {col} changed in {n} rows")
+    print(f"Report: {args.report}")
+    if args.apply:
+        print(f"Updated rows: {updated}")
+    elif counts.get("changed", 0):
+        print("Preview only. Re-run with --apply to update changed rows.")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
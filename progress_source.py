@@ -0,0 +1,61 @@
+import os
+from datetime import date
+from pathlib import Path
+from typing import Optional
+
+import pandas as pd
+
+from load_progress_csv import HEADER_TO_DB
+# Reads progress history for the analytics scripts from a CSV (combined progress.csv,
+# *_to_load.csv or a DB backup) or from pel.progress, always with DB column names.
+
+BASE_DIR = Path(__file__).resolve().parent
+
+
+def default_csv() -> Path:
+    combined = BASE_DIR / "progress.csv"
+    if combined.exists():
+        return combined
+    backups = sorted((BASE_DIR / "archive" / "backups").glob("backup_pel_progress_*.csv"))
+    if not backups:
+        raise SystemExit("No progress.csv or archive/backups/backup_pel_progress_*.csv found; pass --csv.")
+    return backups[-1]
+
+
+def read_progress_csv(path: Path, columns: list[str], since: Optional[date] = None) -> pd.DataFrame:
+    df = pd.read_csv(path, dtype="string")
+    df = df.rename(columns=lambda c: HEADER_TO_DB.get(c.strip(), c.strip()))
+    missing = [col for col in columns if col not in df.columns]
+    if missing:
+        raise SystemExit(f"{path.name} is missing columns: {', '.join(missing)}")
+    df = df[columns]
+    if since is not None:
+        df = df[pd.to_datetime(df["progress_date"], errors="coerce") > pd.Timestamp(since)]
+    return df.reset_index(drop=True)
+
+
+def read_progress_db(columns: list[str], since: Optional[date] = None) -> pd.DataFrame:
+    from load_progress_csv import get_connection, load_dotenv
+
+    load_dotenv(BASE_DIR / ".env")
+    if "DATABASE_URL" not in os.environ:
+        raise SystemExit("DATABASE_URL is not set. Put it in .env or set it in your shell.")
+    sql = f"SELECT {', '.join(columns)} FROM pel.progress"
+    params = None
+    if since is not None:
+        sql += " WHERE progress_date > %s"
+        params = (since,)
+    _, conn = get_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(sql, params)
+            rows = cur.fetchall()
+    finally:
+        conn.close()
+    return pd.DataFrame(rows, columns=columns).astype("string")
+
+
+def read_progress(source: str, csv: Optional[str], columns: list[str], since: Optional[date] = None) -> pd.DataFrame:
+    if source == "db":
+        return read_progress_db(columns, since)
+    return read_progress_csv(Path(csv) if csv else default_csv(), columns, since)
@@ -0,0 +1,198 @@
+import argparse
+import os
+from datetime import date, datetime
+from pathlib import Path
+from typing import Optional
+
+import load_progress_csv
+# Monthly summary of pel.progress per center x subject x month, kept up to date by the
+# loaders for just the months a batch touches. Dashboards read pel.progress_monthly_summary.
+
+SUMMARY_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS pel.progress_monthly_summary (
+        center text,
+        subject text,
+        month date NOT NULL,
+        students integer NOT NULL,
+        entries integer NOT NULL,
+        mean_lvs numeric(6, 2),
+        median_lvs numeric(6, 2),
+        advanced integer NOT NULL,
+        dropped integer NOT NULL,
+        refreshed_at timestamptz NOT NULL DEFAULT now()
+    )
+"""
+SUMMARY_INDEX_SQL = (
+    "CREATE INDEX IF NOT EXISTS progress_monthly_summary_month_idx "
+    "ON pel.progress_monthly_summary (month, center, subject)"
+)
+# Previous-record lookups per student series; also used by AFFECTED_MONTHS_SQL.
+SERIES_INDEX_SQL = (
+    "CREATE INDEX IF NOT EXISTS progress_series_idx "
+    "ON pel.progress (full_name, email, subject, progress_date)"
+)
+
+SUMMARY_DDL = [SUMMARY_TABLE_SQL, SUMMARY_INDEX_SQL, SERIES_INDEX_SQL]
+
+# advanced/dropped compare each row's lvs with the same student's previous record in that subject.
+AGGREGATE_SQL = """
+    INSERT INTO pel.progress_monthly_summary
+        (center, subject, month, students, entries, mean_lvs, median_lvs, advanced, dropped)
+    SELECT
+        center,
+        subject,
+        date_trunc('month', progress_date)::date AS month,
+        COUNT(DISTINCT (full_name, email)),
+        COUNT(*),
+        ROUND(AVG(lvs), 2),
+        percentile_cont(0.5) WITHIN GROUP (ORDER BY lvs),
+        COUNT(*) FILTER (WHERE lvs > prev_lvs),
+        COUNT(*) FILTER (WHERE lvs < prev_lvs)
+    FROM scoped
+    GROUP BY 1, 2, 3
+"""
+
+# The previous record is the latest earlier date in the series (highest lvs on that date);
+# rows with a NULL name/email/subject have none.
+REBUILD_SCOPE_SQL = """
+    WITH daily AS (
+        SELECT full_name, email, subject, progress_date, MAX(lvs) AS day_lvs
+        FROM pel.progress
+        WHERE progress_date IS NOT NULL
+        GROUP BY full_name, email, subject, progress_date
+    ),
+    ranked AS (
+        SELECT full_name, email, subject, progress_date,
+               LAG(day_lvs) OVER (PARTITION BY full_name, email, subject ORDER BY progress_date) AS prev_lvs
+        FROM daily
+    ),
+    scoped AS (
+        SELECT p.center, p.subject, p.progress_date, p.full_name, p.email, p.lvs, r.prev_lvs
+        FROM pel.progress AS p
+        LEFT JOIN ranked AS r
+          ON r.full_name = p.full_name
+         AND r.email = p.email
+         AND r.subject = p.subject
+         AND r.progress_date = p.progress_date
+        WHERE p.progress_date IS NOT NULL
+    )
+"""
+
+MONTHS_SCOPE_SQL = """
+    WITH scoped AS (
+        SELECT p.center, p.subject, p.progress_date, p.full_name, p.email, p.lvs,
+               (
+                   SELECT q.lvs
+                   FROM pel.progress AS q
+                   WHERE q.full_name = p.full_name
+                     AND q.email = p.email
+                     AND q.subject = p.subject
+                     AND q.progress_date < p.progress_date
+                   ORDER BY q.progress_date DESC, q.lvs DESC NULLS LAST
+                   LIMIT 1
+               ) AS prev_lvs
+        FROM pel.progress AS p
+        WHERE p.progress_date >= %(first)s AND p.progress_date < %(end)s
+          AND date_trunc('month', p.progress_date)::date = ANY(%(months)s)
+    )
+"""
+
+# Months whose summary a batch in temp_progress can change: its own months, plus the month
+# of each series' next record, whose advanced/dropped counts compare against the batch rows.
+AFFECTED_MONTHS_SQL = """
+    SELECT DISTINCT date_trunc('month', progress_date)::date
+    FROM temp_progress
+    WHERE progress_date IS NOT NULL
+    UNION
+    SELECT DISTINCT date_trunc('month', nxt.progress_date)::date
+    FROM (SELECT DISTINCT full_name, email, subject, progress_date FROM temp_progress) AS b
+    CROSS JOIN LATERAL (
+        SELECT p.progress_date
+        FROM pel.progress AS p
+        WHERE p.full_name = b.full_name
+          AND p.email = b.email
+          AND p.subject = b.subject
+          AND p.progress_date > b.progress_date
+        ORDER BY p.progress_date
+        LIMIT 1
+    ) AS nxt
+"""
+
+
+def month_end(month: date) -> date:
+    return date(month.year + (month.month == 12), month.month % 12 + 1, 1)
+
+
+def ensure_summary(cur) -> None:
+    for sql in SUMMARY_DDL:
+        cur.execute(sql)
+
+
+def affected_months(cur) -> list[date]:
+    cur.execute(AFFECTED_MONTHS_SQL)
+    return sorted(row[0] for row in cur.fetchall())
+
+
+def refresh_statements(months) -> list[tuple[str, Optional[dict]]]:
+    # (sql, params) in order; shared by refresh_months and the async loader's cursor.
+    months = sorted({date(m.year, m.month, 1) for m in months})
+    if not months:
+        return []
+    params = {"months": months, "first": months[0], "end": month_end(months[-1])}
+    return [(sql, None) for sql in SUMMARY_DDL] + [
+        ("DELETE FROM pel.progress_monthly_summary WHERE month = ANY(%(months)s)", params),
+        (MONTHS_SCOPE_SQL + AGGREGATE_SQL, params),
+    ]
+
+
+def refresh_months(cur, months) -> int:
+    statements = refresh_statements(months)
+    for sql, params in statements:
+        cur.execute(sql, params)
+    return cur.rowcount if statements else 0
+
+
+def rebuild(cur) -> int:
+    ensure_summary(cur)
+    cur.execute("TRUNCATE pel.progress_monthly_summary")
+    cur.execute(REBUILD_SCOPE_SQL + AGGREGATE_SQL)
+    return cur.rowcount
+
+
+def parse_month(value: str) -> date:
+    return datetime.strptime(value, "%Y-%m").date()
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    base_dir = Path(__file__).resolve().parent
+    parser = argparse.ArgumentParser(
+        description="Refresh pel.progress_monthly_summary (center x subject x month)."
+    )
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument("--rebuild", action="store_true", help="Recompute every month from pel.progress.")
+    group.add_argument(
+        "--months", nargs="+", type=parse_month, metavar="YYYY-MM", help="Recompute only these months."
+    )
+    args = parser.parse_args(argv)
+
+    load_progress_csv.load_dotenv(base_dir / ".env")
+    if "DATABASE_URL" not in os.environ:
+        print("DATABASE_URL is not set. Put it in .env or set it in your shell.")
+        return 1
+
+    driver, conn = load_progress_csv.get_connection()
+    try:
+        with conn.cursor() as cur:
+            if args.rebuild:
+                rows = rebuild(cur)
+            else:
+                rows = refresh_months(cur, args.months)
+        conn.commit()
+    finally:
+        conn.close()
+    print(f"Summary rows written: {rows}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
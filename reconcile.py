@@ -0,0 +1,183 @@
+import argparse
+import hashlib
+import os
+from collections import Counter
+from pathlib import Path
+from typing import Optional
+
+import pandas as pd
+
+from load_progress_csv import HEADER_TO_DB, get_connection, load_dotenv
+# Compares pel.progress with a CSV (a backup in archive/backups or a *_to_load.csv) per
+# (center, month): row count plus an order-independent content hash computed on both sides.
+# Only partitions whose count or hash differ are pulled row by row.
+
+HASH_COLUMNS = [
+    "full_name",
+    "email",
+    "subject",
+    "pel_wks_level",
+    "pel_wks_no",
+    "progress_date",
+    "center",
+    "lvs",
+    "notes",
+]
+SEPARATOR = "\x1f"
+
+# md5 of the row text; the first 15 hex digits (60 bits) fit a bigint, and the per-partition
+# SUM is exact (numeric), so the total does not depend on row order.
+ROW_TEXT_SQL = (
+    "concat_ws(chr(31), "
+    + ", ".join(
+        f"coalesce({col}::text, '')" if col in ("progress_date", "lvs") else f"coalesce({col}, '')"
+        for col in HASH_COLUMNS
+    )
+    + ")"
+)
+ROW_HASH_SQL = f"('x' || substr(md5({ROW_TEXT_SQL}), 1, 15))::bit(60)::bigint"
+PARTITION_SQL = (
+    "SELECT coalesce(center, '') AS center, coalesce(to_char(progress_date, 'YYYY-MM'), '') AS month, "
+    f"COUNT(*) AS rows, SUM({ROW_HASH_SQL}) AS content_hash "
+    "FROM pel.progress {where} GROUP BY 1, 2"
+)
+ROWS_SQL = (
+    f"SELECT {', '.join(HASH_COLUMNS)}, {ROW_HASH_SQL} AS row_hash "
+    "FROM pel.progress "
+    "WHERE coalesce(center, '') = %s AND coalesce(to_char(progress_date, 'YYYY-MM'), '') = %s"
+)
+
+
+def read_local(path: Path) -> pd.DataFrame:
+    df = pd.read_csv(path, dtype=str, keep_default_na=False)
+    df = df.rename(columns=lambda c: HEADER_TO_DB.get(c.strip(), c.strip()))
+    # Backups from before pel.progress.notes existed: those rows have NULL notes in the DB.
+    if "notes" not in df.columns:
+        df["notes"] = ""
+    missing = [col for col in HASH_COLUMNS if col not in df.columns]
+    if missing:
+        raise ValueError(f"{path.name} is missing columns: {', '.join(missing)}")
+    df = df[HASH_COLUMNS].copy()
+    # Match the DB's text rendering: ISO dates and integer lvs ("12.0" -> "12").
+    dates = pd.to_datetime(df["progress_date"].replace("", None), errors="coerce")
+    df["progress_date"] = dates.dt.strftime("%Y-%m-%d").fillna("")
+    lvs = pd.to_numeric(df["lvs"].replace("", None), errors="coerce").astype("Int64")
+    df["lvs"] = lvs.astype("string").fillna("")
+    return df
+
+
+def local_hashes(df: pd.DataFrame) -> pd.Series:
+    text = df[HASH_COLUMNS[0]].str.cat([df[col] for col in HASH_COLUMNS[1:]], sep=SEPARATOR)
+    return pd.Series(
+        [int(hashlib.md5(t.encode("utf-8")).hexdigest()[:15], 16) for t in text],
+        index=df.index,
+        dtype=object,
+    )
+
+
+def local_partitions(df: pd.DataFrame) -> pd.DataFrame:
+    keyed = pd.DataFrame(
+        {
+            "center": df["center"],
+            "month": df["progress_date"].str[:7],
+            "row_hash": df["row_hash"],
+        }
+    )
+    grouped = keyed.groupby(["center", "month"], sort=True)["row_hash"]
+    return pd.DataFrame({"rows": grouped.size(), "content_hash": grouped.sum()}).reset_index()
+
+
+def server_partitions(conn, months: list[str] | None) -> pd.DataFrame:
+    where, params = "", None
+    if months is not None:
+        where = "WHERE coalesce(to_char(progress_date, 'YYYY-MM'), '') = ANY(%s)"
+        params = (months,)
+    with conn.cursor() as cur:
+        cur.execute(PARTITION_SQL.format(where=where), params)
+        rows = cur.fetchall()
+    result = pd.DataFrame(rows, columns=["center", "month", "rows", "content_hash"])
+    result["content_hash"] = result["content_hash"].map(int)
+    return result
+
+
+def compare_partitions(local: pd.DataFrame, server: pd.DataFrame) -> pd.DataFrame:
+    merged = local.merge(server, on=["center", "month"], how="outer", suffixes=("_local", "_db"))
+    merged[["rows_local", "rows_db"]] = merged[["rows_local", "rows_db"]].fillna(0).astype(int)
+    merged["match"] = (merged["rows_local"] == merged["rows_db"]) & (
+        merged["content_hash_local"] == merged["content_hash_db"]
+    )
+    return merged.sort_values(["month", "center"]).reset_index(drop=True)
+
+
+def drill_down(conn, df: pd.DataFrame, center: str, month: str) -> pd.DataFrame:
+    with conn.cursor() as cur:
+        cur.execute(ROWS_SQL, (center, month))
+        db_rows = pd.DataFrame(cur.fetchall(), columns=HASH_COLUMNS + ["row_hash"])
+    local_rows = df[(df["center"] == center) & (df["progress_date"].str[:7] == month)]
+
+    # Multiset difference on row hashes, so duplicated rows are counted too.
+    db_counts = Counter(db_rows["row_hash"].map(int))
+    local_counts = Counter(local_rows["row_hash"])
+    only_db = db_counts - local_counts
+    only_local = local_counts - db_counts
+
+    parts = []
+    for side, rows, extra in [("db_only", db_rows, only_db), ("local_only", local_rows, only_local)]:
+        for row_hash, times in extra.items():
+            row = rows[rows["row_hash"].map(int) == row_hash].iloc[[0]]
+            parts.append(row[HASH_COLUMNS].assign(side=side, copies=times))
+    if not parts:
+        return pd.DataFrame(columns=["side"] + HASH_COLUMNS + ["copies"])
+    return pd.concat(parts, ignore_index=True)[["side"] + HASH_COLUMNS + ["copies"]]
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    base_dir = Path(__file__).resolve().parent
+    parser = argparse.ArgumentParser(
+        description="Reconcile pel.progress against a CSV by per-(center, month) counts and hashes."
+    )
+    parser.add_argument("csv", help="Progress backup (DB column names) or *_to_load.csv (header names).")
+    parser.add_argument(
+        "--partial",
+        action="store_true",
+        help="The CSV covers only some months (e.g. a to-load file); compare just those months.",
+    )
+    parser.add_argument(
+        "--report", default="reconcile_report.csv", help="Row-level differences (default: reconcile_report.csv)."
+    )
+    args = parser.parse_args(argv)
+
+    load_dotenv(base_dir / ".env")
+    if "DATABASE_URL" not in os.environ:
+        print("DATABASE_URL is not set. Put it in .env or set it in your shell.")
+        return 1
+
+    local = read_local(Path(args.csv))
+    local["row_hash"] = local_hashes(local)
+    local_parts = local_partitions(local)
+    months = sorted(local_parts["month"].unique().tolist()) if args.partial else None
+
+    driver, conn = get_connection()
+    try:
+        comparison = compare_partitions(local_parts, server_partitions(conn, months))
+        mismatched = comparison[~comparison["match"]]
+        details = [drill_down(conn, local, row.center, row.month) for row in mismatched.itertuples()]
+    finally:
+        conn.close()
+
+    print(f"Partitions compared: {len(comparison)}, mismatched: {len(mismatched)}")
+    print(f"Rows: local {comparison['rows_local'].sum()}, db {comparison['rows_db'].sum()}")
+    if mismatched.empty:
+        print("pel.progress matches the CSV.")
+        return 0
+
+    for row in mismatched.itertuples():
+        print(f"  {row.center or '(no center)'} {row.month or '(no date)'}: local {row.rows_local}, db {row.rows_db}")
+    report = pd.concat(details, ignore_index=True)
+    report.to_csv(args.report, index=False)
+    print(f"Row differences: {len(report)} (see {args.report})")
+    return 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
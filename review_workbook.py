@@ -0,0 +1,236 @@
+import argparse
+from pathlib import Path
+from typing import Iterator, Optional
+
+import numpy as np
+import pandas as pd
+
+import student_dups
+from level_codes import unknown_levels
+from load_progress_csv import HEADER_TO_DB
+from progress_anomalies import RULES, detect
+from progress_source import read_progress
+from validate_to_load import read_to_load, validate_progress, validate_students
+# One workbook for the pre-load review (README step C): new students, new progress rows,
+# suspected duplicates, unknown levels, lvs drops and validation failures. Highlights are
+# computed per sheet as arrays first; rows are then streamed out (xlsxwriter constant_memory,
+# or openpyxl write_only when xlsxwriter is not installed), so memory stays flat on backfills.
+
+REVIEW_XLSX = "review_to_load.xlsx"
+# Highlight levels per row or cell: 0 none, 1 check, 2 problem.
+FILLS = {1: "FFF2CC", 2: "F8CBAD"}
+PROGRESS_KEY = ["Full Name", "Email", "Subject", "Date"]
+WRITE_SLICE_ROWS = 10000
+
+
+def iter_rows(df: pd.DataFrame) -> Iterator[tuple[int, np.ndarray]]:
+    # Only one slice at a time is converted to Python objects, so peak memory does not grow
+    # with the sheet.
+    for start in range(0, len(df), WRITE_SLICE_ROWS):
+        part = df.iloc[start:start + WRITE_SLICE_ROWS]
+        values = part.astype(object).where(part.notna(), None).to_numpy()
+        for offset, row in enumerate(values):
+            yield start + offset, row
+
+
+class ReviewWorkbook:
+    def __init__(self, path: Path):
+        self.path = path
+        try:
+            import xlsxwriter  # type: ignore
+
+            self.kind = "xlsxwriter"
+            self.book = xlsxwriter.Workbook(str(path), {"constant_memory": True})
+            self.bold = self.book.add_format({"bold": True})
+            self.fills = {level: self.book.add_format({"bg_color": f"#{color}"}) for level, color in FILLS.items()}
+        except ModuleNotFoundError:
+            try:
+                from openpyxl import Workbook  # type: ignore
+                from openpyxl.styles import Font, PatternFill  # type: ignore
+            except ModuleNotFoundError as exc:
+                raise RuntimeError("Install xlsxwriter (or openpyxl) to write the review workbook.") from exc
+            self.kind = "openpyxl"
+            self.book = Workbook(write_only=True)
+            self.bold = Font(bold=True)
+            self.fills = {level: PatternFill("solid", fgColor=color) for level, color in FILLS.items()}
+
+    def add_sheet(
+        self, name: str, df: pd.DataFrame, row_flags: Optional[np.ndarray] = None, cell_flags: Optional[np.ndarray] = None
+    ) -> None:
+        n_rows, n_cols = df.shape
+        flags = np.zeros((n_rows, n_cols), dtype=np.int8)
+        if row_flags is not None:
+            flags = np.maximum(flags, np.asarray(row_flags, dtype=np.int8)[:, None])
+        if cell_flags is not None:
+            flags = np.maximum(flags, cell_flags)
+        plain = ~flags.any(axis=1)
+        header = [str(col) for col in df.columns]
+
+        if self.kind == "xlsxwriter":
+            sheet = self.book.add_worksheet(name)
+            sheet.write_row(0, 0, header, self.bold)
+            sheet.freeze_panes(1, 0)
+            for r, values in iter_rows(df):
+                if plain[r]:
+                    sheet.write_row(r + 1, 0, values)
+                    continue
+                for c in range(n_cols):
+                    sheet.write(r + 1, c, values[c], self.fills.get(int(flags[r, c])))
+            if n_rows:
+                sheet.autofilter(0, 0, n_rows, max(n_cols - 1, 0))
+            return
+
+        from openpyxl.cell import WriteOnlyCell  # type: ignore
+
+        sheet = self.book.create_sheet(name)
+        sheet.freeze_panes = "A2"
+        heading = []
+        for text in header:
+            cell = WriteOnlyCell(sheet, value=text)
+            cell.font = self.bold
+            heading.append(cell)
+        sheet.append(heading)
+        for r, values in iter_rows(df):
+            if plain[r]:
+                sheet.append(list(values))
+                continue
+            row = []
+            for c in range(n_cols):
+                cell = WriteOnlyCell(sheet, value=values[c])
+                if flags[r, c]:
+                    cell.fill = self.fills[int(flags[r, c])]
+                row.append(cell)
+            sheet.append(row)
+
+    def close(self) -> None:
+        if self.kind == "xlsxwriter":
+            self.book.close()
+        else:
+            self.book.save(str(self.path))
+
+
+def validation_cells(df: pd.DataFrame, report: pd.DataFrame, file_name: str) -> np.ndarray:
+    cells = np.zeros(df.shape, dtype=np.int8)
+    found = report[(report["file"] == file_name) & (report["line"] >= 2)]
+    rows = found["line"].to_numpy(dtype=np.int64) - 2
+    cols = df.columns.get_indexer(found["column"])
+    keep = (cols >= 0) & (rows < len(df))
+    cells[rows[keep], cols[keep]] = 2
+    return cells
+
+
+def row_keys(frame: pd.DataFrame, columns: list[str]) -> pd.Series:
+    parts = [frame[col].astype("string").fillna("").str.strip().str.lower() for col in columns]
+    key = parts[0]
+    for part in parts[1:]:
+        key = key + "|" + part
+    return key
+
+
+def suspected_duplicates(students: pd.DataFrame, file_name: str, history: str, threshold: float) -> pd.DataFrame:
+    if students.empty:
+        # No new students, so no pair can involve one (and an empty batch has nothing to block on).
+        return pd.DataFrame(columns=[f"{col}_{side}" for side in "ab" for col in ["first_name", "last_name", "email"]])
+    new = students.rename(
+        columns={"First Name": "first_name", "Last Name": "last_name", "Email": "email", "Center": "center", "Source": "source"}
+    )
+    new = new.reindex(columns=["first_name", "last_name", "email", "center", "source"]).assign(
+        student_id=pd.NA, origin=file_name
+    )
+    frames = [new]
+    if history == "db":
+        frames.append(student_dups.read_students_db())
+    elif history == "csv":
+        from db_backend import latest_backup
+
+        frames.append(student_dups.read_students_csv([latest_backup("students")]))
+    records = student_dups.prepare_records(pd.concat(frames, ignore_index=True))
+    pairs = student_dups.candidate_pairs(student_dups.blocking_keys(records), 200)
+    scored = student_dups.score_pairs(records, pairs)
+    review = student_dups.build_review(records, scored[scored["score"] >= threshold])
+    # Only pairs that involve a student about to be loaded.
+    review = review[(review["origin_a"] == file_name) | (review["origin_b"] == file_name)]
+    review["rank"] = np.arange(1, len(review) + 1)
+    return review.reset_index(drop=True)
+
+
+def lvs_drops(progress: pd.DataFrame, history: str) -> pd.DataFrame:
+    columns = ["full_name", "email", "subject", "center", "progress_date", "pel_wks_level", "pel_wks_no", "lvs"]
+    new = progress.rename(columns=HEADER_TO_DB).reindex(columns=columns)
+    frames = [new]
+    if history != "none":
+        frames.append(read_progress(history, None, columns))
+    dates = pd.to_datetime(new["progress_date"], errors="coerce")
+    if dates.isna().all():
+        return pd.DataFrame()
+    rules = {"lvs_drop": RULES["lvs_drop"]}
+    drops = detect(pd.concat(frames, ignore_index=True), rules, dates.min().date(), dates.max().date())
+    # Only drops recorded by the rows about to be loaded, not ones already in the history.
+    drop_keys = row_keys(drops, ["full_name", "email", "subject", "progress_date"])
+    new_keys = row_keys(new.assign(progress_date=dates.dt.strftime("%Y-%m-%d")), ["full_name", "email", "subject", "progress_date"])
+    return drops[drop_keys.isin(new_keys).to_numpy()].drop(columns=["rank"]).reset_index(drop=True)
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Write one review workbook for the *_to_load.csv files.")
+    parser.add_argument("--progress", default="progress_to_load.csv", help="Progress CSV to review.")
+    parser.add_argument("--students", default="student_to_load.csv", help="Student CSV to review.")
+    parser.add_argument(
+        "--history",
+        choices=["csv", "db", "none"],
+        default="csv",
+        help="Existing data for duplicates and lvs drops: latest archive/backups CSVs, the DB, or none.",
+    )
+    parser.add_argument("--period", default=None, help="Target month as YYYY-MM (default: most common month).")
+    parser.add_argument("--dup-threshold", type=float, default=0.75, help="Minimum duplicate score (default: 0.75).")
+    parser.add_argument("--output", default=REVIEW_XLSX, help=f"Workbook to write (default: {REVIEW_XLSX}).")
+    args = parser.parse_args(argv)
+
+    progress_path, students_path = Path(args.progress), Path(args.students)
+    progress = read_to_load(progress_path) if progress_path.exists() else pd.DataFrame(columns=PROGRESS_KEY)
+    students = (
+        read_to_load(students_path)
+        if students_path.exists()
+        else pd.DataFrame(columns=["First Name", "Last Name", "Full Name", "Email"])
+    )
+
+    validation = pd.concat(
+        [validate_progress(progress, progress_path.name, args.period), validate_students(students, students_path.name)],
+        ignore_index=True,
+    )
+    duplicates = suspected_duplicates(students, students_path.name, args.history, args.dup_threshold)
+    drops = lvs_drops(progress, args.history)
+    unknown = unknown_levels(progress["PEL Wks. Level"]) if "PEL Wks. Level" in progress.columns else pd.DataFrame()
+
+    dup_keys = pd.concat(
+        [
+            row_keys(duplicates, ["first_name_a", "last_name_a", "email_a"]),
+            row_keys(duplicates, ["first_name_b", "last_name_b", "email_b"]),
+        ]
+    )
+    student_flags = row_keys(students, ["First Name", "Last Name", "Email"]).isin(dup_keys).to_numpy().astype(np.int8)
+    progress_flags = np.zeros(len(progress), dtype=np.int8)
+    if len(drops):
+        dated = progress.assign(Date=pd.to_datetime(progress["Date"], errors="coerce").dt.strftime("%Y-%m-%d"))
+        drop_keys = row_keys(drops, ["full_name", "email", "subject", "progress_date"])
+        progress_flags = row_keys(dated, PROGRESS_KEY).isin(drop_keys).to_numpy().astype(np.int8)
+
+    book = ReviewWorkbook(Path(args.output))
+    sheets = [
+        ("New students", students, student_flags, validation_cells(students, validation, students_path.name)),
+        ("New progress", progress, progress_flags, validation_cells(progress, validation, progress_path.name)),
+        ("Suspected duplicates", duplicates, np.where(duplicates.get("score", pd.Series(dtype=float)) >= 0.9, 2, 1), None),
+        ("Unknown levels", unknown, None, None),
+        ("lvs drops", drops, np.where(drops.get("prev_lvs", pd.Series(dtype=float)) - drops.get("lvs", 0) >= 2, 2, 1), None),
+        ("Validation", validation, None, None),
+    ]
+    for name, frame, row_flags, cell_flags in sheets:
+        book.add_sheet(name, frame, row_flags, cell_flags)
+        print(f"{name}: {len(frame)} rows")
+    book.close()
+    print(f"Review workbook written ({book.kind}): {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,6 +1,12 @@
+import argparse
 import os
+from typing import Iterator, Optional
+
 import pandas as pd
-import re
+
+from date_parse import STUDENT_DATE_COLUMNS, format_dates
+from dtype_plan import STUDENT_DTYPES, apply_dtype_plan, concat_planned
+from name_normalize import build_full_name, normalize_identity
 # This file combines student data from PAS Fremont and PAS Milpitas CSV files into a single student.csv file.
 input_folders = ["PAS Fremont CSV", "PAS Milpitas CSV"]
 output_file = "student.csv"
@@ -9,79 +15,122 @@ center_labels = {
     "PAS Milpitas CSV": "Milpitas",
 }
 
-all_data = []
-
-for input_folder in input_folders:
-    for filename in os.listdir(input_folder):
-
-        df = pd.read_csv(os.path.join(input_folder, filename))
-
-        df = df.rename(columns=lambda c: c.strip())
-
-        required_cols = [
-            "First Name",
-            "Last Name",
-            "DOB (MM/DD/YY)",
-            "Address",
-            "Email",
-            "DOE (Date of Enrollment MM/DD/YY)"
-        ]
-        phone_cols = ["Tel:", "Tel", "Telephone", "Phone", "Phone Number"]
-
-        missing = [c for c in required_cols if c not in df.columns]
-        if missing:
-            print(f"Skipping {filename}, missing columns: {missing}")
-            continue
-
-        phone_col = next((c for c in phone_cols if c in df.columns), None)
-        if phone_col is None:
-            df["Tel:"] = pd.NA
-        elif phone_col != "Tel:":
-            df = df.rename(columns={phone_col: "Tel:"})
-
-        df = df[required_cols + ["Tel:"]]
-        df["Source"] = filename
-        df["Center"] = center_labels.get(input_folder, "")
-
-        df["First Name"] = df["First Name"].astype(str).str.strip()
-        df["Last Name"] = df["Last Name"].astype(str).str.strip()
-        df["Tel:"] = df["Tel:"].astype("string").str.strip()
-        df["Email"] = df["Email"].astype(str).str.strip().str.lower()
-
-        all_data.append(df)
-
-
-combined_df = pd.concat(all_data, ignore_index=True)
-
-students_df = (
-    combined_df
-    .groupby(["Email", "First Name", "Last Name"], as_index=False)
-    .agg(lambda x: x.dropna().iloc[0] if not x.dropna().empty else pd.NA)
-)
-
-if "Full Name" in students_df.columns:
-    students_df = students_df.drop(columns=["Full Name"])
-full_name = (
-    students_df["Last Name"].astype(str).str.strip()
-    + ", "
-    + students_df["First Name"].astype(str).str.strip()
-)
-insert_at = students_df.columns.get_loc("Last Name") + 1
-students_df.insert(insert_at, "Full Name", full_name)
-
-students_df = students_df[
-    [
-        "First Name",
-        "Last Name",
-        "Full Name",
-        "DOB (MM/DD/YY)",
-        "Address",
-        "Tel:",
-        "Source",
-        "Email",
-        "DOE (Date of Enrollment MM/DD/YY)",
-        "Center",
-    ]
+required_cols = [
+    "First Name",
+    "Last Name",
+    "DOB (MM/DD/YY)",
+    "Address",
+    "Email",
+    "DOE (Date of Enrollment MM/DD/YY)"
 ]
+phone_cols = ["Tel:", "Tel", "Telephone", "Phone", "Phone Number"]
+key_cols = ["Email", "First Name", "Last Name"]
+output_cols = [
+    "First Name",
+    "Last Name",
+    "Full Name",
+    "DOB (MM/DD/YY)",
+    "Address",
+    "Tel:",
+    "Source",
+    "Email",
+    "DOE (Date of Enrollment MM/DD/YY)",
+    "Center",
+    "DOB",
+    "Enrollment Date",
+]
+
 
-students_df.to_csv(output_file, index=False)
+def read_student_file(input_folder: str, filename: str) -> pd.DataFrame | None:
+    df = pd.read_csv(os.path.join(input_folder, filename))
+
+    df = df.rename(columns=lambda c: c.strip())
+
+    missing = [c for c in required_cols if c not in df.columns]
+    if missing:
+        print(f"Skipping {filename}, missing columns: {missing}")
+        return None
+
+    phone_col = next((c for c in phone_cols if c in df.columns), None)
+    if phone_col is None:
+        df["Tel:"] = pd.NA
+    elif phone_col != "Tel:":
+        df = df.rename(columns={phone_col: "Tel:"})
+
+    df = df[required_cols + ["Tel:"]]
+    df["Source"] = filename
+    df["Center"] = center_labels.get(input_folder, "")
+
+    df = normalize_identity(df)
+    df["Tel:"] = df["Tel:"].astype("string").str.strip()
+    return apply_dtype_plan(df, STUDENT_DTYPES)
+
+
+def iter_student_files(folders: list[str]) -> Iterator[pd.DataFrame]:
+    for input_folder in folders:
+        for filename in sorted(os.listdir(input_folder)):
+            df = read_student_file(input_folder, filename)
+            if df is not None:
+                yield df
+
+
+def dedupe_students(combined_df: pd.DataFrame) -> pd.DataFrame:
+    # First non-null value per column for each (Email, First Name, Last Name).
+    return combined_df.groupby(key_cols, as_index=False, dropna=False, sort=True).first()
+
+
+def finish_students(students_df: pd.DataFrame) -> pd.DataFrame:
+    if "Full Name" in students_df.columns:
+        students_df = students_df.drop(columns=["Full Name"])
+    insert_at = students_df.columns.get_loc("Last Name") + 1
+    students_df.insert(insert_at, "Full Name", build_full_name(students_df))
+    # Typed ISO dates next to the raw text, so the loader copies dates instead of parsing them.
+    for raw_col, date_col in STUDENT_DATE_COLUMNS.items():
+        students_df[date_col] = format_dates(students_df[raw_col], raw_col)
+    return students_df[output_cols]
+
+
+def stream_students(folders: list[str]) -> pd.DataFrame:
+    # Fold each file into the running result so memory tracks distinct students, not files.
+    running = None
+    for df in iter_student_files(folders):
+        running = dedupe_students(df if running is None else concat_planned([running, df]))
+    if running is None:
+        raise ValueError("No student CSV files found.")
+    return running
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Combine Fremont and Milpitas PAS CSV files into student.csv."
+    )
+    parser.add_argument("--output", default=output_file, help=f"Output CSV (default: {output_file}).")
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Dedupe file by file instead of loading every file first, keeping memory flat.",
+    )
+    parser.add_argument(
+        "--resolve-ids",
+        action="store_true",
+        help="Add a Student ID column from the identity index (new students get an id from pel.students).",
+    )
+    args = parser.parse_args(argv)
+
+    if args.stream:
+        students_df = stream_students(input_folders)
+    else:
+        combined_df = concat_planned(iter_student_files(input_folders))
+        students_df = dedupe_students(combined_df)
+
+    students_df = finish_students(students_df)
+    if args.resolve_ids:
+        from identity_index import add_student_ids
+
+        students_df = add_student_ids(students_df)
+    students_df.to_csv(args.output, index=False)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
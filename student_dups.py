@@ -0,0 +1,301 @@
+import argparse
+import os
+import re
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+# This script finds likely duplicate students (name typos, case differences, email variants)
+# in pel.students or the combined CSV files and writes a ranked review file.
+
+DEFAULT_CSV_SOURCES = [
+    "student_to_load.csv",
+    "student.csv",
+    "progress_to_load.csv",
+    "progress.csv",
+]
+
+SOUNDEX_CODES = {
+    **dict.fromkeys("BFPV", "1"),
+    **dict.fromkeys("CGJKQSXZ", "2"),
+    **dict.fromkeys("DT", "3"),
+    "L": "4",
+    **dict.fromkeys("MN", "5"),
+    "R": "6",
+}
+
+
+def soundex(text: str) -> str:
+    letters = re.sub(r"[^A-Z]", "", str(text).upper())
+    if not letters:
+        return ""
+    code = letters[0]
+    prev = SOUNDEX_CODES.get(letters[0], "")
+    for ch in letters[1:]:
+        digit = SOUNDEX_CODES.get(ch, "")
+        if digit and digit != prev:
+            code += digit
+        if ch not in "HW":
+            prev = digit
+        if len(code) == 4:
+            break
+    return code.ljust(4, "0")
+
+
+def map_unique(series: pd.Series, func) -> pd.Series:
+    # Apply a scalar function once per distinct value instead of once per row.
+    codes, uniques = pd.factorize(series, use_na_sentinel=False)
+    mapped = np.array([func(value) for value in uniques], dtype=object)
+    return pd.Series(mapped[codes], index=series.index)
+
+
+def clean_name(series: pd.Series) -> pd.Series:
+    text = series.astype("string").fillna("").str.lower()
+    text = text.str.replace(r"[^a-z ]+", " ", regex=True)
+    return text.str.replace(r"\s+", " ", regex=True).str.strip()
+
+
+def canonical_email(series: pd.Series) -> pd.Series:
+    email = series.astype("string").fillna("").str.strip().str.lower()
+    return email.where(~email.isin(["nan", "none", "null"]), "")
+
+
+def email_local_part(email: pd.Series) -> pd.Series:
+    local = email.str.split("@").str[0].fillna("")
+    return local.str.replace(r"\+.*$", "", regex=True).str.replace(".", "", regex=False)
+
+
+def read_students_db() -> pd.DataFrame:
+    from load_student_csv import get_connection, load_dotenv
+
+    load_dotenv(Path(__file__).resolve().parent / ".env")
+    if "DATABASE_URL" not in os.environ:
+        raise SystemExit("DATABASE_URL is not set. Put it in .env or set it in your shell.")
+
+    _, conn = get_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(
+                "SELECT student_id, first_name, last_name, email, center, source "
+                "FROM pel.students"
+            )
+            rows = cur.fetchall()
+    finally:
+        conn.close()
+
+    df = pd.DataFrame(
+        rows, columns=["student_id", "first_name", "last_name", "email", "center", "source"]
+    )
+    df["origin"] = "pel.students"
+    return df
+
+
+def read_students_csv(paths: list[Path]) -> pd.DataFrame:
+    # Accept both the *_to_load.csv headers and DB column names (archive/backups).
+    header_to_col = {
+        "Student ID": "student_id",
+        "First Name": "first_name",
+        "Last Name": "last_name",
+        "Email": "email",
+        "Center": "center",
+        "Source": "source",
+    }
+    wanted = set(header_to_col) | set(header_to_col.values())
+    frames = []
+    for path in paths:
+        df = pd.read_csv(path, usecols=lambda c: c.strip() in wanted, dtype="string")
+        df = df.rename(columns=lambda c: header_to_col.get(c.strip(), c.strip()))
+        for col in ["student_id", "center", "source"]:
+            if col not in df.columns:
+                df[col] = pd.NA
+        df["origin"] = path.name
+        frames.append(df)
+    if not frames:
+        raise SystemExit("No student CSV sources found.")
+    return pd.concat(frames, ignore_index=True)
+
+
+def prepare_records(df: pd.DataFrame) -> pd.DataFrame:
+    df = df.copy()
+    df["first_key"] = clean_name(df["first_name"])
+    df["last_key"] = clean_name(df["last_name"])
+    df["email_key"] = canonical_email(df["email"])
+    df = df[(df["first_key"] != "") | (df["last_key"] != "")]
+    for col in ["first_name", "last_name", "email"]:
+        df[col] = df[col].astype("string").str.strip().fillna("")
+
+    # Progress files repeat each student once per subject and month; score each raw spelling once.
+    grouped = df.groupby(["first_name", "last_name", "email"], sort=False)
+    records = grouped.agg(
+        first_key=("first_key", "first"),
+        last_key=("last_key", "first"),
+        email_key=("email_key", "first"),
+        center=("center", lambda x: ", ".join(sorted(x.dropna().astype(str).unique()))),
+        student_id=("student_id", "first"),
+        origin=("origin", "first"),
+        occurrences=("origin", "size"),
+    ).reset_index()
+    records["email_local"] = email_local_part(records["email_key"])
+    records["name_key"] = (records["first_key"] + " " + records["last_key"]).str.strip()
+    return records.reset_index(drop=True)
+
+
+def blocking_keys(records: pd.DataFrame) -> pd.DataFrame:
+    last_sx = map_unique(records["last_key"], soundex)
+    first_sx = map_unique(records["first_key"], soundex)
+    first_initial = records["first_key"].str[:1]
+    last_initial = records["last_key"].str[:1]
+    sorted_tokens = map_unique(records["name_key"], lambda s: " ".join(sorted(s.split())))
+
+    keys = {
+        "last_phonetic": "L:" + last_sx + first_initial,
+        "first_phonetic": "F:" + first_sx + last_initial,
+        "name_tokens": "T:" + sorted_tokens,
+        "email_local": ("E:" + records["email_local"]).where(records["email_local"].str.len() >= 3),
+    }
+    frames = [
+        pd.DataFrame({"rid": records.index, "block": values, "rule": rule})
+        for rule, values in keys.items()
+    ]
+    blocks = pd.concat(frames, ignore_index=True).dropna(subset=["block"])
+    return blocks[blocks["block"].str.len() > 2]
+
+
+def candidate_pairs(blocks: pd.DataFrame, max_block: int) -> pd.DataFrame:
+    sizes = blocks.groupby("block")["rid"].transform("size")
+    oversized = blocks.loc[sizes > max_block, "block"].nunique()
+    if oversized:
+        print(f"Skipped {oversized} blocks larger than {max_block} records")
+    blocks = blocks[(sizes > 1) & (sizes <= max_block)]
+
+    pairs = blocks.merge(blocks, on=["block", "rule"], suffixes=("_a", "_b"))
+    pairs = pairs[pairs["rid_a"] < pairs["rid_b"]]
+    return (
+        pairs.groupby(["rid_a", "rid_b"], as_index=False)["rule"]
+        .agg(lambda x: ",".join(sorted(set(x))))
+        .rename(columns={"rule": "blocked_by"})
+    )
+
+
+def trigram_table(records: pd.DataFrame) -> pd.DataFrame:
+    def grams(name: str) -> list[str]:
+        padded = f"  {name} "
+        return sorted({padded[i : i + 3] for i in range(len(padded) - 2)})
+
+    gram_lists = map_unique(records["name_key"], grams)
+    table = pd.DataFrame({"rid": records.index, "gram": gram_lists}).explode("gram")
+    return table.dropna(subset=["gram"])
+
+
+def score_pairs(records: pd.DataFrame, pairs: pd.DataFrame) -> pd.DataFrame:
+    grams = trigram_table(records)
+    gram_counts = grams.groupby("rid").size()
+
+    shared = pairs[["rid_a", "rid_b"]].merge(
+        grams.rename(columns={"rid": "rid_a"}), on="rid_a"
+    )
+    shared = shared.merge(grams.rename(columns={"rid": "rid_b"}), on=["rid_b", "gram"])
+    inter = shared.groupby(["rid_a", "rid_b"]).size().rename("shared_grams")
+    pairs = pairs.merge(inter, left_on=["rid_a", "rid_b"], right_index=True, how="left")
+    pairs["shared_grams"] = pairs["shared_grams"].fillna(0)
+
+    size_a = gram_counts.reindex(pairs["rid_a"]).to_numpy()
+    size_b = gram_counts.reindex(pairs["rid_b"]).to_numpy()
+    union = size_a + size_b - pairs["shared_grams"].to_numpy()
+    pairs["name_similarity"] = np.where(union > 0, pairs["shared_grams"] / union, 0.0)
+
+    email_a = records["email_key"].to_numpy()[pairs["rid_a"]]
+    email_b = records["email_key"].to_numpy()[pairs["rid_b"]]
+    local_a = records["email_local"].to_numpy()[pairs["rid_a"]]
+    local_b = records["email_local"].to_numpy()[pairs["rid_b"]]
+    same_email = (email_a == email_b) & (email_a != "")
+    same_local = (local_a == local_b) & (local_a != "")
+    pairs["email_match"] = np.select(
+        [same_email, same_local], ["same", "same local part"], default=""
+    )
+    email_score = np.select([same_email, same_local], [1.0, 0.6], default=0.0)
+
+    name_a = records["name_key"].to_numpy()[pairs["rid_a"]]
+    name_b = records["name_key"].to_numpy()[pairs["rid_b"]]
+    pairs["same_name"] = name_a == name_b
+    pairs["score"] = (0.7 * pairs["name_similarity"] + 0.3 * email_score).round(4)
+    return pairs.drop(columns=["shared_grams"])
+
+
+def build_review(records: pd.DataFrame, pairs: pd.DataFrame) -> pd.DataFrame:
+    side_cols = ["first_name", "last_name", "email", "center", "student_id", "origin", "occurrences"]
+    out = pairs.copy()
+    for side in ["a", "b"]:
+        picked = records.loc[out[f"rid_{side}"], side_cols].reset_index(drop=True)
+        picked.columns = [f"{col}_{side}" for col in side_cols]
+        out = pd.concat([out.reset_index(drop=True), picked], axis=1)
+    out = out.drop(columns=["rid_a", "rid_b"])
+    out["name_similarity"] = out["name_similarity"].round(3)
+    out = out.sort_values(["score", "name_similarity"], ascending=False).reset_index(drop=True)
+    out.insert(0, "rank", np.arange(1, len(out) + 1))
+    return out
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Find likely duplicate students and write a ranked review file."
+    )
+    parser.add_argument(
+        "--source",
+        choices=["csv", "db"],
+        default="csv",
+        help="Read pel.students (db) or the combined CSV files (csv, default).",
+    )
+    parser.add_argument(
+        "--csv",
+        action="append",
+        default=None,
+        help="CSV file to scan (repeatable). Defaults to the student/progress CSVs that exist.",
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.6,
+        help="Minimum score for a pair to be reported (default: 0.6).",
+    )
+    parser.add_argument(
+        "--max-block",
+        type=int,
+        default=200,
+        help="Skip blocking keys shared by more than this many records (default: 200).",
+    )
+    parser.add_argument(
+        "--output",
+        default="student_dup_candidates.csv",
+        help="Review file to write, .csv or .xlsx (default: student_dup_candidates.csv).",
+    )
+    args = parser.parse_args(argv)
+
+    if args.source == "db":
+        raw = read_students_db()
+    else:
+        base_dir = Path(__file__).resolve().parent
+        names = args.csv or DEFAULT_CSV_SOURCES
+        paths = [Path(n) if Path(n).is_absolute() else base_dir / n for n in names]
+        raw = read_students_csv([p for p in paths if p.exists()])
+
+    records = prepare_records(raw)
+    pairs = candidate_pairs(blocking_keys(records), args.max_block)
+    scored = score_pairs(records, pairs)
+    review = build_review(records, scored[scored["score"] >= args.threshold])
+
+    if args.output.lower().endswith(".xlsx"):
+        review.to_excel(args.output, index=False)
+    else:
+        review.to_csv(args.output, index=False)
+
+    print(f"Student records scanned: {len(raw)}")
+    print(f"Distinct identities: {len(records)}")
+    print(f"Candidate pairs compared: {len(pairs)}")
+    print(f"Pairs written to {args.output}: {len(review)}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
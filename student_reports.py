@@ -0,0 +1,297 @@
+import argparse
+import csv
+import hashlib
+import html
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from progress_source import default_csv, read_progress_csv
+from velocity import SHEETS_PER_LEVEL
+# Per-student progress reports (level history, lvs trend, worksheets completed) under
+# reports/<center>/, as HTML, CSV or XLSX. Each center is read in one query and grouped in
+# memory; students are rendered in batches on a process pool. reports/manifest.csv keeps a
+# hash of each student's rows, so later runs only re-render students whose rows changed.
+
+COLUMNS = ["full_name", "email", "subject", "center", "progress_date", "pel_wks_level", "pel_wks_no", "lvs"]
+REPORTS_DIR = "reports"
+MANIFEST = "manifest.csv"
+BATCH_STUDENTS = 25
+
+CENTER_SQL = (
+    f"SELECT {', '.join(COLUMNS)} FROM pel.progress WHERE center = %s "
+    "ORDER BY full_name, email, subject, progress_date"
+)
+
+
+def read_center_db(conn, center: str) -> pd.DataFrame:
+    with conn.cursor() as cur:
+        cur.execute(CENTER_SQL, (center,))
+        rows = cur.fetchall()
+    return pd.DataFrame(rows, columns=COLUMNS).astype("string")
+
+
+def read_centers_db(centers: Optional[list[str]]) -> dict[str, pd.DataFrame]:
+    from load_progress_csv import get_connection, load_dotenv
+
+    load_dotenv(Path(__file__).resolve().parent / ".env")
+    if "DATABASE_URL" not in os.environ:
+        raise SystemExit("DATABASE_URL is not set. Put it in .env or set it in your shell.")
+    _, conn = get_connection()
+    try:
+        if not centers:
+            with conn.cursor() as cur:
+                cur.execute("SELECT DISTINCT center FROM pel.progress WHERE center IS NOT NULL ORDER BY 1")
+                centers = [row[0] for row in cur.fetchall()]
+        return {center: read_center_db(conn, center) for center in centers}
+    finally:
+        conn.close()
+
+
+def read_centers_csv(path: Path, centers: Optional[list[str]]) -> dict[str, pd.DataFrame]:
+    df = read_progress_csv(path, COLUMNS)
+    df = df[df["center"].notna()]
+    wanted = centers or sorted(df["center"].unique())
+    return {center: group for center, group in df.groupby("center") if center in wanted}
+
+
+HISTORY_COLUMNS = {
+    "subject": "subject",
+    "date": "date",
+    "center": "center",
+    "pel_wks_level": "level",
+    "pel_wks_no": "wks_no",
+    "lvs": "lvs",
+    "lvs_change": "lvs_change",
+    "worksheets_done": "worksheets_done",
+    "worksheets_total": "worksheets_total",
+}
+SPARK_WIDTH, SPARK_HEIGHT = 360, 60
+SPARK_COLORS = ["#1f77b4", "#d62728", "#2ca02c", "#9467bd"]
+PAGE_STYLE = "body{font-family:sans-serif;margin:2em}table{border-collapse:collapse}td,th{padding:2px 8px;border-bottom:1px solid #ddd}"
+
+
+def prepare(df: pd.DataFrame) -> pd.DataFrame:
+    df = df.copy()
+    df["key"] = df["full_name"].fillna("").str.strip().str.lower() + "|" + df["email"].fillna("").str.strip().str.lower()
+    df["progress_date"] = pd.to_datetime(df["progress_date"], errors="coerce")
+    df["lvs"] = pd.to_numeric(df["lvs"], errors="coerce")
+    df = df.dropna(subset=["progress_date"]).sort_values(["key", "subject", "progress_date"]).reset_index(drop=True)
+    df["date"] = df["progress_date"].dt.strftime("%Y-%m-%d")
+    sheet = pd.to_numeric(df["pel_wks_no"].str.extract(r"^\s*(\d+)", expand=False), errors="coerce")
+    lvs = df["lvs"].to_numpy(dtype="float64", na_value=np.nan)
+    position = (lvs - 1) * SHEETS_PER_LEVEL + sheet.clip(0, SHEETS_PER_LEVEL).to_numpy(dtype="float64", na_value=np.nan)
+
+    # Changes against the previous record of the same student and subject.
+    keys = df["key"].to_numpy()
+    subjects = df["subject"].fillna("").to_numpy()
+    first = np.r_[True, (keys[1:] != keys[:-1]) | (subjects[1:] != subjects[:-1])]
+    prev = np.where(first, 0, np.arange(len(df)) - 1)
+    df["lvs_change"] = np.where(first, np.nan, lvs - lvs[prev])
+    # Worksheets completed since the previous record; moving back a level does not count.
+    df["worksheets_done"] = np.where(first, 0, np.clip(np.nan_to_num(position - position[prev]), 0, None))
+    df["worksheets_total"] = df.groupby(["key", "subject"])["worksheets_done"].cumsum()
+
+    # Sparkline coordinates, scaled per student so every chart uses its full box.
+    by_student = df.groupby("key")
+    start = by_student["progress_date"].transform("min")
+    days = (by_student["progress_date"].transform("max") - start).dt.days.clip(lower=1)
+    low = by_student["lvs"].transform("min")
+    scale = (by_student["lvs"].transform("max") - low).clip(lower=1)
+    df["spark_x"] = (df["progress_date"] - start).dt.days / days * (SPARK_WIDTH - 10) + 5
+    df["spark_y"] = SPARK_HEIGHT - 5 - (df["lvs"] - low) / scale * (SPARK_HEIGHT - 10)
+    return df
+
+
+def summarize(df: pd.DataFrame) -> pd.DataFrame:
+    # Per student x subject, for the whole center at once.
+    grouped = df.groupby(["key", "subject"], sort=True)
+    summary = grouped.agg(
+        first_date=("date", "min"),
+        last_date=("date", "max"),
+        records=("date", "size"),
+        start_lvs=("lvs", "first"),
+        current_lvs=("lvs", "last"),
+        current_level=("pel_wks_level", "last"),
+        current_wks_no=("pel_wks_no", "last"),
+        worksheets_completed=("worksheets_done", "sum"),
+    ).reset_index()
+    summary["lvs_gained"] = summary["current_lvs"] - summary["start_lvs"]
+    return summary
+
+
+def signatures(df: pd.DataFrame) -> pd.Series:
+    # Order-independent hash of each student's rows: any new or corrected row changes it.
+    row_hash = pd.util.hash_pandas_object(df[COLUMNS].astype("string"), index=False).to_numpy()
+    return pd.Series(row_hash, index=df.index).groupby(df["key"]).sum().astype("uint64").astype(str)
+
+
+def report_name(full_name: str, email: str) -> str:
+    slug = re.sub(r"[^A-Za-z0-9]+", "_", full_name or "student").strip("_") or "student"
+    return f"{slug}_{hashlib.sha1((email or '').lower().encode('utf-8')).hexdigest()[:6]}"
+
+
+def cell_text(value) -> str:
+    if value is None or value is pd.NA or (isinstance(value, float) and np.isnan(value)):
+        return ""
+    if isinstance(value, float):
+        return f"{value:g}"
+    return html.escape(str(value))
+
+
+def html_table(table: pd.DataFrame) -> str:
+    head = "".join(f"<th>{html.escape(str(col))}</th>" for col in table.columns)
+    rows = "".join("<tr>" + "".join(f"<td>{cell_text(v)}</td>" for v in row) + "</tr>" for row in table.itertuples(index=False))
+    return f"<table><thead><tr>{head}</tr></thead><tbody>{rows}</tbody></table>"
+
+
+def lvs_sparkline(history: pd.DataFrame) -> str:
+    lines = []
+    points = history.dropna(subset=["spark_y"])
+    for i, (subject, rows) in enumerate(points.groupby("subject", sort=True)):
+        coords = " ".join(f"{x:.1f},{y:.1f}" for x, y in zip(rows["spark_x"], rows["spark_y"]))
+        color = SPARK_COLORS[i % len(SPARK_COLORS)]
+        title = html.escape(str(subject))
+        lines.append(f'<polyline fill="none" stroke="{color}" stroke-width="2" points="{coords}"><title>{title}</title></polyline>')
+    return f'<svg width="{SPARK_WIDTH}" height="{SPARK_HEIGHT}" role="img" aria-label="lvs trend">{"".join(lines)}</svg>'
+
+
+def render_html(path: Path, name: str, email: str, center: str, history: pd.DataFrame, summary: pd.DataFrame) -> None:
+    body = [
+        f"<h1>{html.escape(name)}</h1>",
+        f"<p>{html.escape(email)} &middot; {html.escape(center)} &middot; generated {datetime.now():%Y-%m-%d}</p>",
+        "<h2>Summary</h2>",
+        html_table(summary),
+        "<h2>lvs trend</h2>",
+        lvs_sparkline(history),
+        "<h2>Level history</h2>",
+        html_table(history[list(HISTORY_COLUMNS)].rename(columns=HISTORY_COLUMNS)),
+    ]
+    title = html.escape(name)
+    page = f"<!DOCTYPE html><html><head><meta charset='utf-8'><title>{title}</title><style>{PAGE_STYLE}</style></head><body>{''.join(body)}</body></html>"
+    path.write_text(page, encoding="utf-8")
+
+
+def render_student(out_dir: Path, fmt: str, name: str, email: str, center: str, history: pd.DataFrame, summary: pd.DataFrame) -> str:
+    path = out_dir / f"{report_name(name, email)}.{fmt}"
+    summary = summary.drop(columns=["key"])
+    if fmt == "html":
+        render_html(path, name, email, center, history, summary)
+        return str(path)
+    table = history[list(HISTORY_COLUMNS)].rename(columns=HISTORY_COLUMNS)
+    if fmt == "csv":
+        table.to_csv(path, index=False)
+    else:
+        from review_workbook import ReviewWorkbook
+
+        book = ReviewWorkbook(path)
+        book.add_sheet("Summary", summary)
+        book.add_sheet("History", table)
+        book.close()
+    return str(path)
+
+
+def render_batch(out_dir: str, fmt: str, batch: list[tuple]) -> list[tuple[str, str, str]]:
+    folder = Path(out_dir)
+    return [
+        (key, center, render_student(folder / center_dir(center), fmt, name, email, center, history, summary))
+        for key, name, email, center, history, summary in batch
+    ]
+
+
+def center_dir(center: str) -> str:
+    return re.sub(r"[^A-Za-z0-9]+", "_", center).strip("_") or "center"
+
+
+MANIFEST_COLUMNS = ["key", "center", "format", "signature", "report", "rendered_at"]
+
+
+def read_manifest(path: Path) -> dict[tuple[str, str, str], dict]:
+    if not path.exists():
+        return {}
+    with open(path, "r", encoding="utf-8", newline="") as handle:
+        return {(row["key"], row["center"], row["format"]): row for row in csv.DictReader(handle)}
+
+
+def write_manifest(path: Path, entries: dict[tuple[str, str, str], dict]) -> None:
+    with open(path, "w", encoding="utf-8", newline="") as handle:
+        writer = csv.DictWriter(handle, fieldnames=MANIFEST_COLUMNS)
+        writer.writeheader()
+        for entry_key in sorted(entries):
+            writer.writerow(entries[entry_key])
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Render per-student progress reports for each center.")
+    parser.add_argument("--source", choices=["csv", "db"], default="db", help="Read pel.progress or a progress CSV.")
+    parser.add_argument("--csv", default=None, help="Progress CSV (default: progress.csv, else latest backup).")
+    parser.add_argument("--center", nargs="+", default=None, help="Centers to render (default: all).")
+    parser.add_argument("--format", choices=["html", "csv", "xlsx"], default="html", help="Report format (default: html).")
+    parser.add_argument("--output-dir", default=REPORTS_DIR, help=f"Output folder (default: {REPORTS_DIR}).")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Render processes (default: CPU count).")
+    parser.add_argument("--full", action="store_true", help="Re-render every student, not only changed ones.")
+    args = parser.parse_args(argv)
+
+    out_dir = Path(args.output_dir)
+    manifest_path = out_dir / MANIFEST
+    manifest = read_manifest(manifest_path)
+
+    if args.source == "db":
+        centers = read_centers_db(args.center)
+    else:
+        centers = read_centers_csv(Path(args.csv) if args.csv else default_csv(), args.center)
+
+    batches: list[list] = []
+    current: dict[tuple[str, str, str], str] = {}
+    for center, raw in centers.items():
+        df = prepare(raw)
+        if df.empty:
+            continue
+        (out_dir / center_dir(center)).mkdir(parents=True, exist_ok=True)
+        signature = signatures(df)
+        summaries = dict(list(summarize(df).groupby("key", sort=False)))
+        pending = []
+        for key, student in df.groupby("key", sort=True):
+            entry_key = (key, center, args.format)
+            current[entry_key] = signature[key]
+            known = manifest.get(entry_key)
+            if not args.full and known and known["signature"] == signature[key] and Path(known["report"]).exists():
+                continue
+            name, email = student["full_name"].iloc[-1], student["email"].fillna("").iloc[-1]
+            pending.append((key, name, email, center, student, summaries[key]))
+        batches.extend(pending[i : i + BATCH_STUDENTS] for i in range(0, len(pending), BATCH_STUDENTS))
+
+    rendered = 0
+    stamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    if batches:
+        with ProcessPoolExecutor(max_workers=max(args.workers, 1)) as pool:
+            futures = [pool.submit(render_batch, str(out_dir), args.format, batch) for batch in batches]
+            for future in as_completed(futures):
+                for key, center, report in future.result():
+                    entry_key = (key, center, args.format)
+                    manifest[entry_key] = {
+                        "key": key,
+                        "center": center,
+                        "format": args.format,
+                        "signature": current[entry_key],
+                        "report": report,
+                        "rendered_at": stamp,
+                    }
+                    rendered += 1
+    out_dir.mkdir(parents=True, exist_ok=True)
+    write_manifest(manifest_path, manifest)
+
+    print(f"Centers: {len(centers)}, students: {len(current)}")
+    print(f"Rendered: {rendered}, unchanged (skipped): {len(current) - rendered}")
+    print(f"Reports in {out_dir}/ (manifest: {manifest_path})")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,179 @@
+import argparse
+import csv
+import os
+import tempfile
+from typing import Optional
+
+import pandas as pd
+
+from identity_index import identity_keys
+from progress_combine import CENTER_FOLDERS
+# Cross-center transfers in a combined progress frame: the same student (normalized name + email),
+# subject and month reported by more than one center, e.g. the month a student moved from
+# Milpitas to Fremont. Conflicting rows are found with a hash join on the identity key, resolved
+# by --transfer-rule, and listed in transfers_report.csv, so only one row per student, subject and
+# month reaches pel.progress.
+
+REPORT_CSV = "transfers_report.csv"
+RULES = ["destination", "max-lvs", "keep-both"]
+KEY = ["name_key", "email_key", "Subject", "month"]
+STUDENT = ["name_key", "email_key", "Subject"]
+REPORT_COLUMNS = [
+    "Full Name", "Email", "Subject", "Month", "Center", "PEL Wks. Level", "lvs", "PEL Wks. No.", "Notes",
+    "action", "reason",
+]
+# "moved to Fremont", "transfer to Fremont", "will move back to Milpitas"; "moved from ..." is the origin.
+NOTE_RE = r"(?i)\bto\s+(" + "|".join(CENTER_FOLDERS) + r")\b"
+CENTER_NAMES = {center.lower(): center for center in CENTER_FOLDERS}
+
+
+def transfer_frame(progress: pd.DataFrame) -> pd.DataFrame:
+    dates = pd.to_datetime(progress["Date"])
+    frame = identity_keys(progress["Full Name"], progress["Email"])
+    return frame.assign(
+        Subject=progress["Subject"].astype("string").fillna(""),
+        month=dates.dt.year * 12 + dates.dt.month - 1,
+        Center=progress["Center"].astype("string"),
+        lvs=pd.to_numeric(progress["lvs"], errors="coerce"),
+        wks=pd.to_numeric(progress["PEL Wks. No."].astype("string").str.extract(r"^\s*(\d+)")[0], errors="coerce"),
+        Notes=progress["Notes"].astype("string"),
+    )
+
+
+def find_conflicts(frame: pd.DataFrame) -> pd.Index:
+    # Hash join of the frame with itself on the identity key; a match at another center is a conflict.
+    rows = frame[KEY + ["Center"]].reset_index(names="row")
+    pairs = rows.merge(rows, on=KEY, suffixes=("", "_other"))
+    pairs = pairs[pairs["Center"] != pairs["Center_other"]]
+    return pd.Index(pairs["row"].unique()).sort_values()
+
+
+def destinations(frame: pd.DataFrame, conflicts: pd.DataFrame) -> pd.DataFrame:
+    # Per conflict group: the center a note on either row names, else the center the student is
+    # at in their next month (not available for a single-month run).
+    noted = conflicts["Notes"].str.extract(NOTE_RE)[0].str.lower().map(CENTER_NAMES)
+    note = noted.groupby(conflicts["group"]).agg(lambda values: values.dropna().iloc[0] if values.dropna().nunique() == 1 else pd.NA)
+
+    groups = conflicts.drop_duplicates("group")[STUDENT + ["month", "group"]]
+    later = frame.drop(index=conflicts.index)[STUDENT + ["month", "Center"]]
+    later = groups.merge(later, on=STUDENT, suffixes=("", "_later"))
+    later = later[later["month_later"] > later["month"]].sort_values(["group", "month_later"])
+    following = later.drop_duplicates("group").set_index("group")["Center"]
+
+    result = pd.DataFrame({"note": note.astype("string")}, index=groups["group"].to_numpy())
+    result["next_month"] = following.astype("string").reindex(result.index)
+    return result
+
+
+def resolve_frame(frame: pd.DataFrame, rule: str) -> tuple[pd.Index, pd.DataFrame]:
+    conflict_rows = find_conflicts(frame)
+    conflicts = frame.loc[conflict_rows].copy()
+    if conflicts.empty:
+        return conflict_rows, conflicts.assign(action=pd.Series(dtype="string"), reason=pd.Series(dtype="string"))
+    conflicts["group"] = conflicts.groupby(KEY, sort=False).ngroup()
+
+    if rule == "keep-both":
+        return pd.Index([]), conflicts.assign(action="kept", reason="keep-both")
+
+    conflicts["reason"] = "max lvs"
+    conflicts["preferred"] = False
+    if rule == "destination":
+        found = destinations(frame, conflicts).reindex(conflicts["group"].to_numpy())
+        for source, reason in [("next_month", "next month"), ("note", "note")]:
+            named = pd.Series(found[source].to_numpy(), index=conflicts.index, dtype="string")
+            match = (named == conflicts["Center"]).fillna(False).astype(bool)
+            settled = match.groupby(conflicts["group"]).transform("any")
+            # A note wins over the next month; both win over lvs.
+            conflicts.loc[settled, "reason"] = reason
+            conflicts.loc[settled, "preferred"] = match[settled]
+
+    ranked = conflicts.sort_values(
+        ["group", "preferred", "lvs", "wks"], ascending=[True, False, False, False], na_position="last", kind="stable"
+    )
+    kept = ranked.drop_duplicates("group").index
+    conflicts["action"] = "dropped"
+    conflicts.loc[kept, "action"] = "kept"
+    return conflicts.index.difference(kept), conflicts
+
+
+def transfer_report(progress: pd.DataFrame, conflicts: pd.DataFrame) -> pd.DataFrame:
+    if conflicts.empty:
+        return pd.DataFrame(columns=REPORT_COLUMNS)
+    rows = progress.loc[conflicts.index]
+    report = pd.DataFrame({
+        "Full Name": rows["Full Name"],
+        "Email": rows["Email"],
+        "Subject": rows["Subject"],
+        "Month": pd.to_datetime(rows["Date"]).dt.strftime("%Y-%m"),
+        "Center": rows["Center"],
+        "PEL Wks. Level": rows["PEL Wks. Level"],
+        "lvs": rows["lvs"],
+        "PEL Wks. No.": rows["PEL Wks. No."],
+        "Notes": rows["Notes"],
+        "action": conflicts["action"],
+        "reason": conflicts["reason"],
+    })
+    return report.assign(_group=conflicts["group"]).sort_values(["_group", "Center"]).drop(columns="_group")
+
+
+def print_transfers(report: pd.DataFrame, path: str) -> None:
+    # Written even when empty, so a report from an earlier run is never mistaken for this one.
+    report.to_csv(path, index=False)
+    if report.empty:
+        print("No cross-center transfer months found.")
+        return
+    groups = report[["Full Name", "Email", "Subject", "Month"]].drop_duplicates()
+    dropped = int((report["action"] == "dropped").sum())
+    reasons = report.drop_duplicates(["Full Name", "Email", "Subject", "Month"])["reason"].value_counts()
+    detail = ", ".join(f"{reason}: {count}" for reason, count in reasons.items())
+    print(f"Cross-center transfer months: {len(groups)} ({detail}); {dropped} rows dropped -> {path}")
+
+
+def resolve_transfers(progress: pd.DataFrame, rule: str = "destination", report_path: str = REPORT_CSV) -> pd.DataFrame:
+    drop, conflicts = resolve_frame(transfer_frame(progress), rule)
+    print_transfers(transfer_report(progress, conflicts), report_path)
+    return progress.drop(index=drop).reset_index(drop=True)
+
+
+def resolve_csv(path: str, rule: str = "destination", report_path: str = REPORT_CSV) -> int:
+    # For --stream output: only the columns the rules need are read, then the file is rewritten
+    # row by row without the dropped rows.
+    columns = ["Full Name", "Email", "Subject", "PEL Wks. Level", "lvs", "PEL Wks. No.", "Notes", "Date", "Center"]
+    progress = pd.read_csv(path, usecols=columns, dtype="string")
+    drop, conflicts = resolve_frame(transfer_frame(progress), rule)
+    print_transfers(transfer_report(progress, conflicts), report_path)
+    if drop.empty:
+        return 0
+
+    skip = set(drop.tolist())
+    folder = os.path.dirname(os.path.abspath(path))
+    with tempfile.NamedTemporaryFile("w", encoding="utf-8", newline="", dir=folder, suffix=".csv", delete=False) as out:
+        with open(path, "r", encoding="utf-8", newline="") as handle:
+            reader = csv.reader(handle)
+            writer = csv.writer(out, lineterminator="\n")
+            writer.writerow(next(reader))
+            for position, row in enumerate(reader):
+                if position not in skip:
+                    writer.writerow(row)
+    os.replace(out.name, path)
+    return len(skip)
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Find and resolve cross-center transfer months in a combined progress CSV.")
+    parser.add_argument("input", nargs="?", default="progress.csv", help="Combined progress CSV (default: progress.csv).")
+    parser.add_argument("--transfer-rule", choices=RULES, default="destination", help="How to pick the row to keep (default: destination).")
+    parser.add_argument("--report", default=REPORT_CSV, help=f"Report CSV (default: {REPORT_CSV}).")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.input):
+        print(f"Missing file: {args.input}")
+        return 1
+    dropped = resolve_csv(args.input, args.transfer_rule, args.report)
+    if dropped:
+        print(f"Removed {dropped} rows from {args.input}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -2,6 +2,7 @@ import argparse
 import csv
 from collections import defaultdict
 from pathlib import Path
+from typing import Optional
 # This is used to update PAS Milpitas CSV files based on LevelUpdates.csv using the active flag.
 
 def normalize(text: str) -> str:
@@ -82,7 +83,7 @@ def match_rows(
     return matches
 
 
-def main() -> int:
+def main(argv: Optional[list[str]] = None) -> int:
     parser = argparse.ArgumentParser(
         description=(
             "Apply LevelUpdates.csv changes to PAS Milpitas CSV files "
@@ -125,7 +126,7 @@ def main() -> int:
         action="store_true",
         help="Show what would change without writing files.",
     )
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
 
     updates_path = Path(args.updates)
     folder = Path(args.folder)
@@ -0,0 +1,208 @@
+import argparse
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from date_parse import CENTERS_OPENED, ENROLLMENT_COLUMN, STUDENT_DATE_COLUMNS, parse_dates
+from level_codes import level_table, normalize_level_codes
+# This script checks student_to_load.csv / progress_to_load.csv in one vectorized pass
+# and writes a violation report. It exits non-zero if anything fails.
+
+NULL_TOKENS = ["", "NAN", "NONE", "NULL", "NAT", "<NA>"]
+EMAIL_RE = r"^[^@\s,;]+@[^@\s,;]+\.[A-Za-z]{2,}$"
+# PEL Wks. No. is a worksheet number, optionally suffixed with p/s (e.g. 100p, 110s).
+WKS_NO_RE = r"^\d+(?:\.0+)?[PpSs]?$"
+
+PROGRESS_REQUIRED = ["Full Name", "Subject", "PEL Wks. Level", "lvs", "Date", "Center"]
+PROGRESS_KEY = ["Full Name", "Email", "Subject", "Date", "Center"]
+STUDENT_REQUIRED = ["Full Name"]
+STUDENT_KEY = ["Full Name", "Email"]
+
+REPORT_COLUMNS = ["file", "line", "rule", "column", "value"]
+
+
+def is_blank(series: pd.Series) -> pd.Series:
+    missing = series.isna()
+    if isinstance(series.dtype, pd.CategoricalDtype) or not pd.api.types.is_numeric_dtype(series):
+        text = series.astype("string").str.strip().str.upper()
+        missing |= text.isin(NULL_TOKENS).fillna(False).astype(bool)
+    return missing
+
+
+def collect(
+    found: list[pd.DataFrame], df: pd.DataFrame, mask, rule: str, column: str, file_name: str
+) -> None:
+    rows = np.flatnonzero(np.asarray(mask, dtype=bool))
+    if not len(rows):
+        return
+    values = df[column].iloc[rows] if column in df.columns else pd.Series([""] * len(rows))
+    found.append(
+        pd.DataFrame(
+            {
+                "file": file_name,
+                # +2: one header line, and CSV lines are 1-based.
+                "line": rows + 2,
+                "rule": rule,
+                "column": column,
+                "value": values.astype("string").fillna("").to_numpy(),
+            }
+        )
+    )
+
+
+def check_common(
+    found: list[pd.DataFrame],
+    df: pd.DataFrame,
+    file_name: str,
+    required: list[str],
+    key: list[str],
+) -> None:
+    missing_cols = [col for col in required + key if col not in df.columns]
+    for col in dict.fromkeys(missing_cols):
+        found.append(
+            pd.DataFrame(
+                [{"file": file_name, "line": 1, "rule": "missing_column", "column": col, "value": ""}]
+            )
+        )
+
+    for col in required:
+        if col in df.columns:
+            collect(found, df, is_blank(df[col]), "required", col, file_name)
+
+    if "Email" in df.columns:
+        email = df["Email"].astype("string").str.strip()
+        bad_email = ~is_blank(df["Email"]) & ~email.str.match(EMAIL_RE).fillna(False)
+        collect(found, df, bad_email, "email_format", "Email", file_name)
+
+    if all(col in df.columns for col in key):
+        key_frame = df[key].apply(lambda s: s.astype("string").str.strip().str.lower())
+        dup = key_frame.duplicated(keep=False)
+        collect(found, df, dup, "duplicate_key", key[0], file_name)
+
+
+def validate_progress(df: pd.DataFrame, file_name: str, period: str | None) -> pd.DataFrame:
+    found: list[pd.DataFrame] = []
+    check_common(found, df, file_name, PROGRESS_REQUIRED, PROGRESS_KEY)
+
+    table = level_table()
+    if "PEL Wks. Level" in df.columns:
+        levels = normalize_level_codes(df["PEL Wks. Level"])
+        positions = table.index.get_indexer(levels.fillna(""))
+        unknown = (positions < 0) & levels.notna().to_numpy()
+        collect(found, df, unknown, "unknown_level", "PEL Wks. Level", file_name)
+
+        if "lvs" in df.columns:
+            lvs = pd.to_numeric(df["lvs"], errors="coerce")
+            expected = np.where(
+                positions >= 0,
+                table["lvs"].to_numpy(dtype="float64", na_value=np.nan)[positions],
+                np.nan,
+            )
+            lo, hi = table["lvs"].min(), table["lvs"].max()
+            out_of_range = lvs.notna() & ((lvs < lo) | (lvs > hi) | (lvs != lvs.round()))
+            collect(found, df, out_of_range, "lvs_range", "lvs", file_name)
+            mismatch = lvs.notna() & ~out_of_range & ~np.isnan(expected) & (lvs != expected)
+            collect(found, df, mismatch, "lvs_level_mismatch", "lvs", file_name)
+            not_numeric = lvs.isna() & ~is_blank(df["lvs"])
+            collect(found, df, not_numeric, "lvs_range", "lvs", file_name)
+
+    if "Date" in df.columns:
+        dates = pd.to_datetime(df["Date"], format="ISO8601", errors="coerce")
+        collect(found, df, dates.isna() & ~is_blank(df["Date"]), "date_parse", "Date", file_name)
+
+        months = dates.dt.to_period("M")
+        if period:
+            target = pd.Period(period, freq="M")
+        elif months.notna().any():
+            target = months.mode().iloc[0]
+        else:
+            target = None
+        if target is not None:
+            off_period = months.notna() & (months != target)
+            collect(found, df, off_period, f"month_not_{target}", "Date", file_name)
+
+    if "PEL Wks. No." in df.columns:
+        wks_no = df["PEL Wks. No."].astype("string").str.strip()
+        bad_no = ~is_blank(df["PEL Wks. No."]) & ~wks_no.str.match(WKS_NO_RE).fillna(False)
+        collect(found, df, bad_no, "wks_no_numeric", "PEL Wks. No.", file_name)
+
+    return pd.concat(found, ignore_index=True) if found else pd.DataFrame(columns=REPORT_COLUMNS)
+
+
+def validate_students(df: pd.DataFrame, file_name: str) -> pd.DataFrame:
+    found: list[pd.DataFrame] = []
+    check_common(found, df, file_name, STUDENT_REQUIRED, STUDENT_KEY)
+
+    for col in STUDENT_DATE_COLUMNS:
+        if col in df.columns:
+            # Raw values date_parse.py cannot read would load as NULL dob / enrollment_date.
+            dates = parse_dates(df[col], column=col)
+            bad = ~is_blank(df[col]) & dates.isna()
+            if col == ENROLLMENT_COLUMN:
+                # An enrollment before the centers opened is a mistyped year.
+                bad |= (dates < CENTERS_OPENED).fillna(False)
+            collect(found, df, bad, "date_parse", col, file_name)
+
+    return pd.concat(found, ignore_index=True) if found else pd.DataFrame(columns=REPORT_COLUMNS)
+
+
+def read_to_load(path: Path) -> pd.DataFrame:
+    df = pd.read_csv(path, dtype="string", keep_default_na=False, na_values=[""])
+    return df.rename(columns=lambda c: c.strip())
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Validate *_to_load.csv files before running the loaders."
+    )
+    parser.add_argument("--progress", default="progress_to_load.csv", help="Progress CSV to check.")
+    parser.add_argument("--students", default="student_to_load.csv", help="Student CSV to check.")
+    parser.add_argument(
+        "--period",
+        default=None,
+        help="Target month as YYYY-MM (default: the most common month in the progress file).",
+    )
+    parser.add_argument(
+        "--report",
+        default="validation_report.csv",
+        help="Where to write violations (default: validation_report.csv).",
+    )
+    args = parser.parse_args(argv)
+
+    reports = []
+    checked = 0
+    for path_arg, validate in [
+        (args.progress, lambda df, name: validate_progress(df, name, args.period)),
+        (args.students, validate_students),
+    ]:
+        path = Path(path_arg)
+        if not path.exists():
+            print(f"Skipping missing file: {path}")
+            continue
+        df = read_to_load(path)
+        reports.append(validate(df, path.name))
+        checked += len(df)
+        print(f"Checked {path.name}: {len(df)} rows")
+
+    if not reports:
+        print("Nothing to validate.")
+        return 1
+
+    report = pd.concat(reports, ignore_index=True)
+    report.to_csv(args.report, index=False)
+
+    if report.empty:
+        print(f"No violations in {checked} rows.")
+        return 0
+
+    summary = report.groupby(["file", "rule", "column"]).size()
+    print(f"Violations: {len(report)} (details in {args.report})")
+    for (file_name, rule, column), count in summary.items():
+        print(f"  - {file_name} {rule} [{column}]: {count}")
+    return 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
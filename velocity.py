@@ -0,0 +1,179 @@
+import argparse
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from progress_source import read_progress
+# Pace per student and subject: lvs and worksheets per month over a rolling window of recent
+# months, a projected month for reaching the next level, and a flag for students in the bottom
+# percentile of pace at their level. A state file keeps the last window of each series, so a
+# new month only needs the rows loaded after it.
+
+COLUMNS = ["full_name", "email", "subject", "center", "progress_date", "pel_wks_level", "lvs", "pel_wks_no"]
+SHEETS_PER_LEVEL = 110
+STATE_COLUMNS = ["key", "full_name", "email", "subject", "center", "level", "lvs", "sheet", "position", "month"]
+LATEST_COLUMNS = [
+    "full_name",
+    "email",
+    "subject",
+    "center",
+    "month",
+    "level",
+    "lvs",
+    "sheet",
+    "window_months",
+    "lvs_per_month",
+    "sheets_per_month",
+    "months_to_next_level",
+    "projected_next_level",
+    "pace_pct",
+    "slow",
+]
+
+
+def month_index(values: pd.Series) -> np.ndarray:
+    dates = pd.to_datetime(values, errors="coerce")
+    return (dates.dt.year * 12 + dates.dt.month - 1).to_numpy(dtype="float64")
+
+
+def month_label(index: np.ndarray) -> list:
+    return [None if np.isnan(m) else f"{int(m) // 12:04d}-{int(m) % 12 + 1:02d}" for m in index]
+
+
+def prepare(df: pd.DataFrame, sheets_per_level: int) -> pd.DataFrame:
+    lvs = pd.to_numeric(df["lvs"], errors="coerce").to_numpy(dtype="float64")
+    sheet = pd.to_numeric(df["pel_wks_no"].str.extract(r"^\s*(\d+)", expand=False), errors="coerce")
+    sheet = sheet.clip(0, sheets_per_level).fillna(0).to_numpy(dtype="float64")
+    obs = pd.DataFrame(
+        {
+            "key": (df["full_name"].fillna("").str.strip().str.lower() + "|" + df["email"].fillna("").str.strip().str.lower()).to_numpy(),
+            "full_name": df["full_name"].to_numpy(),
+            "email": df["email"].to_numpy(),
+            "subject": df["subject"].to_numpy(),
+            "center": df["center"].to_numpy(),
+            "level": df["pel_wks_level"].to_numpy(),
+            "lvs": lvs,
+            "sheet": sheet,
+            "position": (lvs - 1) * sheets_per_level + sheet,
+            "month": month_index(df["progress_date"]),
+        }
+    )
+    obs = obs.dropna(subset=["lvs", "month", "subject"])
+    # One observation per series and month: the furthest position reported that month.
+    obs = obs.sort_values(["key", "subject", "month", "position"])
+    return obs.drop_duplicates(["key", "subject", "month"], keep="last").reset_index(drop=True)
+
+
+def rolling_pace(obs: pd.DataFrame, window: int) -> pd.DataFrame:
+    obs = obs.sort_values(["key", "subject", "month"]).reset_index(drop=True)
+    # Rows are contiguous per series, so "window observations back" is a plain index offset.
+    back = np.minimum(obs.groupby(["key", "subject"]).cumcount().to_numpy(), window)
+    start = np.arange(len(obs)) - back
+    months = obs["month"].to_numpy()
+    span = months - months[start]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        obs["window_months"] = span
+        lvs_rate = np.where(span > 0, (obs["lvs"].to_numpy() - obs["lvs"].to_numpy()[start]) / span, np.nan)
+        sheet_rate = np.where(span > 0, (obs["position"].to_numpy() - obs["position"].to_numpy()[start]) / span, np.nan)
+    # Rounded so the rates read back from velocity_latest.csv exactly on incremental runs.
+    obs["lvs_per_month"] = np.round(lvs_rate, 4)
+    obs["sheets_per_month"] = np.round(sheet_rate, 4)
+    return obs
+
+
+def project(
+    latest: pd.DataFrame, sheets_per_level: int, window: int, slow_percentile: float, min_peers: int
+) -> pd.DataFrame:
+    latest = latest.copy()
+    pace = latest["sheets_per_month"].to_numpy()
+    left = sheets_per_level - latest["sheet"].to_numpy()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        months_left = np.where(pace > 0, np.ceil(np.maximum(left, 1) / pace), np.nan)
+    latest["months_to_next_level"] = months_left
+    latest["projected_next_level"] = month_label(latest["month"].to_numpy() + months_left)
+
+    # Percentile of pace among students whose latest record is at the same subject and lvs.
+    peers = latest.groupby(["subject", "lvs"])["sheets_per_month"]
+    latest["pace_pct"] = (100 * peers.rank(pct=True, method="average")).round(1)
+    enough = peers.transform("count") >= min_peers
+    # Only students seen within the window of the newest month are flagged; pace of students
+    # who have left still counts towards the percentiles.
+    months = latest["month"].to_numpy()
+    current = months > np.nanmax(months) - window
+    latest["slow"] = enough & current & (latest["pace_pct"] <= slow_percentile)
+    return latest
+
+
+def latest_rows(obs: pd.DataFrame) -> pd.DataFrame:
+    return obs.sort_values(["key", "subject", "month"]).drop_duplicates(["key", "subject"], keep="last")
+
+
+def state_tail(obs: pd.DataFrame, window: int) -> pd.DataFrame:
+    obs = obs.sort_values(["key", "subject", "month"])
+    return obs.groupby(["key", "subject"]).tail(window + 1)[STATE_COLUMNS]
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Per-student pace, next-level projection and slow-pace flags.")
+    parser.add_argument("--source", choices=["csv", "db"], default="csv", help="Read a progress CSV or pel.progress.")
+    parser.add_argument("--csv", default=None, help="Progress CSV (default: progress.csv, else latest backup).")
+    parser.add_argument("--window", type=int, default=3, help="Months of history per pace estimate (default: 3).")
+    parser.add_argument(
+        "--sheets-per-level", type=int, default=SHEETS_PER_LEVEL, help=f"Worksheets per level (default: {SHEETS_PER_LEVEL})."
+    )
+    parser.add_argument("--slow-percentile", type=float, default=10.0, help="Flag pace at or below this percentile.")
+    parser.add_argument("--min-peers", type=int, default=5, help="Students needed at a level before flagging.")
+    parser.add_argument("--output", default="velocity_latest.csv", help="Latest pace per student and subject.")
+    parser.add_argument("--state", default="velocity_state.csv", help="Rolling-window state for incremental runs.")
+    parser.add_argument("--full", action="store_true", help="Ignore the state file and recompute from all history.")
+    args = parser.parse_args(argv)
+
+    state_path = Path(args.state)
+    output_path = Path(args.output)
+    incremental = not args.full and state_path.exists() and output_path.exists()
+
+    if incremental:
+        state = pd.read_csv(state_path, dtype={"key": "string", "subject": "string"})
+        # Re-read the last month in the state as well, in case it was only partly loaded.
+        last_month = int(state["month"].max())
+        state = state[state["month"] < last_month]
+        since = date(last_month // 12, last_month % 12 + 1, 1) - timedelta(days=1)
+        fresh = prepare(read_progress(args.source, args.csv, COLUMNS, since), args.sheets_per_level)
+        if fresh.empty:
+            print(f"No progress after {since:%Y-%m-%d}; {output_path} is up to date.")
+            return 0
+        touched = fresh[["key", "subject"]].drop_duplicates()
+        history = state.merge(touched, on=["key", "subject"])
+        obs = pd.concat([history, fresh], ignore_index=True)
+        updated = latest_rows(rolling_pace(obs, args.window))
+        previous = pd.read_csv(output_path)
+        previous["key"] = (
+            previous["full_name"].fillna("").str.strip().str.lower() + "|" + previous["email"].fillna("").str.strip().str.lower()
+        )
+        previous["month"] = month_index(previous["month"])
+        kept = previous.merge(touched, on=["key", "subject"], how="left", indicator=True)
+        kept = kept[kept["_merge"] == "left_only"].drop(columns=["_merge"])
+        latest = pd.concat([kept, updated], ignore_index=True)
+        new_state = pd.concat([state, fresh], ignore_index=True)
+        print(f"Incremental: {len(fresh)} observations after {since:%Y-%m-%d}, {len(touched)} series updated")
+    else:
+        obs = prepare(read_progress(args.source, args.csv, COLUMNS), args.sheets_per_level)
+        latest = latest_rows(rolling_pace(obs, args.window))
+        new_state = obs
+        print(f"Full: {len(obs)} observations, {len(latest)} series")
+
+    latest = project(latest, args.sheets_per_level, args.window, args.slow_percentile, args.min_peers)
+    latest["month"] = month_label(latest["month"].to_numpy(dtype="float64"))
+    latest = latest.sort_values(["subject", "lvs", "pace_pct"])
+    latest[LATEST_COLUMNS].to_csv(output_path, index=False)
+    state_tail(new_state, args.window).to_csv(state_path, index=False)
+
+    print(f"{output_path}: {len(latest)} rows, {int(latest['slow'].sum())} flagged slow")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,254 @@
+import argparse
+import os
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+import pandas as pd
+
+from clean import clean_csv_file, convert_workbook, rename_dec_file
+from dtype_plan import concat_planned
+from progress_combine import CENTER_FOLDERS, SORT_COLUMNS, combine_month, file_date, print_unknown_levels
+from student_combine import dedupe_students, finish_students, read_student_file
+from transfers import RULES, resolve_transfers
+from validate_to_load import read_to_load, validate_progress, validate_students
+# Watches PAS Raw/ for new or changed workbooks and regenerates the *_to_load.csv files
+# for the affected month (ingest -> combine -> validate). Uses inotify when available.
+
+RAW_FOLDER = "PAS Raw"
+CENTER_PREFIXES = {
+    "PAS FREMONT": "Fremont",
+    "PAS MILPITAS": "Milpitas",
+    "PAS MIL": "Milpitas",
+}
+
+
+def center_for(filename: str) -> str | None:
+    upper = filename.upper()
+    for prefix, center in CENTER_PREFIXES.items():
+        if upper.startswith(prefix):
+            return center
+    return None
+
+
+def is_workbook(filename: str) -> bool:
+    # Skip Excel lock files (~$...) and partial downloads.
+    return filename.lower().endswith(".xlsx") and not filename.startswith(("~$", "."))
+
+
+def snapshot(folder: Path) -> dict[str, tuple[int, int]]:
+    state = {}
+    for entry in os.scandir(folder):
+        if entry.is_file() and is_workbook(entry.name):
+            stat = entry.stat()
+            state[entry.name] = (stat.st_size, stat.st_mtime_ns)
+    return state
+
+
+class ChangeWaiter:
+    # Blocks until something changes in the folder (inotify) or the poll interval passes.
+
+    def __init__(self, folder: Path, poll_interval: float, use_inotify: bool = True):
+        self.poll_interval = poll_interval
+        self.inotify = None
+        if not use_inotify:
+            return
+        try:
+            from inotify_simple import INotify, flags  # type: ignore
+
+            self.inotify = INotify()
+            self.inotify.add_watch(
+                str(folder),
+                flags.CLOSE_WRITE | flags.MOVED_TO | flags.CREATE | flags.MODIFY,
+            )
+        except (ModuleNotFoundError, OSError):
+            self.inotify = None
+
+    @property
+    def mode(self) -> str:
+        return "inotify" if self.inotify else "polling"
+
+    def wait(self, timeout: float) -> None:
+        if self.inotify:
+            self.inotify.read(timeout=int(timeout * 1000))
+        else:
+            time.sleep(min(timeout, self.poll_interval))
+
+
+def ingest_workbook(path: Path) -> tuple[str, str]:
+    center = center_for(path.name)
+    if center is None:
+        raise ValueError(f"Cannot tell the center from {path.name}")
+    output_folder = CENTER_FOLDERS[center]
+    csv_path = convert_workbook(str(path), output_folder)
+    clean_csv_file(csv_path, nan_threshold=10)
+    csv_path = rename_dec_file(csv_path)
+    return center, csv_path
+
+
+def new_students_for_month(target: datetime, known_students: Path) -> pd.DataFrame:
+    frames = []
+    for center, folder in CENTER_FOLDERS.items():
+        for filename in sorted(os.listdir(folder)):
+            if not filename.endswith(".csv"):
+                continue
+            try:
+                if file_date(filename) != target:
+                    continue
+            except (AttributeError, TypeError, ValueError):
+                continue
+            df = read_student_file(folder, filename)
+            if df is not None:
+                frames.append(df)
+    if not frames:
+        return pd.DataFrame()
+    students = finish_students(dedupe_students(concat_planned(frames)))
+
+    if known_students.exists():
+        known = pd.read_csv(known_students, usecols=["Full Name", "Email"], dtype="string")
+        key = ["Full Name", "Email"]
+        known_keys = pd.MultiIndex.from_frame(known[key].fillna(""))
+        batch_keys = pd.MultiIndex.from_frame(students[key].astype("string").fillna(""))
+        students = students[~batch_keys.isin(known_keys)]
+    return students
+
+
+def process_month(target: datetime, args: argparse.Namespace) -> int:
+    progress, unknown = combine_month(CENTER_FOLDERS, target)
+    progress = progress.sort_values(SORT_COLUMNS, kind="stable").reset_index(drop=True)
+    print_unknown_levels(unknown)
+    progress = resolve_transfers(progress, args.transfer_rule, args.transfers_report)
+    students = new_students_for_month(target, Path(args.known_students))
+    if args.resolve_ids:
+        from identity_index import IdentityIndex
+
+        identities = IdentityIndex()
+        try:
+            progress = identities.add_ids(progress)
+            if len(students):
+                students = identities.add_ids(students)
+        finally:
+            identities.close()
+    progress.to_csv(args.progress_out, index=False)
+    students.to_csv(args.students_out, index=False)
+
+    period = f"{target:%Y-%m}"
+    report = pd.concat(
+        [
+            validate_progress(read_to_load(Path(args.progress_out)), Path(args.progress_out).name, period),
+            validate_students(read_to_load(Path(args.students_out)), Path(args.students_out).name)
+            if len(students)
+            else pd.DataFrame(),
+        ],
+        ignore_index=True,
+    )
+    report.to_csv(args.report, index=False)
+
+    print(f"[{period}] progress rows: {len(progress)} -> {args.progress_out}")
+    print(f"[{period}] new students: {len(students)} -> {args.students_out}")
+    if report.empty:
+        print(f"[{period}] validation passed")
+    else:
+        print(f"[{period}] validation violations: {len(report)} (see {args.report})")
+    return len(report)
+
+
+def process_files(names: list[str], folder: Path, args: argparse.Namespace) -> None:
+    months = set()
+    for name in names:
+        started = time.monotonic()
+        try:
+            center, csv_path = ingest_workbook(folder / name)
+            months.add(file_date(os.path.basename(csv_path)))
+            print(f"Ingested {name} ({center}) in {time.monotonic() - started:.1f}s")
+        except Exception as exc:  # keep watching after a bad workbook
+            print(f"Failed to ingest {name}: {exc}")
+
+    for target in sorted(months):
+        try:
+            process_month(target, args)
+        except Exception as exc:
+            print(f"Failed to process {target:%Y-%m}: {exc}")
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Watch PAS Raw/ and regenerate *_to_load.csv when workbooks land."
+    )
+    parser.add_argument("--folder", default=RAW_FOLDER, help=f"Folder to watch (default: {RAW_FOLDER}).")
+    parser.add_argument(
+        "--settle",
+        type=float,
+        default=2.0,
+        help="Seconds a file's size/mtime must stay unchanged before processing (default: 2).",
+    )
+    parser.add_argument(
+        "--poll-interval", type=float, default=1.0, help="Polling interval without inotify (default: 1)."
+    )
+    parser.add_argument("--polling", action="store_true", help="Force polling even if inotify is available.")
+    parser.add_argument(
+        "--process-existing",
+        action="store_true",
+        help="Treat workbooks already in the folder as new on startup.",
+    )
+    parser.add_argument("--once", action="store_true", help="Process pending workbooks and exit.")
+    parser.add_argument("--progress-out", default="progress_to_load.csv")
+    parser.add_argument("--students-out", default="student_to_load.csv")
+    parser.add_argument("--report", default="validation_report.csv")
+    parser.add_argument(
+        "--known-students",
+        default="student.csv",
+        help="Combined student CSV; students already in it are left out of --students-out.",
+    )
+    parser.add_argument(
+        "--resolve-ids",
+        action="store_true",
+        help="Add a Student ID column to both outputs from the identity index (see identity_index.py).",
+    )
+    parser.add_argument(
+        "--transfer-rule",
+        choices=RULES,
+        default="destination",
+        help="Which row to keep when a student has rows at both centers in the month (see transfers.py).",
+    )
+    parser.add_argument("--transfers-report", default="transfers_report.csv")
+    args = parser.parse_args(argv)
+
+    folder = Path(args.folder)
+    if not folder.exists():
+        raise SystemExit(f"Missing folder: {folder}")
+
+    waiter = ChangeWaiter(folder, args.poll_interval, use_inotify=not args.polling)
+    processed = {} if args.process_existing else snapshot(folder)
+    pending: dict[str, tuple[tuple[int, int], float]] = {}
+    print(f"Watching {folder} ({waiter.mode}); Ctrl-C to stop.")
+
+    try:
+        while True:
+            now = time.monotonic()
+            for name, signature in snapshot(folder).items():
+                if processed.get(name) == signature:
+                    pending.pop(name, None)
+                    continue
+                seen = pending.get(name)
+                if seen is None or seen[0] != signature:
+                    # New or still being written: restart the settle timer.
+                    pending[name] = (signature, now)
+
+            ready = sorted(name for name, (_, since) in pending.items() if now - since >= args.settle)
+            if ready:
+                process_files(ready, folder, args)
+                for name in ready:
+                    processed[name] = pending.pop(name)[0]
+
+            if args.once and not pending:
+                return 0
+            waiter.wait(args.settle if pending else 60.0)
+    except KeyboardInterrupt:
+        print("Stopped.")
+        return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())